@@ -0,0 +1,154 @@
+# /admission.py
+import math
+import time
+import uuid
+import threading
+from collections import OrderedDict
+
+class QueueFull(Exception):
+    """대기열이 가득 차서 작업을 받을 수 없음 (retry_after: 다시 시도해 볼 만한 시간(초), estimate: 현재 대기열 예상치)"""
+
+    def __init__(self, message: str, retry_after: int, estimate: dict):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.estimate = estimate
+
+class AdmissionControl:
+    """
+    화자분리 레인의 대기열 크기를 제한하고, 지난 작업의 처리 속도로 대기/완료 예상 시간을 계산합니다.
+
+    - 제출할 때 ffprobe로 잰 녹화본 길이와 함께 admit()으로 등록하면 표(ticket)를 받습니다.
+      작업이 첫 단계(오디오 추출)를 시작할 때 start(ticket), 끝나면 finish(ticket)를 호출합니다.
+      (레인 큐와 파이프라인 단계 큐에서 기다리는 작업은 모두 대기 중으로 셈)
+    - 시작하지 않은 작업이 max_jobs개이거나, 예상 대기 시간이 max_wait_seconds를 넘으면 QueueFull을 던집니다.
+    - 예상 시간 = (대기 중인 오디오 길이 × 실시간 배율 + 처리 중인 작업의 남은 예상 시간) ÷ 워커 수
+      실시간 배율은 rtf_source()(지난 작업의 처리 시간 / 오디오 길이)를 쓰고, 아직 끝난 작업이 없으면 default_rtf를 씁니다.
+      단계별 처리 시간의 합으로 잰 배율이므로, 단계가 겹쳐 실행되는 파이프라인에서는 실제보다 조금 길게(보수적으로) 나옵니다.
+    """
+
+    def __init__(
+        self,
+        max_jobs: int,
+        max_wait_seconds: float = None,
+        workers: int = 1,
+        default_rtf: float = 0.1,
+        rtf_source=None
+    ):
+        self.max_jobs = max_jobs
+        self.max_wait_seconds = max_wait_seconds
+        self.workers = max(1, workers)
+        self.default_rtf = default_rtf
+        self.rtf_source = rtf_source
+        self._tickets = OrderedDict() # 표 -> {"key", "duration", "admitted_at", "started_at"}
+        self._lock = threading.Lock()
+        self.rejected_total = 0
+
+    def real_time_factor(self) -> float:
+        rtf = self.rtf_source() if self.rtf_source is not None else None
+        return rtf if rtf else self.default_rtf
+
+    def _backlog(self, rtf: float, now: float):
+        """(시작하지 않은 작업 수, 대기 중인 오디오 길이, 남은 처리 예상 시간 - 워커 하나 기준)"""
+        waiting, waiting_audio, work = 0, 0.0, 0.0
+        for ticket in self._tickets.values():
+            expected = ticket["duration"] * rtf
+            if ticket["started_at"] is None:
+                waiting += 1
+                waiting_audio += ticket["duration"]
+                work += expected
+            else:
+                work += max(0.0, expected - (now - ticket["started_at"]))
+        return waiting, waiting_audio, work
+
+    def _estimate(self, durations: list) -> dict:
+        """지금 durations(초) 길이의 작업들을 넣으면 언제 시작/완료될지 (잠금을 잡은 상태에서 호출)"""
+        rtf = self.real_time_factor()
+        now = time.monotonic()
+        waiting, waiting_audio, work = self._backlog(rtf, now)
+        wait = work / self.workers
+        finish = (work + sum(durations) * rtf) / self.workers
+        return {
+            "queued_jobs": waiting,
+            "queued_audio_seconds": round(waiting_audio, 1),
+            "real_time_factor": round(rtf, 4),
+            "estimated_wait_seconds": round(wait, 1),
+            "estimated_finish_seconds": round(finish, 1),
+            "estimated_finish_at": round(time.time() + finish, 1), # 유닉스 시각
+        }
+
+    def _retry_after(self, rtf: float) -> int:
+        """처리 중인 작업 중 가장 먼저 끝날 작업이 끝나는 예상 시간 (자리가 나는 시점, 최소 5초)"""
+        now = time.monotonic()
+        remaining = [
+            ticket["duration"] * rtf - (now - ticket["started_at"])
+            for ticket in self._tickets.values() if ticket["started_at"] is not None
+        ]
+        return max(5, math.ceil(min(remaining, default=0.0)))
+
+    def estimate(self, duration: float = 0.0) -> dict:
+        with self._lock:
+            return self._estimate([duration])
+
+    def check(self, count: int = 1):
+        """작업 count개를 더 받을 자리가 있는지 확인만 합니다. (없으면 QueueFull)"""
+        with self._lock:
+            self._check([0.0] * count)
+
+    def _check(self, durations: list):
+        estimate = self._estimate(durations)
+        reason = None
+        if estimate["queued_jobs"] + len(durations) > self.max_jobs:
+            reason = f"Queue is full ({estimate['queued_jobs']} jobs waiting, max {self.max_jobs})."
+        elif self.max_wait_seconds is not None and estimate["estimated_wait_seconds"] > self.max_wait_seconds:
+            reason = f"Estimated wait {estimate['estimated_wait_seconds']:.0f}s exceeds {self.max_wait_seconds:.0f}s."
+        if reason is not None:
+            self.rejected_total += 1
+            retry_after = self._retry_after(estimate["real_time_factor"])
+            if self.max_wait_seconds is not None:
+                retry_after = max(retry_after, math.ceil(estimate["estimated_wait_seconds"] - self.max_wait_seconds))
+            raise QueueFull(reason, retry_after, estimate)
+        return estimate
+
+    def admit(self, entries: list, force: bool = False):
+        """
+        entries : [(작업 키, 오디오 길이(초) - 모르면 0), ...] - 모두 받거나 하나도 받지 않음 (배치 제출)
+        force=True이면 제한을 넘어도 받습니다. (이미 업로드가 끝난 파일, 재시작 후 복구하는 작업 등)
+        반환값: (표 목록, 마지막 작업 기준 예상치)
+        """
+        durations = [duration for _, duration in entries]
+        with self._lock:
+            estimate = self._estimate(durations) if force else self._check(durations)
+            now = time.monotonic()
+            tickets = []
+            for key, duration in entries:
+                ticket = uuid.uuid4().hex
+                self._tickets[ticket] = {"key": key, "duration": duration, "admitted_at": now, "started_at": None}
+                tickets.append(ticket)
+        return tickets, estimate
+
+    def start(self, ticket: str):
+        with self._lock:
+            entry = self._tickets.get(ticket)
+            if entry is not None:
+                entry["started_at"] = time.monotonic()
+
+    def finish(self, ticket: str):
+        if ticket is None:
+            return
+        with self._lock:
+            self._tickets.pop(ticket, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            estimate = self._estimate([])
+            running = sum(1 for ticket in self._tickets.values() if ticket["started_at"] is not None)
+        return {
+            "max_jobs": self.max_jobs,
+            "max_wait_seconds": self.max_wait_seconds,
+            "queued_jobs": estimate["queued_jobs"],
+            "running_jobs": running,
+            "queued_audio_seconds": estimate["queued_audio_seconds"],
+            "real_time_factor": estimate["real_time_factor"],
+            "estimated_drain_seconds": estimate["estimated_wait_seconds"], # 지금 있는 작업이 모두 끝나는 예상 시간
+            "rejected_total": self.rejected_total,
+        }
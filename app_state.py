@@ -1,8 +1,72 @@
 # /app_state.py
 import asyncio
 
-# UI용 결과 저장을 위한 전역 딕셔너리
-job_results = {}
+from config import (
+    JOB_RESULT_DB_PATH, JOB_RESULT_TTL_SECONDS, JOB_RESULT_MAX_BYTES, JOB_RESULT_MEMORY_ENTRIES,
+    CALLBACK_OUTBOX_DIR, CALLBACK_TIMEOUT_SECONDS, CALLBACK_MAX_ATTEMPTS, CALLBACK_BACKOFF_BASE_SECONDS,
+    CALLBACK_BACKOFF_MAX_SECONDS, CALLBACK_CONCURRENCY, CALLBACK_BATCH_MAX, JOB_LOG_PATH,
+    BATCH_MANIFEST_DIR, FANOUT_WINDOW_SECONDS, PIPELINE_WORKER_DEVICES,
+    ADMISSION_MAX_QUEUED_JOBS, ADMISSION_MAX_WAIT_SECONDS, ADMISSION_DEFAULT_REAL_TIME_FACTOR,
+    JOB_JOURNAL_DB_PATH, JOB_JOURNAL_RETENTION_SECONDS
+)
+from job_store import JobResultStore
+from progress import ProgressHub
+from callbacks import CallbackDispatcher
+from metrics import PipelineMetrics
+from batches import BatchTracker
+from fanout import SourceFanOut
+from inflight import InFlightJobs
+from admission import AdmissionControl
+from journal import JobJournal
 
-# 작업 큐
-job_queue = asyncio.Queue()
\ No newline at end of file
+# UI용 결과 저장소 (SQLite 파일 + 최근 결과 메모리 LRU)
+job_results = JobResultStore(
+    JOB_RESULT_DB_PATH,
+    ttl_seconds=JOB_RESULT_TTL_SECONDS,
+    max_bytes=JOB_RESULT_MAX_BYTES,
+    memory_entries=JOB_RESULT_MEMORY_ENTRIES
+)
+
+# 작업 진행 상황 push(SSE)용 허브
+progress_hub = ProgressHub()
+
+# CMS 완료 콜백 발송기 (재시도 + 디스크 outbox)
+callback_dispatcher = CallbackDispatcher(
+    CALLBACK_OUTBOX_DIR,
+    timeout_seconds=CALLBACK_TIMEOUT_SECONDS,
+    max_attempts=CALLBACK_MAX_ATTEMPTS,
+    backoff_base=CALLBACK_BACKOFF_BASE_SECONDS,
+    backoff_max=CALLBACK_BACKOFF_MAX_SECONDS,
+    concurrency=CALLBACK_CONCURRENCY,
+    batch_max=CALLBACK_BATCH_MAX
+)
+
+# 단계별 처리 시간/큐 대기 시간/작업 결과 메트릭 (/metrics)과 작업별 구조화 로그
+metrics = PipelineMetrics(JOB_LOG_PATH)
+
+# 배치 제출(/speaker-batch)별 진행 상황과 결과 매니페스트
+batch_tracker = BatchTracker(BATCH_MANIFEST_DIR, progress_hub)
+
+# 대기/처리 중인 작업 색인 (CMS가 같은 요청을 다시 보내면 기존 작업에 합류)
+inflight_jobs = InFlightJobs()
+
+# 화자분리 대기열 제한과 대기/완료 예상 시간 (지난 작업의 실시간 배율 기준)
+admission = AdmissionControl(
+    ADMISSION_MAX_QUEUED_JOBS,
+    max_wait_seconds=ADMISSION_MAX_WAIT_SECONDS,
+    workers=len(PIPELINE_WORKER_DEVICES),
+    default_rtf=ADMISSION_DEFAULT_REAL_TIME_FACTOR,
+    rtf_source=metrics.real_time_factor
+)
+
+# 접수한 작업과 상태 변화 기록 (재시작 후 끝나지 않은 작업을 다시 실행)
+job_journal = JobJournal(JOB_JOURNAL_DB_PATH, JOB_JOURNAL_RETENTION_SECONDS)
+
+# 작업 큐 (레인별로 분리 - 짧은 오디오 변환이 긴 화자분리 작업 뒤에서 기다리지 않도록)
+# 화자분리 레인의 크기는 입장 제어(admission)가 제한하므로 큐 자체는 크기 제한 없음
+# (업로드처럼 제한을 넘어 강제로 받은 작업을 넣을 때 요청 처리가 큐 자리를 기다리며 멈추지 않도록)
+job_queue = asyncio.Queue() # 화자분리 레인
+convert_queue = asyncio.Queue() # 오디오 변환 레인
+
+# 같은 영상의 오디오 변환/화자분리 요청을 모아 변환 레인에서 ffmpeg 한 번으로 처리
+source_fanout = SourceFanOut(FANOUT_WINDOW_SECONDS, convert_queue.put_nowait)
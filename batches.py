@@ -0,0 +1,125 @@
+# /batches.py
+import os
+import json
+import time
+import threading
+from pathlib import Path
+from collections import OrderedDict
+
+class BatchTracker:
+    """
+    녹화본 여러 개를 한 번에 제출한 배치(/speaker-batch)의 진행 상황을 모으는 저장소.
+
+    - 작업이 끝날 때마다 job_finished()로 알려 주면 배치 전체 진행률을 progress_hub로 알립니다.
+      (/job-events/{배치 키}로 구독 가능)
+    - 마지막 작업이 끝나면 녹화본별 결과를 manifest_dir/<배치 키>.json 으로 저장하고 요약을 반환합니다.
+    - 최근 max_batches개 배치만 메모리에 보관합니다.
+    """
+
+    def __init__(self, manifest_dir: str, progress_hub=None, max_batches: int = 200):
+        self.manifest_dir = Path(manifest_dir)
+        self.manifest_dir.mkdir(parents=True, exist_ok=True)
+        self.progress_hub = progress_hub
+        self.max_batches = max_batches
+        self._batches = OrderedDict() # 배치 키 -> 배치 상태
+        self._lock = threading.Lock()
+
+    def create(self, batch_key: str, items: list, callback: str) -> dict:
+        """
+        items : [{"key": 작업 키, "path": 녹화본 경로, "status": "queued" 또는 "failed", "error": ...}, ...]
+        callback : "batch"(배치 완료 시 한 번), "each"(녹화본마다), "both"
+        반환한 요약의 remaining이 0이면(대기 중인 녹화본이 없으면) 배치는 이미 끝난 것입니다.
+        """
+        batch = {
+            "batch_key": batch_key,
+            "callback": callback,
+            "created_at": time.time(),
+            "finished_at": None,
+            "items": OrderedDict((item["key"], dict(item)) for item in items),
+        }
+        with self._lock:
+            self._batches[batch_key] = batch
+            self._batches.move_to_end(batch_key)
+            while len(self._batches) > self.max_batches:
+                self._batches.popitem(last=False)
+        summary, _ = self._update(batch_key)
+        return summary
+
+    def job_finished(self, batch_key: str, key: str, status: str, output_path: str = None, error: str = None):
+        """
+        배치에 속한 작업 하나가 끝났음을 기록합니다. (status: completed / cached / failed)
+        이 작업으로 배치가 끝났으면 요약(manifest_path 포함)을 반환하고, 아니면 None을 반환합니다.
+        """
+        with self._lock:
+            batch = self._batches.get(batch_key)
+            if batch is None or key not in batch["items"]:
+                return None
+            batch["items"][key].update({"status": status, "output_path": output_path, "error": error})
+        summary, finished = self._update(batch_key)
+        return summary if finished else None
+
+    def _update(self, batch_key: str):
+        """진행 상황을 알리고, 방금 배치가 끝났으면 매니페스트를 저장합니다. 반환값: (요약, 방금 끝났는지 여부)"""
+        with self._lock:
+            batch = self._batches[batch_key]
+            summary = self._summary(batch)
+            finished = summary["remaining"] == 0 and batch["finished_at"] is None
+            if finished:
+                batch["finished_at"] = time.time()
+                summary = self._summary(batch)
+                items = [dict(item) for item in batch["items"].values()]
+        if finished:
+            batch["manifest_path"] = summary["manifest_path"] = str(
+                self._write_manifest(batch_key, {**summary, "items": items})
+            )
+        self._publish(summary)
+        return summary, finished
+
+    def get(self, batch_key: str, include_items: bool = True):
+        with self._lock:
+            batch = self._batches.get(batch_key)
+            if batch is None:
+                return None
+            summary = self._summary(batch)
+            if include_items:
+                summary["items"] = [dict(item) for item in batch["items"].values()]
+        return summary
+
+    @staticmethod
+    def _summary(batch: dict) -> dict:
+        counts = {"queued": 0, "completed": 0, "cached": 0, "failed": 0}
+        for item in batch["items"].values():
+            counts[item["status"]] = counts.get(item["status"], 0) + 1
+        total = len(batch["items"])
+        done = total - counts["queued"]
+        return {
+            "batch_key": batch["batch_key"],
+            "total": total,
+            "completed": counts["completed"],
+            "cached": counts["cached"],
+            "failed": counts["failed"],
+            "remaining": counts["queued"],
+            "progress": round(done / total, 4) if total else 1.0,
+            "callback": batch["callback"],
+            "created_at": batch["created_at"],
+            "finished_at": batch["finished_at"],
+            "manifest_path": batch.get("manifest_path"),
+        }
+
+    def _write_manifest(self, batch_key: str, manifest: dict) -> Path:
+        path = self.manifest_dir / f"{batch_key}.json"
+        tmp_path = path.with_name(f"{path.name}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+        return path.resolve() # 콜백을 받는 CMS가 바로 열 수 있도록 절대 경로
+
+    def _publish(self, summary: dict):
+        if self.progress_hub is None:
+            return
+        status = "completed" if summary["remaining"] == 0 else "processing"
+        self.progress_hub.publish(
+            summary["batch_key"], status,
+            progress=summary["progress"], total=summary["total"], completed=summary["completed"],
+            cached=summary["cached"], failed=summary["failed"], remaining=summary["remaining"]
+        )
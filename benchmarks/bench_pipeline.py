@@ -0,0 +1,358 @@
+# /benchmarks/bench_pipeline.py
+"""
+처리 파이프라인 벤치마크 (가짜 모델 사용 - GPU 불필요)
+
+ffmpeg 테스트 소스(testsrc + sine)로 만든 녹화본을 가짜 모델(benchmarks/stubs.py)로 처리하며 다음을 측정합니다.
+  - convert    : convert_video_to_audio(동기) 1건당 시간, 변환 레인(비동기 ffmpeg 동시 실행) 처리량,
+                 같은 영상의 mp3 + wav 변환 + 화자분리 오디오 추출을 따로 할 때와 ffmpeg 한 번으로 묶을 때(fanout)의 시간
+  - sequential : process_video_and_callback으로 한 건씩 처리할 때의 작업당 시간
+  - pipeline   : 화자분리 레인 + 워커 풀(단계별 파이프라인)로 여러 건을 넣었을 때의 처리량과 작업별 지연
+  - stages     : 단계별(extract/asr/align/diarize/finalize) 지연 (평균/p50/p95/최대, 묶음 ASR은 asr_batch)
+  - postprocess: 회의록/VTT 후처리 시간
+결과는 JSON으로 저장하여 버전 간 비교(--baseline)에 사용합니다.
+
+실행: python benchmarks/bench_pipeline.py --recordings 4 --seconds 120 --output bench.json
+      python benchmarks/bench_pipeline.py --baseline bench.json   (이전 결과 대비 변화율 출력)
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+from pathlib import Path
+
+import ffmpeg
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import stubs
+
+def make_recording(path: Path, seconds: float, frequency: int = 440, video: bool = True, silence_ratio: float = 0.0) -> Path:
+    """
+    ffmpeg 테스트 소스로 녹화본(mp4, 또는 video=False이면 wav)을 만듭니다.
+    silence_ratio를 주면 매 분 끝의 그만큼을 무음으로 만듭니다. (휴회 등 무음 건너뛰기 측정용)
+    """
+    audio = ffmpeg.input(f"sine=frequency={frequency}:sample_rate=44100:duration={seconds}", f="lavfi")
+    if silence_ratio > 0:
+        audio = audio.filter("volume", volume=0, enable=f"gte(mod(t,60),{60 * (1 - silence_ratio)})")
+    if video:
+        picture = ffmpeg.input(f"testsrc=size=320x240:rate=10:duration={seconds}", f="lavfi")
+        stream = ffmpeg.output(picture, audio, str(path), vcodec="mpeg4", acodec="aac", shortest=None)
+    else:
+        stream = ffmpeg.output(audio, str(path), acodec="pcm_s16le")
+    stream.overwrite_output().run(quiet=True)
+    return path
+
+def summarize(values: list) -> dict:
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+    return {
+        "count": len(ordered),
+        "mean": round(statistics.fmean(ordered), 4),
+        "p50": round(ordered[len(ordered) // 2], 4),
+        "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 4),
+        "max": round(ordered[-1], 4),
+    }
+
+class StageTimer:
+    """DIARIZE_STAGES의 단계 함수를 감싸 단계별 실행 시간을 기록합니다."""
+
+    def __init__(self):
+        self.timings = {}
+
+    def wrap(self, name, fn):
+        def timed(job):
+            started = time.perf_counter()
+            try:
+                return fn(job)
+            finally:
+                self.timings.setdefault(name, []).append(time.perf_counter() - started)
+        return timed
+
+    def report(self) -> dict:
+        return {name: summarize(values) for name, values in self.timings.items()}
+
+class CallbackRecorder:
+    """send_completion_callback 대신 호출되어 완료 시각을 기록합니다. (실제 HTTP 요청 없음)"""
+
+    def __init__(self):
+        self.completed = {}
+        self.failed = {}
+        self._waiters = {}
+
+    def __call__(self, url, success, key, path, error="", extra_params=None):
+        (self.completed if success else self.failed)[key] = time.perf_counter()
+        waiter = self._waiters.pop(key, None)
+        if waiter is not None:
+            loop, future = waiter
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(success))
+
+    def wait_for(self, key: str) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        if key in self.completed or key in self.failed:
+            future.set_result(key in self.completed)
+        else:
+            self._waiters[key] = (loop, future)
+        return future
+
+def diarize_params(video_path: Path, key: str, tasks) -> dict:
+    return {
+        "video_path": str(video_path),
+        "key": key,
+        "save_to_file": True,
+        "model_name": tasks.DEFAULT_MODEL_SIZE,
+        "device": "cpu",
+        "compute_type": "int8",
+        "diarization_params": {"threshold": 0.7, "min_duration_off": 0.2, "min_speakers": 2, "max_speakers": 4},
+    }
+
+def bench_convert(tasks, recordings: list, concurrency: int) -> dict:
+    """동기 변환 1건씩 + 변환 레인으로 전체를 동시에 변환했을 때의 처리량"""
+    from processor.pipeline import Lane
+
+    sync_seconds = {}
+    for output_type in ("mp3", "wav"):
+        timings = []
+        for index, recording in enumerate(recordings):
+            started = time.perf_counter()
+            tasks.convert_video_to_audio(str(recording), f"convert-{output_type}-{index}", output_type)
+            timings.append(time.perf_counter() - started)
+        sync_seconds[output_type] = summarize(timings)
+
+    async def run_lane():
+        queue = asyncio.Queue()
+        lane = Lane("convert", queue, lambda item: tasks.convert_video_to_audio_async(**item["params"]), concurrency)
+        lane.start()
+        started = time.perf_counter()
+        for index, recording in enumerate(recordings):
+            await queue.put({"params": {"video_path": str(recording), "key": f"lane-{index}", "output_type": "mp3"}})
+        await queue.join()
+        elapsed = time.perf_counter() - started
+        await lane.stop()
+        return elapsed
+
+    async def run_separate(recording: Path):
+        await tasks.convert_video_to_audio_async(str(recording), "separate-mp3", "mp3")
+        await tasks.convert_video_to_audio_async(str(recording), "separate-wav", "wav")
+        tasks.release_audio(await asyncio.to_thread(tasks.decode_audio, str(recording)))
+
+    async def run_fanout(recording: Path):
+        from app_state import job_queue
+
+        converts = [{"key": "fanout-mp3", "output_type": "mp3"}, {"key": "fanout-wav", "output_type": "wav"}]
+        await tasks.convert_fanout_async(str(recording), converts, [{"params": {}}])
+        audio_path = job_queue.get_nowait()["params"]["audio_path"]
+        tasks.release_audio(await asyncio.to_thread(tasks.decode_audio, audio_path))
+        Path(audio_path).unlink()
+
+    shared_decode = {}
+    for name, run in (("separate", run_separate), ("fanout", run_fanout)):
+        timings = []
+        for recording in recordings:
+            started = time.perf_counter()
+            asyncio.run(run(recording))
+            timings.append(time.perf_counter() - started)
+        shared_decode[name] = summarize(timings)
+
+    lane_seconds = asyncio.run(run_lane())
+    return {
+        "sync_seconds": sync_seconds,
+        "lane_concurrency": concurrency,
+        "lane_total_seconds": round(lane_seconds, 4),
+        "lane_jobs_per_second": round(len(recordings) / lane_seconds, 4),
+        # mp3 + wav + 화자분리용 PCM: 따로 3번 디코딩 vs ffmpeg 한 번
+        "shared_decode_seconds": shared_decode,
+    }
+
+def bench_sequential(tasks, recordings: list, recorder: CallbackRecorder) -> dict:
+    """process_video_and_callback으로 한 건씩 처리"""
+    timings = []
+    for index, recording in enumerate(recordings):
+        params = diarize_params(recording, f"sequential-{index}", tasks)
+        started = time.perf_counter()
+        tasks.process_video_and_callback(**params)
+        timings.append(time.perf_counter() - started)
+    return {"job_seconds": summarize(timings), "failed": sum(key.startswith("sequential-") for key in recorder.failed)}
+
+async def bench_pipeline(
+    tasks, recordings: list, recorder: CallbackRecorder, devices: list, queue_size: int, asr_batch_jobs: int
+) -> dict:
+    """화자분리 레인 → 워커 풀 경로로 모든 녹화본을 한꺼번에 넣었을 때의 처리량과 작업별 지연"""
+    from processor.pipeline import WorkerPool, Lane
+    from app_state import progress_hub
+
+    progress_hub.bind_loop(asyncio.get_running_loop())
+    pool = WorkerPool(
+        tasks.DIARIZE_STAGES, queue_size, devices, share_models=False,
+        batch_stages=tasks.DIARIZE_BATCH_STAGES if asr_batch_jobs > 1 else None, batch_max=asr_batch_jobs
+    )
+    for device, replica in pool.model_slots():
+        await asyncio.to_thread(tasks.load_all_models, device=device, compute_type="int8", replica=replica)
+    pool.start()
+    queue = asyncio.Queue()
+    lane = Lane("diarize", queue, lambda item: pool.dispatch(item["params"]), concurrency=1)
+    lane.start()
+
+    submitted = {}
+    waiters = []
+    started = time.perf_counter()
+    for index, recording in enumerate(recordings):
+        key = f"pipeline-{index}"
+        waiters.append(recorder.wait_for(key))
+        submitted[key] = time.perf_counter()
+        await queue.put({"params": diarize_params(recording, key, tasks)})
+    outcomes = await asyncio.gather(*waiters)
+    elapsed = time.perf_counter() - started
+
+    await lane.stop()
+    await pool.stop()
+    latencies = [recorder.completed[key] - submitted[key] for key in submitted if key in recorder.completed]
+    return {
+        "workers": devices,
+        "asr_batch_jobs": asr_batch_jobs,
+        "total_seconds": round(elapsed, 4),
+        "jobs_per_second": round(len(recordings) / elapsed, 4),
+        "job_latency_seconds": summarize(latencies),
+        "failed": outcomes.count(False),
+    }
+
+def bench_postprocess(segments: int) -> dict:
+    from bench_postprocess import make_segments
+    from processor.postprocess import generate_transcript_outputs
+
+    result = {"segments": make_segments(segments)}
+    started = time.perf_counter()
+    generate_transcript_outputs(result)
+    return {"segments": segments, "seconds": round(time.perf_counter() - started, 4)}
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def _flatten(data: dict, prefix: str = "") -> dict:
+    flat = {}
+    for key, value in data.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+def compare(report: dict, baseline: dict):
+    """이전 결과 대비 측정값 변화율을 출력합니다. (시간 항목은 + 가 느려진 것)"""
+    current = _flatten(report["results"])
+    previous = _flatten(baseline.get("results", {}))
+    print(f"\n기준 {baseline.get('revision')} → 현재 {report['revision']}")
+    for name in sorted(current.keys() & previous.keys()):
+        if previous[name]:
+            change = (current[name] - previous[name]) / previous[name] * 100
+            print(f"  {name:60s} {previous[name]:>12} → {current[name]:>12} ({change:+.1f}%)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--recordings", type=int, default=4, help="녹화본 개수")
+    parser.add_argument("--seconds", type=float, default=120, help="녹화본 길이 (초)")
+    parser.add_argument("--asr-rtf", type=float, default=0.02, help="가짜 ASR 지연 (오디오 1초당 초)")
+    parser.add_argument("--align-rtf", type=float, default=0.005)
+    parser.add_argument("--diarize-rtf", type=float, default=0.01)
+    parser.add_argument("--load-seconds", type=float, default=0.0, help="가짜 모델 로딩 시간 (초)")
+    parser.add_argument("--asr-call-seconds", type=float, default=0.0, help="가짜 ASR 호출당 고정 비용 (초)")
+    parser.add_argument("--workers", nargs="+", default=["cpu"], help="워커 장치 목록 (예: cpu cpu)")
+    parser.add_argument("--queue-size", type=int, default=2, help="파이프라인 단계 사이 큐 크기")
+    parser.add_argument("--asr-batch-jobs", type=int, help="ASR 단계에서 묶을 최대 작업 수 (1이면 묶지 않음, 기본: 설정값)")
+    parser.add_argument("--convert-concurrency", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--window-seconds", type=float, help="지정하면 구간 단위 처리 모드로 강제 (구간 길이)")
+    parser.add_argument("--with-cache", action="store_true", help="결과/중간 산출물 캐시를 켠 채로 측정")
+    parser.add_argument("--silence-ratio", type=float, default=0.0, help="녹화본에서 무음이 차지하는 비율 (매 분 끝부분)")
+    parser.add_argument("--no-vad", action="store_true", help="무음 건너뛰기(VAD)를 끄고 측정")
+    parser.add_argument("--postprocess-segments", type=int, default=50000)
+    parser.add_argument("--skip", nargs="*", default=[], choices=["convert", "sequential", "pipeline", "postprocess"])
+    parser.add_argument("--keep-workdir", action="store_true", help="녹화본/결과 파일이 있는 임시 폴더를 지우지 않음")
+    parser.add_argument("--output", help="결과 JSON 파일 경로")
+    parser.add_argument("--baseline", help="비교할 이전 결과 JSON 파일")
+    args = parser.parse_args()
+
+    # app_state/캐시가 만드는 DB, outbox, 캐시 파일과 변환 결과를 모두 임시 폴더에 둠
+    workdir = Path(tempfile.mkdtemp(prefix="ailivegate-bench-"))
+    output_path = Path(args.output).resolve() if args.output else None
+    baseline_path = Path(args.baseline).resolve() if args.baseline else None
+    os.chdir(workdir)
+
+    stubs.install_whisperx_stub()
+    from processor import tasks
+
+    tasks.MODEL_POOL.loaders = stubs.make_loaders(
+        args.asr_rtf, args.align_rtf, args.diarize_rtf, args.load_seconds, args.asr_call_seconds
+    )
+    if not args.with_cache:
+        tasks.RESULT_CACHE = None
+        tasks.ARTIFACT_STORE = None
+    if args.no_vad:
+        tasks.VAD_SETTINGS = None
+    if args.window_seconds:
+        tasks.WINDOWED_MIN_SECONDS = 0
+        tasks.WINDOW_SECONDS = args.window_seconds
+        tasks.WINDOW_OVERLAP_SECONDS = min(tasks.WINDOW_OVERLAP_SECONDS, args.window_seconds / 4)
+    recorder = CallbackRecorder()
+    tasks.send_completion_callback = recorder
+    timer = StageTimer()
+    tasks.DIARIZE_STAGES[:] = [(name, timer.wrap(name, fn)) for name, fn in tasks.DIARIZE_STAGES]
+    tasks.DIARIZE_BATCH_STAGES.update({
+        name: (timer.wrap(f"{name}_batch", batch_fn), plan_fn) for name, (batch_fn, plan_fn) in tasks.DIARIZE_BATCH_STAGES.items()
+    })
+    if args.asr_batch_jobs is None:
+        args.asr_batch_jobs = tasks.ASR_BATCH_MAX_JOBS
+
+    print(f"녹화본 {args.recordings}개 생성 중 ({args.seconds:.0f}초, 작업 폴더: {workdir})")
+    recordings = [
+        make_recording(workdir / f"recording_{i}.mp4", args.seconds, frequency=300 + 40 * i, silence_ratio=args.silence_ratio)
+        for i in range(args.recordings)
+    ]
+
+    results = {}
+    if "convert" not in args.skip:
+        results["convert"] = bench_convert(tasks, recordings, args.convert_concurrency)
+    if "sequential" not in args.skip:
+        results["sequential"] = bench_sequential(tasks, recordings, recorder)
+    if "pipeline" not in args.skip:
+        results["pipeline"] = asyncio.run(bench_pipeline(
+            tasks, recordings, recorder, args.workers, args.queue_size, args.asr_batch_jobs
+        ))
+    results["stages"] = timer.report()
+    if "postprocess" not in args.skip:
+        results["postprocess"] = bench_postprocess(args.postprocess_segments)
+
+    report = {
+        "benchmark": "pipeline",
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "settings": {key: value for key, value in vars(args).items() if key not in ("output", "baseline", "keep_workdir")},
+        "results": results,
+    }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if output_path:
+        output_path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    if baseline_path:
+        compare(report, json.loads(baseline_path.read_text(encoding="utf-8")))
+    if not args.keep_workdir:
+        os.chdir(REPO_ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
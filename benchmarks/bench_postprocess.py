@@ -0,0 +1,113 @@
+# /benchmarks/bench_postprocess.py
+"""
+후처리(회의록 TXT + VTT 생성) 벤치마크
+
+기존 방식(generate_formatted_transcript + generate_vtt_content, 두 번 순회)과
+한 번 순회 방식(generate_transcript_outputs)의 결과가 바이트 단위로 같은지 확인하고 실행 시간을 비교합니다.
+
+실행: python benchmarks/bench_postprocess.py [--segments 50000] [--repeat 5] [--output result.json]
+"""
+import sys
+import json
+import time
+import copy
+import random
+import argparse
+import platform
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from processor.postprocess import generate_formatted_transcript, generate_vtt_content, generate_transcript_outputs
+
+WORDS = ["안녕하세요", "회의를", "시작하겠습니다", "네", "감사합니다", "의견", "있으신가요", "다음", "안건은", "예산", "입니다", "좋습니다"]
+
+def make_segments(count: int, seed: int = 0) -> list:
+    """화자 전환, 짧은 발언, UNKNOWN 화자, 화자 정보 없는 세그먼트가 섞인 가짜 whisperx 세그먼트를 만듭니다."""
+    rng = random.Random(seed)
+    speakers = [f"SPEAKER_{i:02d}" for i in range(8)]
+    segments = []
+    now = 0.0
+    speaker = speakers[0]
+    for _ in range(count):
+        now += rng.choice([0.0, 0.1, 0.5, 1.5, 2.5, 4.0])
+        duration = rng.uniform(0.3, 12.0)
+        if rng.random() < 0.3:
+            speaker = rng.choice(speakers)
+        # whisperx는 보통 소수점 셋째 자리까지 반올림한 값을 주지만, 반올림하지 않은 값도 섞어 둠
+        digits = 3 if rng.random() < 0.8 else None
+        seg = {
+            "start": round(now, digits) if digits else now,
+            "end": round(now + duration, digits) if digits else now + duration,
+            "text": " " + " ".join(rng.choice(WORDS) for _ in range(rng.choice([1, 2, 3, 4, 8, 20]))) + " ",
+        }
+        roll = rng.random()
+        if roll < 0.05:
+            seg["speaker"] = "UNKNOWN"
+        elif roll > 0.98:
+            pass # 화자 정보 없음
+        else:
+            seg["speaker"] = speaker
+        segments.append(seg)
+        now += duration
+    return segments
+
+def legacy(result: dict):
+    return generate_formatted_transcript(result), generate_vtt_content(result)
+
+def single_pass(result: dict):
+    return generate_transcript_outputs(result)
+
+def best_of(fn, result: dict, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        data = copy.deepcopy(result) # 기존 함수는 세그먼트를 수정하므로 매번 새로 복사
+        started = time.perf_counter()
+        fn(data)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+def check_equivalence(trials: int, seed: int = 1) -> int:
+    """작은 무작위 입력 여러 개에서 두 방식의 결과가 같은지 확인하고, 다른 경우의 수를 반환합니다."""
+    rng = random.Random(seed)
+    mismatches = 0
+    for trial in range(trials):
+        result = {"segments": make_segments(rng.randint(0, 30), seed=seed * 100000 + trial)}
+        if legacy(copy.deepcopy(result)) != single_pass(copy.deepcopy(result)):
+            mismatches += 1
+    return mismatches
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--segments", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--trials", type=int, default=500, help="무작위 동일성 검사 횟수")
+    parser.add_argument("--output", help="결과를 저장할 JSON 파일 경로 (없으면 표준 출력만)")
+    args = parser.parse_args()
+
+    result = {"segments": make_segments(args.segments)}
+    identical = legacy(copy.deepcopy(result)) == single_pass(copy.deepcopy(result))
+    mismatches = check_equivalence(args.trials)
+    legacy_seconds = best_of(legacy, result, args.repeat)
+    single_pass_seconds = best_of(single_pass, result, args.repeat)
+
+    report = {
+        "benchmark": "postprocess",
+        "python": platform.python_version(),
+        "segments": args.segments,
+        "repeat": args.repeat,
+        "identical": identical and mismatches == 0,
+        "random_trials": args.trials,
+        "random_mismatches": mismatches,
+        "legacy_seconds": round(legacy_seconds, 4),
+        "single_pass_seconds": round(single_pass_seconds, 4),
+        "speedup": round(legacy_seconds / single_pass_seconds, 2) if single_pass_seconds else None,
+    }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    if not report["identical"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
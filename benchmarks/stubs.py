@@ -0,0 +1,186 @@
+# /benchmarks/stubs.py
+"""
+벤치마크용 가짜 모델 (CPU에서 결정적으로 동작하며, 오디오 길이에 비례한 지연만 흉내 냄)
+
+지연은 rtf(real-time factor, 오디오 1초당 처리 시간 초)로 지정합니다.
+예: asr_rtf=0.05 이면 10분짜리 녹화본의 ASR에 30초가 걸립니다.
+"""
+import sys
+import time
+import types
+from collections import namedtuple
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+WORDS = ["안녕하세요", "회의를", "시작하겠습니다", "네", "감사합니다", "의견", "있으신가요", "다음", "안건은", "예산", "입니다"]
+
+def _audio_seconds(audio) -> float:
+    return len(audio) / SAMPLE_RATE
+
+class StubASRModel:
+    """
+    whisperx FasterWhisperPipeline 대신 쓰는 ASR 모델 - 소리가 있는 구간에서 segment_seconds마다 세그먼트 하나를 만듭니다.
+    whisperx가 내부 VAD로 말소리 구간만 모델에 넣는 것처럼, 디지털 무음(0에 가까운 샘플) 프레임은 처리 시간에 넣지 않습니다.
+    """
+
+    frame_seconds = 0.5
+
+    def __init__(self, rtf: float, segment_seconds: float = 4.0, call_seconds: float = 0.0):
+        self.rtf = rtf
+        self.segment_seconds = segment_seconds
+        self.call_seconds = call_seconds # 호출당 고정 비용 (VAD, 특징 추출 준비 등)
+
+    def _voiced_runs(self, audio) -> list:
+        """소리가 있는 프레임이 이어진 구간 [(시작 초, 끝 초), ...]"""
+        frame_length = int(self.frame_seconds * SAMPLE_RATE)
+        seconds = _audio_seconds(audio)
+        runs = []
+        for first in range(0, len(audio), frame_length):
+            if np.abs(np.asarray(audio[first:first + frame_length])).max() < 1e-4:
+                continue
+            start = first / SAMPLE_RATE
+            end = min(start + self.frame_seconds, seconds)
+            if runs and runs[-1][1] == start:
+                runs[-1] = (runs[-1][0], end)
+            else:
+                runs.append((start, end))
+        return runs
+
+    def transcribe(self, audio, language=None, batch_size=16, **kwargs):
+        runs = self._voiced_runs(audio)
+        time.sleep(self.call_seconds + sum(end - start for start, end in runs) * self.rtf)
+        segments = []
+        index = 0
+        for run_start, run_end in runs:
+            start = run_start
+            while start < run_end:
+                end = min(start + self.segment_seconds * 0.9, run_end)
+                # 단어 수를 1~5개로 바꿔 가며 짧은 발언 병합 규칙도 실행되게 함
+                words = [WORDS[(index + i) % len(WORDS)] for i in range(index % 5 + 1)]
+                segments.append({"start": round(start, 3), "end": round(end, 3), "text": " " + " ".join(words)})
+                start += self.segment_seconds
+                index += 1
+        return {"segments": segments, "language": language}
+
+class StubAlignModel:
+    def __init__(self, rtf: float):
+        self.rtf = rtf
+
+def align(segments, model, metadata, audio, device, return_char_alignments=False, **kwargs):
+    """whisperx.align 대신 - 세그먼트 안에서 단어 타임스탬프를 균등하게 나눕니다."""
+    time.sleep(_audio_seconds(audio) * model.rtf)
+    aligned = []
+    word_segments = []
+    for seg in segments:
+        words = seg["text"].split()
+        step = (seg["end"] - seg["start"]) / max(len(words), 1)
+        seg_words = [
+            {"word": word, "start": round(seg["start"] + i * step, 3), "end": round(seg["start"] + (i + 1) * step, 3), "score": 1.0}
+            for i, word in enumerate(words)
+        ]
+        aligned.append({"start": seg["start"], "end": seg["end"], "text": seg["text"], "words": seg_words})
+        word_segments.extend(seg_words)
+    return {"segments": aligned, "word_segments": word_segments}
+
+def assign_word_speakers(diarize_df, result, fill_nearest=False):
+    """whisperx.assign_word_speakers 대신 - 가장 많이 겹치는 화자 구간의 화자를 지정합니다."""
+    starts = diarize_df["start"].to_numpy()
+    ends = diarize_df["end"].to_numpy()
+    speakers = diarize_df["speaker"].tolist()
+
+    def best_speaker(start, end):
+        overlap = np.minimum(ends, end) - np.maximum(starts, start)
+        if len(overlap) == 0 or overlap.max() <= 0:
+            return None
+        return speakers[int(overlap.argmax())]
+
+    for seg in result["segments"]:
+        speaker = best_speaker(seg["start"], seg["end"])
+        if speaker is not None:
+            seg["speaker"] = speaker
+        for word in seg.get("words", []):
+            speaker = best_speaker(word["start"], word["end"])
+            if speaker is not None:
+                word["speaker"] = speaker
+    return result
+
+StubSegment = namedtuple("StubSegment", ["start", "end"])
+
+class StubAnnotation:
+    def __init__(self, turns: list):
+        self.turns = turns
+
+    def itertracks(self, yield_label=False):
+        for index, (start, end, speaker) in enumerate(self.turns):
+            yield (StubSegment(start, end), index, speaker) if yield_label else (StubSegment(start, end), index)
+
+class StubPyannotePipeline:
+    """
+    pyannote SpeakerDiarization 대신 - turn_seconds마다 화자를 바꿉니다.
+    training 모드에서는 세그멘테이션/임베딩 캐시를 흉내 내어, 재실행 시 클러스터링 비용(rtf의 20%)만 듭니다.
+    """
+
+    def __init__(self, rtf: float, turn_seconds: float = 30.0, speakers: int = 3):
+        self.rtf = rtf
+        self.turn_seconds = turn_seconds
+        self.speakers = speakers
+        self.training = False
+        self.clustering = types.SimpleNamespace(threshold=None)
+        self.segmentation = types.SimpleNamespace(min_duration_off=None)
+
+    def __call__(self, file, min_speakers=None, max_speakers=None, hook=None):
+        seconds = file["waveform"].shape[-1] / file["sample_rate"]
+        cached = "training_cache/segmentation" in file
+        time.sleep(seconds * self.rtf * (0.2 if cached else 1.0))
+        if self.training:
+            file["training_cache/segmentation"] = seconds
+            file["training_cache/embeddings"] = seconds
+        if hook is not None:
+            hook("embeddings", None, file=file)
+
+        turns = []
+        start = 0.0
+        index = 0
+        while start < seconds:
+            end = min(start + self.turn_seconds, seconds)
+            turns.append((start, end, f"SPEAKER_{index % self.speakers:02d}"))
+            start = end
+            index += 1
+        return StubAnnotation(turns)
+
+class StubDiarizationModel:
+    """whisperx DiarizationPipeline 대신 (run_diarization은 .model만 사용)"""
+
+    def __init__(self, rtf: float):
+        self.model = StubPyannotePipeline(rtf)
+
+def make_whisperx_module() -> types.ModuleType:
+    """작업 단계가 직접 호출하는 whisperx 함수(align, assign_word_speakers)의 가짜 모듈"""
+    module = types.ModuleType("whisperx")
+    module.align = align
+    module.assign_word_speakers = assign_word_speakers
+    return module
+
+def install_whisperx_stub():
+    """
+    작업 단계가 함수 안에서 import하는 whisperx를 가짜 모듈로 바꿉니다.
+    (whisperx가 설치되어 있지 않은 CPU 장비에서도 동작, 모델 로더는 make_loaders()로 따로 교체)
+    """
+    sys.modules["whisperx"] = make_whisperx_module()
+
+def make_loaders(
+    asr_rtf: float, align_rtf: float, diarize_rtf: float, load_seconds: float = 0.0, asr_call_seconds: float = 0.0
+) -> dict:
+    """ModelPool에 끼울 가짜 모델 로더 (load_seconds: 모델 로딩 시간, asr_call_seconds: ASR 호출당 고정 비용 흉내)"""
+    def loader(factory):
+        def load(name, device, compute_type, language):
+            time.sleep(load_seconds)
+            return factory()
+        return load
+
+    return {
+        "asr": loader(lambda: StubASRModel(asr_rtf, call_seconds=asr_call_seconds)),
+        "align": loader(lambda: {"model": StubAlignModel(align_rtf), "metadata": {}}),
+        "diarize": loader(lambda: StubDiarizationModel(diarize_rtf)),
+    }
@@ -0,0 +1,241 @@
+# /callbacks.py
+import json
+import os
+import time
+import uuid
+import random
+import asyncio
+import threading
+from pathlib import Path
+
+import requests
+from requests.adapters import HTTPAdapter
+
+class CallbackDispatcher:
+    """
+    CMS 완료 콜백을 작업 스레드 대신 이벤트 루프에서 보내는 비동기 발송기.
+
+    - enqueue()는 콜백을 outbox 폴더에 파일로 기록하고 바로 반환하므로, 작업 단계는 CMS 응답을 기다리지 않습니다.
+    - 실패하면 지수 백오프(backoff_base * 2^(시도-1), 최대 backoff_max)로 다시 보내고,
+      max_attempts번 실패하면 outbox/failed 폴더로 옮깁니다.
+    - 보내기 전까지 파일이 남아 있으므로 서버가 재시작되어도 콜백이 사라지지 않습니다.
+    - batch_max > 1 이면 같은 URL로 보낼 콜백 여러 개를 POST {"callbacks": [...]} 한 번으로 묶어 보냅니다.
+    """
+
+    def __init__(
+        self,
+        outbox_dir: str,
+        timeout_seconds: float,
+        max_attempts: int,
+        backoff_base: float,
+        backoff_max: float,
+        concurrency: int,
+        batch_max: int = 1
+    ):
+        self.outbox_dir = Path(outbox_dir)
+        self.failed_dir = self.outbox_dir / "failed"
+        self.failed_dir.mkdir(parents=True, exist_ok=True)
+        self.timeout_seconds = timeout_seconds
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.concurrency = max(1, concurrency)
+        self.batch_max = max(1, batch_max)
+
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self._pending = {}      # id -> 콜백 항목
+        self._in_flight = set() # 전송 중인 항목 id
+        self._lock = threading.Lock()
+        self._loop = None
+        self._wakeup = None
+        self._session = None
+        self._task = None
+
+    def enqueue(self, url: str, params: dict):
+        """콜백을 outbox에 기록하고 발송기를 깨웁니다. (어느 스레드에서든 호출 가능)"""
+        entry = {
+            "id": f"{time.time_ns()}-{uuid.uuid4().hex[:8]}",
+            "url": url,
+            "params": params,
+            "attempts": 0,
+            "next_attempt_at": 0.0,
+            "created_at": time.time(),
+            "last_error": None,
+        }
+        self._save(entry)
+        with self._lock:
+            self._pending[entry["id"]] = entry
+        print(f"콜백 대기열 추가: {url} with params {params}")
+        self._wake()
+
+    def _wake(self):
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def _entry_path(self, entry: dict) -> Path:
+        return self.outbox_dir / f"{entry['id']}.json"
+
+    def _save(self, entry: dict):
+        path = self._entry_path(entry)
+        tmp_path = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def _load_outbox(self):
+        """이전 실행에서 보내지 못한 콜백을 다시 불러옵니다."""
+        loaded = 0
+        for path in sorted(self.outbox_dir.glob("*.json")):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"콜백 outbox 파일을 읽지 못했습니다: {path} ({e})")
+                continue
+            entry["next_attempt_at"] = 0.0 # 재시작 후에는 바로 재시도
+            with self._lock:
+                self._pending.setdefault(entry["id"], entry)
+            loaded += 1
+        if loaded:
+            print(f"보내지 못한 콜백 {loaded}건을 outbox에서 불러왔습니다.")
+
+    async def start(self):
+        """발송 루프를 시작합니다. (서버 시작 시 호출)"""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        # 같은 CMS로 가는 요청은 연결을 재사용 (keep-alive)
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.concurrency, pool_maxsize=self.concurrency)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        await asyncio.to_thread(self._load_outbox)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """발송 루프를 멈춥니다. 보내지 못한 콜백은 outbox에 남아 다음 실행에서 다시 보냅니다."""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._session:
+            self._session.close()
+            self._session = None
+
+    def _take_due(self):
+        """지금 보낼 콜백 묶음 목록과, 다음 재시도까지 기다릴 시간(초)을 반환합니다."""
+        now = time.time()
+        due = {}
+        wait = None
+        with self._lock:
+            for entry_id, entry in self._pending.items():
+                if entry_id in self._in_flight:
+                    continue
+                if entry["next_attempt_at"] > now:
+                    delay = entry["next_attempt_at"] - now
+                    wait = delay if wait is None else min(wait, delay)
+                    continue
+                due.setdefault(entry["url"], []).append(entry)
+
+            batches = []
+            for entries in due.values():
+                for i in range(0, len(entries), self.batch_max):
+                    batch = entries[i:i + self.batch_max]
+                    self._in_flight.update(entry["id"] for entry in batch)
+                    batches.append(batch)
+        return batches, wait
+
+    async def _run(self):
+        print("--- 콜백 발송기 시작 ---")
+        semaphore = asyncio.Semaphore(self.concurrency)
+        in_flight = set()
+        while True:
+            self._wakeup.clear()
+            batches, wait = self._take_due()
+            for batch in batches:
+                task = asyncio.create_task(self._deliver(batch, semaphore))
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _deliver(self, batch: list, semaphore: asyncio.Semaphore):
+        async with semaphore:
+            try:
+                try:
+                    await asyncio.to_thread(self._send, batch)
+                    error = None
+                except Exception as e: # 네트워크 오류가 아닌 예상하지 못한 오류도 실패로 보고 재시도
+                    error = e
+                await asyncio.to_thread(self._record_result, batch, error)
+            finally:
+                # 결과 기록 중 오류가 나도 전송 중 표시는 풀어야 다음 재시도 대상이 됨
+                with self._lock:
+                    self._in_flight.difference_update(entry["id"] for entry in batch)
+        self._wakeup.set()
+
+    def _send(self, batch: list):
+        url = batch[0]["url"]
+        if len(batch) == 1:
+            params = batch[0]["params"]
+            print(f"콜백 전송 시도: {url} with params {params}")
+            response = self._session.get(url, params=params, timeout=self.timeout_seconds)
+        else:
+            print(f"콜백 묶음 전송 시도: {url} ({len(batch)}건)")
+            response = self._session.post(
+                url, json={"callbacks": [entry["params"] for entry in batch]}, timeout=self.timeout_seconds
+            )
+        response.raise_for_status()
+
+    def _record_result(self, batch: list, error):
+        for entry in batch:
+            try:
+                self._record_entry(entry, error)
+            except Exception as e:
+                # outbox 파일 저장/이동 실패 등 - 항목은 대기 목록에 남겨 두고 나중에 다시 전송
+                entry["next_attempt_at"] = time.time() + self.backoff_max
+                print(f"콜백 결과 기록 실패 (Key: {entry['params'].get('key')}): {type(e).__name__} - {e}")
+            finally:
+                with self._lock:
+                    self._in_flight.discard(entry["id"])
+
+    def _record_entry(self, entry: dict, error):
+        key = entry["params"].get("key")
+        if error is None:
+            print(f"콜백 전송 성공 (Key: {key})")
+            self._entry_path(entry).unlink(missing_ok=True)
+            with self._lock:
+                self._pending.pop(entry["id"], None)
+                self.sent += 1
+        else:
+            entry["attempts"] += 1
+            entry["last_error"] = str(error)
+            if entry["attempts"] >= self.max_attempts:
+                print(f"콜백 전송 최종 실패 (Key: {key}, {entry['attempts']}회 시도): {error}")
+                self._save(entry)
+                os.replace(self._entry_path(entry), self.failed_dir / f"{entry['id']}.json")
+                with self._lock:
+                    self._pending.pop(entry["id"], None)
+                    self.failed += 1
+            else:
+                delay = min(self.backoff_max, self.backoff_base * 2 ** (entry["attempts"] - 1))
+                delay *= random.uniform(0.8, 1.2) # 여러 콜백이 한꺼번에 재시도하지 않도록 분산
+                entry["next_attempt_at"] = time.time() + delay
+                print(f"콜백 전송 실패 (Key: {key}, {entry['attempts']}회째), {delay:.1f}초 후 재시도: {error}")
+                self._save(entry)
+                with self._lock:
+                    self.retries += 1
+
+    def stats(self) -> dict:
+        """대기 중/전송 중 콜백 수와 누적 성공/재시도/최종 실패 횟수를 반환합니다."""
+        with self._lock:
+            return {
+                "pending": len(self._pending),
+                "in_flight": len(self._in_flight),
+                "sent": self.sent,
+                "retries": self.retries,
+                "failed": self.failed,
+            }
@@ -2,6 +2,8 @@
 import os
 from dotenv import load_dotenv
 
+from hardware import detect_device, compute_type_for, is_cpu
+
 load_dotenv() # API key가져옴
 
 HF_TOKEN = os.getenv("HF_TOKEN")
@@ -10,11 +12,190 @@ HF_TOKEN = os.getenv("HF_TOKEN")
 # 작업 완료 후 호출할 CMS의 기본 URL
 SPEAKER_CALLBACK_URL = "http://127.0.0.1/speaker_sucess.php"
 AUDIO_CALLBACK_URL = "http://127.0.0.1/audio_sucess.php" # 새로 추가
+# 보내지 못한 콜백을 보관하는 폴더 (서버를 재시작해도 다시 보냄, 최종 실패분은 failed/ 하위 폴더로 이동)
+CALLBACK_OUTBOX_DIR = "cache/callback_outbox"
+CALLBACK_TIMEOUT_SECONDS = 10
+# 최대 전송 시도 횟수와 재시도 간격 (CALLBACK_BACKOFF_BASE_SECONDS * 2^(시도-1), 최대 CALLBACK_BACKOFF_MAX_SECONDS)
+CALLBACK_MAX_ATTEMPTS = 8
+CALLBACK_BACKOFF_BASE_SECONDS = 2
+CALLBACK_BACKOFF_MAX_SECONDS = 5 * 60
+# 동시에 보낼 콜백 수 (= 연결 풀 크기)
+CALLBACK_CONCURRENCY = 4
+# 같은 URL로 보낼 콜백을 최대 몇 건까지 묶어 보낼지 (1이면 묶지 않고 기존처럼 GET 쿼리로 전송)
+# 2 이상이면 여러 건이 밀려 있을 때 POST {"callbacks": [{key, path, ...}, ...]} 로 보내므로 CMS가 이 형식을 받아야 합니다.
+CALLBACK_BATCH_MAX = 1
+# 배치 제출(/speaker-batch)이 모두 끝났을 때 한 번 호출할 URL (path에는 배치 결과 매니페스트 JSON 경로가 전달됨)
+BATCH_CALLBACK_URL = "http://127.0.0.1/speaker_batch_sucess.php"
 
 # -- 모델 기본 설정 --
 DEFAULT_MODEL_SIZE = "large-v3"
-DEFAULT_DEVICE = "cuda"
-DEFAULT_COMPUTE_TYPE = "float16"
+# "auto"이면 GPU(CUDA)가 있으면 cuda, 없으면 cpu (환경변수 AILIVEGATE_DEVICE로 지정 가능, 예: cpu, cuda:1)
+DEFAULT_DEVICE = detect_device(os.getenv("AILIVEGATE_DEVICE", "auto"))
+# "auto"이면 GPU는 float16, CPU는 int8 (환경변수 AILIVEGATE_COMPUTE_TYPE로 지정 가능)
+DEFAULT_COMPUTE_TYPE = compute_type_for(DEFAULT_DEVICE, os.getenv("AILIVEGATE_COMPUTE_TYPE", "auto"))
+# ASR 배치 크기 자동 조정 - 장치의 여유 메모리와 녹화본 길이(30초 조각 수)로 배치 크기를 정하고,
+# 메모리 부족(OOM)이 나면 절반으로 줄여 다시 시도합니다. (False이면 아래 고정 크기에서 시작)
+ASR_BATCH_SIZE_AUTO = True
+# 자동 조정 시 배치 크기 상한
+ASR_BATCH_SIZE_MAX_GPU = 64
+ASR_BATCH_SIZE_MAX_CPU = 8
+# 배치 항목(30초 조각) 하나가 더 쓰는 메모리 = ASR 모델 추정 메모리 × 이 비율 (large-v3 float16이면 약 0.3GB)
+ASR_BATCH_ITEM_MEMORY_RATIO = 0.1
+# 여유 메모리 중 ASR 배치에 쓸 비율 (나머지는 같은 장치에서 동시에 도는 정렬/화자분리 몫)
+ASR_BATCH_MEMORY_FRACTION = 0.5
+# 자동 조정을 끈 경우의 고정 배치 크기 - CPU는 배치를 키워도 빨라지지 않고 메모리만 늘어나므로 작게
+ASR_BATCH_SIZE_GPU = 16
+ASR_BATCH_SIZE_CPU = 4
+# CPU 워커 하나가 사용할 스레드 수 (None이면 사용 가능한 코어 수를 CPU 워커 수로 나눈 값)
+CPU_THREADS = None
+# 음성 인식/정렬 언어 (정렬 모델은 언어별로 따로 로드됨)
+DEFAULT_LANGUAGE = "ko"
+# 모델 풀 메모리 예산 (추정치 합계가 넘으면 사용하지 않는 모델부터 내림)
+MODEL_MEMORY_BUDGET_BYTES = 12 * 1024 * 1024 * 1024
+# 서버 시작 후 백그라운드에서 기본 모델을 로드한 뒤, 짧은 오디오로 한 번씩 실행해 예열할지 여부
+# (첫 작업이 CUDA 커널 초기화 등 1회성 비용을 치르지 않도록)
+MODEL_WARMUP_ENABLED = True
+# 예열에 사용할 오디오 길이 (초)
+MODEL_WARMUP_SECONDS = 10
+# 예열에 사용할 짧은 녹음 파일 (None이면 합성 소음 - 소음은 ASR 내부 VAD에서 걸러져 인식/정렬 예열이 생략될 수 있음)
+MODEL_WARMUP_AUDIO = None
+
+# -- 파이프라인 설정 --
+# 단계(추출/ASR/정렬/화자분리/후처리) 사이 대기열의 최대 크기
+# 디코딩된 오디오가 큐에 머무르므로 너무 크게 잡으면 메모리 사용량이 늘어납니다.
+PIPELINE_STAGE_QUEUE_SIZE = 2
+# 화자분리 워커 목록 - 항목 하나가 워커 하나이며, 값은 워커가 사용할 장치입니다.
+# 예: ["cuda:0", "cuda:1"] (GPU 2개), ["cuda", "cuda"] (GPU 1개에 워커 2개)
+PIPELINE_WORKER_DEVICES = [DEFAULT_DEVICE]
+# 같은 장치의 워커끼리 모델을 공유할지 여부
+# True: 메모리 절약, 한 모델 인스턴스는 한 번에 한 작업만 사용 / False: 워커마다 모델 복제본을 로드하여 완전히 병렬 처리
+PIPELINE_WORKERS_SHARE_MODELS = True
+# ASR 단계 앞에 같은 모델/언어의 짧은 녹화본이 여러 건 대기 중이면 한 번의 ASR 호출로 묶어 처리합니다.
+# 묶을 최대 작업 수 (1이면 묶지 않음) - ASR 단계 앞 큐도 이 크기까지 늘어나므로 디코딩된 오디오가 그만큼 더 메모리에 머무를 수 있습니다.
+ASR_BATCH_MAX_JOBS = 8
+# 이보다 긴(초) 녹화본은 묶지 않고, 묶은 오디오 전체 길이도 이 값을 넘지 않게 합니다.
+ASR_BATCH_MAX_SECONDS = 10 * 60
+# 묶을 때 녹화본 사이에 넣을 무음 길이 (초) - whisperx 내부 VAD가 두 녹화본의 발언을 한 구간으로 합치지 않도록 충분히 길게
+ASR_BATCH_GAP_SECONDS = 30
+
+# -- 작업 레인 설정 --
+# 오디오 변환(/audio_convert)은 화자분리와 별도 레인에서 처리되어 긴 화자분리 작업 뒤에 밀리지 않습니다.
+# 동시에 실행할 ffmpeg 변환 프로세스 수 (기본: CPU 코어 수)
+CONVERT_CONCURRENCY = os.cpu_count() or 1
+# 같은 원본 파일 + 같은 파라미터의 /speaker, /audio_convert 요청이 이미 대기/처리 중이면 새로 처리하지 않고 기존 작업에 합류시킬지 여부
+# (합류한 요청은 기존 작업이 끝날 때 같은 결과로 콜백을 받음)
+INFLIGHT_COALESCE_ENABLED = True
+# 같은 영상에 대한 오디오 변환(mp3/wav)과 화자분리 요청을 모아 ffmpeg 한 번(디코딩 1회)으로 처리할지 여부
+FANOUT_ENABLED = True
+# 오디오 변환 요청이 들어온 뒤 같은 영상의 다른 요청을 기다리는 시간 (초) - 변환 작업은 이만큼 늦게 시작됩니다.
+FANOUT_WINDOW_SECONDS = 2.0
+
+# -- 대기열 제한(입장 제어) 설정 --
+# 화자분리 레인에서 시작하지 않고 기다리는 작업의 최대 수 - 넘으면 /speaker, /speaker-batch, 업로드가 503(Retry-After)으로 거절됩니다.
+ADMISSION_MAX_QUEUED_JOBS = 1000
+# 새 작업의 예상 대기 시간(초)이 이 값을 넘어도 거절 (None이면 작업 수로만 제한)
+ADMISSION_MAX_WAIT_SECONDS = None
+# 아직 끝난 작업이 없을 때 예상 시간 계산에 쓸 실시간 배율 (처리 시간 / 오디오 길이) - 이후에는 지난 작업의 실제 배율 사용
+ADMISSION_DEFAULT_REAL_TIME_FACTOR = 1.0 if is_cpu(DEFAULT_DEVICE) else 0.1
+
+# -- 오디오 디코딩 설정 --
+# 이 길이(초) 이상인 녹화본은 디코딩 결과를 RAM 대신 memmap 임시 파일에 둡니다. (None이면 항상 RAM)
+AUDIO_MMAP_MIN_SECONDS = None
+# memmap 임시 파일을 만들 폴더 (None이면 시스템 임시 폴더)
+AUDIO_MMAP_DIR = None
+
+# -- 긴 녹화본 구간 처리 설정 --
+# 이 길이(초) 이상인 녹화본은 겹치는 구간 단위로 나눠 처리하여 메모리 사용량을 구간 길이로 제한합니다. (None이면 사용 안 함)
+WINDOWED_MIN_SECONDS = 2 * 60 * 60
+# 구간 길이 (초)
+WINDOW_SECONDS = 20 * 60
+# 이웃 구간과 겹치는 길이 (초) - 경계의 발언이 잘리지 않도록, 겹친 구간의 화자로 라벨을 이어 붙임
+WINDOW_OVERLAP_SECONDS = 60
+
+# -- 실시간 전사(/live) 설정 --
+# 아직 확정하지 않은 오디오를 이 간격(초)마다 다시 인식하여 부분 결과(partial)를 보냅니다.
+LIVE_STEP_SECONDS = 5.0
+# 확정하지 않은 오디오가 이 길이(초)를 넘으면 앞부분 발언을 정렬/화자 지정하여 최종 결과(final)로 확정합니다.
+# 최종 결과의 지연은 대략 이 값 + 처리 시간입니다.
+LIVE_WINDOW_SECONDS = 30.0
+# 확정할 때 오디오 끝에서 이 길이(초) 안에 끝나는 발언은 다음 번으로 미룸 (말하는 중인 발언이 잘리지 않도록)
+LIVE_HOLDBACK_SECONDS = 5.0
+# 화자분리를 할 때 이전에 확정한 오디오를 이 길이(초)만큼 함께 넣어, 겹친 구간으로 화자 라벨을 이어 붙임
+LIVE_CONTEXT_SECONDS = 10.0
+# 확정할 수 있는 발언 경계가 없어도 확정하지 않은 오디오가 이 길이(초)를 넘으면 전부 확정 (지연/메모리 상한)
+LIVE_MAX_PENDING_SECONDS = 60.0
+# 동시에 받을 수 있는 실시간 세션 수 (세션마다 ASR/정렬/화자분리를 주기적으로 실행하므로 배치 작업과 모델을 나눠 씀)
+LIVE_MAX_SESSIONS = 4
+
+# -- 무음 건너뛰기(VAD) 설정 --
+# ASR/화자분리 전에 에너지 기준으로 긴 무음(휴회, 정회, 개회 전 대기 등)을 잘라내고 말소리만 처리합니다.
+# 결과 타임스탬프는 원래 녹화본 시각으로 되돌립니다.
+VAD_ENABLED = True
+# 에너지를 계산할 프레임 길이 (초)
+VAD_FRAME_SECONDS = 0.03
+# 이보다 작은 프레임은 무음 (dBFS)
+VAD_THRESHOLD_DB = -50.0
+# 큰 소리(상위 1% 프레임)보다 이만큼 이상 작은 프레임도 무음 (dB) - 녹음 음량 차이 보정
+VAD_DYNAMIC_RANGE_DB = 40.0
+# 이 길이(초) 이상 이어진 무음만 잘라냄
+VAD_MIN_SILENCE_SECONDS = 5.0
+# 잘라낸 무음 양쪽에 남겨 둘 여백 (초)
+VAD_PADDING_SECONDS = 0.5
+
+# -- 결과 캐시 설정 --
+# 같은 녹화본(오디오 내용 해시) + 모델 + 화자분리 파라미터 조합의 결과를 재사용합니다.
+RESULT_CACHE_ENABLED = True
+RESULT_CACHE_DIR = "cache/results"
+# 캐시 최대 크기 (초과 시 가장 오래 사용하지 않은 결과부터 삭제)
+RESULT_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# -- 중간 산출물 캐시 설정 --
+# ASR+정렬 결과와 pyannote 세그멘테이션/임베딩을 녹화본별로 저장하여,
+# threshold/min_duration_off/min_speakers/max_speakers만 바꾼 재실행은 클러스터링과 화자 지정만 다시 수행합니다.
+ARTIFACT_CACHE_ENABLED = True
+ARTIFACT_CACHE_DIR = "cache/artifacts"
+ARTIFACT_CACHE_MAX_BYTES = 4 * 1024 * 1024 * 1024
+
+# -- UI 작업 결과 저장소 설정 --
+JOB_RESULT_DB_PATH = "cache/job_results.db"
+# 결과 보관 기간 (초)
+JOB_RESULT_TTL_SECONDS = 24 * 60 * 60
+# 저장소 최대 크기 (초과 시 오래된 결과부터 삭제)
+JOB_RESULT_MAX_BYTES = 256 * 1024 * 1024
+# 메모리에 올려 둘 최근 결과 개수
+JOB_RESULT_MEMORY_ENTRIES = 32
+
+# -- UI 업로드 설정 --
+# 업로드 파일 최대 크기 (초과 시 413)
+UPLOAD_MAX_BYTES = 20 * 1024 * 1024 * 1024
+# 업로드 파일을 저장한 뒤에도 남아 있어야 하는 디스크 여유 공간 (부족하면 507)
+UPLOAD_MIN_FREE_BYTES = 5 * 1024 * 1024 * 1024
+# 업로드 파일을 나눠 쓰는 단위 (바이트)
+UPLOAD_CHUNK_BYTES = 8 * 1024 * 1024
+# True이면 파일을 저장하면서 동시에 ffmpeg로 오디오를 뽑아 두어 추출 단계의 디코딩을 줄입니다.
+# (표준 입력으로 읽을 수 없는 형식 - moov가 끝에 있는 mp4 등 - 은 기존처럼 추출 단계에서 디코딩)
+UPLOAD_EARLY_DEMUX = False
+
+# -- 메트릭/작업 로그 설정 --
+# 작업이 끝날 때마다 단계별 시간/대기 시간/결과를 한 줄짜리 JSON으로 추가 기록할 파일 (None이면 콘솔에만 출력)
+JOB_LOG_PATH = "logs/jobs.jsonl"
+
+# -- 배치 제출 설정 --
+# 배치별 결과 매니페스트(녹화본별 상태/결과 경로/오류)를 저장할 폴더
+BATCH_MANIFEST_DIR = "cache/batches"
+# 한 번에 제출할 수 있는 최대 녹화본 수
+BATCH_MAX_ITEMS = 500
+
+# -- 작업 저널 설정 --
+# 접수한 화자분리/오디오 변환 작업과 상태 변화를 기록하는 SQLite 파일 (서버가 재시작/비정상 종료되면 끝나지 않은 작업을 접수 순서대로 다시 실행)
+JOB_JOURNAL_DB_PATH = "cache/job_journal.db"
+# 처리 중에 서버가 이만큼 반복해서 끊긴 작업은 다시 실행하지 않고 실패로 통보 (작업 자체가 서버를 죽이는 경우 재시작 반복 방지)
+JOB_JOURNAL_MAX_ATTEMPTS = 3
+# 완료/실패 기록 보관 기간 (초)
+JOB_JOURNAL_RETENTION_SECONDS = 7 * 24 * 60 * 60
+
+# SSE(/job-events) 연결 유지용 keep-alive 전송 간격 (초)
+SSE_KEEPALIVE_SECONDS = 15
 
 # -- 후처리 설정 --
 MERGE_THRESHOLD_SECONDS = 2.0 
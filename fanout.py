@@ -0,0 +1,52 @@
+# /fanout.py
+import time
+import asyncio
+from pathlib import Path
+
+class SourceFanOut:
+    """
+    같은 원본 영상에 대한 요청을 잠깐(window_seconds) 모았다가, ffmpeg 한 번(디먹스/디코딩 1회)으로 처리하도록 묶는 수집기.
+
+    CMS는 보통 같은 영상에 /audio_convert(mp3), /audio_convert(wav), /speaker를 잇달아 호출하므로
+    따로 처리하면 수 GB짜리 영상을 세 번 읽고 디코딩하게 됩니다.
+    - 오디오 변환 요청은 대기 중인 묶음에 합류하거나 새 묶음을 엽니다.
+      묶음은 처음 열린 뒤 window_seconds가 지나면 submit(item)으로 변환 레인에 넘어갑니다.
+    - 화자분리 요청은 대기 중인 묶음이 있을 때만 합류합니다. (혼자 온 화자분리 작업은 기다리지 않고 바로 처리)
+    이벤트 루프 안에서만 사용합니다.
+    """
+
+    def __init__(self, window_seconds: float, submit):
+        self.window_seconds = window_seconds
+        self.submit = submit
+        self._pending = {} # 원본 경로 -> 묶음 {"video_path", "converts", "diarize_tasks"}
+
+    @staticmethod
+    def _source_key(video_path: str) -> str:
+        return str(Path(video_path).resolve())
+
+    def add_convert(self, video_path: str, key: str, output_type: str, inflight_key: str = None, journal_id: int = None) -> dict:
+        """오디오 변환 요청을 묶음에 넣고, 그 묶음을 반환합니다. (inflight_key: 진행 중 작업 색인의 식별자, journal_id: 작업 저널 번호)"""
+        source = self._source_key(video_path)
+        group = self._pending.get(source)
+        if group is None:
+            group = self._pending[source] = {"video_path": video_path, "converts": [], "diarize_tasks": []}
+            asyncio.get_running_loop().call_later(self.window_seconds, self._flush, source)
+        group["converts"].append({"key": key, "output_type": output_type, "inflight_key": inflight_key, "journal_id": journal_id})
+        return group
+
+    def add_diarize(self, video_path: str, task_details: dict) -> bool:
+        """같은 영상의 대기 중인 묶음이 있으면 화자분리 작업(레인 항목)을 합류시키고 True를 반환합니다."""
+        group = self._pending.get(self._source_key(video_path))
+        if group is None:
+            return False
+        group["diarize_tasks"].append(task_details)
+        return True
+
+    def _flush(self, source: str):
+        group = self._pending.pop(source, None)
+        if group is not None:
+            self.submit({"task_name": "fanout", "queued_at": time.monotonic(), "params": group})
+
+    def pending(self) -> int:
+        """모으는 중인 묶음 수"""
+        return len(self._pending)
@@ -0,0 +1,87 @@
+# /hardware.py
+import os
+
+# CPU에서 지원하지 않거나 느린 연산 타입 → CPU에서 대신 사용할 연산 타입
+_GPU_ONLY_COMPUTE_TYPES = {"float16", "bfloat16", "int8_float16", "int8_bfloat16"}
+CPU_COMPUTE_TYPE = "int8"
+GPU_COMPUTE_TYPE = "float16"
+
+def available_cpus() -> int:
+    """이 프로세스가 사용할 수 있는 CPU 코어 수 (컨테이너의 cpuset 제한 반영)"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError: # macOS/Windows
+        return os.cpu_count() or 1
+
+def cuda_device_count() -> int:
+    """
+    사용 가능한 CUDA GPU 수.
+    서버 시작을 늦추지 않도록 torch 대신 CTranslate2(faster-whisper 백엔드)로 먼저 확인합니다.
+    """
+    try:
+        import ctranslate2
+        return ctranslate2.get_cuda_device_count()
+    except ImportError:
+        pass
+    try:
+        import torch
+        return torch.cuda.device_count() if torch.cuda.is_available() else 0
+    except ImportError:
+        return 0
+
+def detect_device(preference: str = "auto") -> str:
+    """preference가 "auto"이면 GPU가 있으면 "cuda", 없으면 "cpu"를 반환합니다. 그 밖의 값은 그대로 사용합니다."""
+    if preference and preference != "auto":
+        return preference
+    device = "cuda" if cuda_device_count() > 0 else "cpu"
+    print(f"장치 자동 선택: {device}")
+    return device
+
+def is_cpu(device: str) -> bool:
+    return device.split(":")[0] == "cpu"
+
+def compute_type_for(device: str, compute_type: str = "auto") -> str:
+    """
+    장치에 맞는 ASR 연산 타입을 반환합니다.
+    "auto"이면 GPU는 float16, CPU는 int8이고, CPU에서 쓸 수 없는 타입(float16 등)을 요청하면 int8로 바꿉니다.
+    """
+    if is_cpu(device):
+        if not compute_type or compute_type == "auto" or compute_type in _GPU_ONLY_COMPUTE_TYPES:
+            return CPU_COMPUTE_TYPE
+        return compute_type
+    if not compute_type or compute_type == "auto":
+        return GPU_COMPUTE_TYPE
+    return compute_type
+
+def threads_per_worker(devices: list) -> int:
+    """CPU 워커가 코어를 나눠 쓰도록, CPU 워커 하나가 사용할 스레드 수를 계산합니다."""
+    cpu_workers = sum(1 for device in devices if is_cpu(device))
+    return max(1, available_cpus() // max(1, cpu_workers))
+
+def free_memory_bytes(device: str):
+    """
+    장치에서 지금 더 할당할 수 있는 메모리 (바이트, 알 수 없으면 None)
+    GPU는 드라이버가 알려 주는 여유 메모리 + torch가 잡아 두고 쓰지 않는 캐시, CPU는 MemAvailable입니다.
+    """
+    kind, _, index = device.partition(":")
+    if kind == "cpu":
+        try:
+            with open("/proc/meminfo", "r") as f:
+                for line in f:
+                    if line.startswith("MemAvailable:"):
+                        return int(line.split()[1]) * 1024
+        except (OSError, ValueError, IndexError):
+            pass
+        try:
+            return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+        except (ValueError, OSError, AttributeError): # macOS/Windows
+            return None
+    try:
+        import torch
+        if not torch.cuda.is_available():
+            return None
+        index = int(index) if index else 0
+        free, _ = torch.cuda.mem_get_info(index)
+        return free + torch.cuda.memory_reserved(index) - torch.cuda.memory_allocated(index)
+    except (ImportError, RuntimeError):
+        return None
@@ -0,0 +1,59 @@
+# /inflight.py
+import os
+import json
+import time
+import hashlib
+import threading
+from pathlib import Path
+
+class InFlightJobs:
+    """
+    대기 중이거나 처리 중인 작업을 (작업 종류, 원본 파일, 파라미터)로 색인하여 중복 제출을 기존 작업에 합류시키는 저장소.
+
+    CMS가 응답을 받지 못해 /speaker, /audio_convert를 다시 호출하면 같은 작업이 또 큐에 들어가 워커를 두 번 쓰게 됩니다.
+    - add(identity, key)는 처음 보는 작업이면 등록하고 None을, 이미 있으면 key를 합류시키고 기존 작업 정보를 반환합니다.
+    - 작업이 끝나면 release(identity)로 색인에서 빼고, 합류한 키 목록을 받아 같은 결과로 통보합니다.
+      (기존 작업과 같은 키로 다시 보낸 요청은 기존 작업의 통보로 충분하므로 목록에서 뺌)
+    원본 파일은 경로 + 크기 + 수정 시각으로 구분하므로, 같은 경로라도 파일을 바꿔 올렸으면 새 작업으로 처리됩니다.
+    """
+
+    def __init__(self):
+        self._jobs = {} # 작업 식별자 -> {"key", "followers", "submitted_at"}
+        self._lock = threading.Lock()
+        self.attached_total = 0 # 기존 작업에 합류한 요청 수 (누적)
+
+    @staticmethod
+    def identity(task_type: str, path: str, params: dict) -> str:
+        """작업 종류, 원본 파일, 결과에 영향을 주는 파라미터로 작업 식별자를 만듭니다."""
+        stat = os.stat(path)
+        source = [str(Path(path).resolve()), stat.st_size, stat.st_mtime_ns]
+        payload = json.dumps([task_type, source, params], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def add(self, identity: str, key: str):
+        """처음 보는 작업이면 등록하고 None, 같은 작업이 진행 중이면 key를 합류시키고 기존 작업 정보를 반환합니다."""
+        with self._lock:
+            entry = self._jobs.get(identity)
+            if entry is None:
+                self._jobs[identity] = {"key": key, "followers": [], "submitted_at": time.time()}
+                return None
+            if key != entry["key"] and key not in entry["followers"]:
+                entry["followers"].append(key)
+            self.attached_total += 1
+            return {"key": entry["key"], "followers": len(entry["followers"]), "submitted_at": entry["submitted_at"]}
+
+    def release(self, identity: str) -> list:
+        """작업이 끝났을 때 색인에서 빼고, 함께 통보할 (기존 작업과 다른) 키 목록을 반환합니다."""
+        if identity is None:
+            return []
+        with self._lock:
+            entry = self._jobs.pop(identity, None)
+        return entry["followers"] if entry else []
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "jobs": len(self._jobs),
+                "followers": sum(len(entry["followers"]) for entry in self._jobs.values()),
+                "attached_total": self.attached_total,
+            }
@@ -0,0 +1,128 @@
+# /job_store.py
+import json
+import time
+import sqlite3
+import threading
+from pathlib import Path
+from collections import OrderedDict
+
+class JobResultStore:
+    """
+    UI 작업 결과(상태 + txt/vtt)를 SQLite 파일에 저장하는 저장소.
+
+    - 서버를 재시작해도 결과가 남아 있습니다.
+    - ttl_seconds가 지난 결과와, 전체 크기가 max_bytes를 넘을 때의 오래된 결과는 삭제됩니다.
+    - 최근에 사용한 결과 몇 개(memory_entries)만 메모리 LRU에 올려 두므로
+      UI 트래픽이 계속 들어와도 프로세스 메모리 사용량이 일정하게 유지됩니다.
+    """
+
+    # expire()를 자동으로 실행하는 최소 간격 (초)
+    EXPIRE_INTERVAL_SECONDS = 60
+
+    def __init__(self, db_path: str, ttl_seconds: float, max_bytes: int, memory_entries: int):
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.memory_entries = memory_entries
+        self._hot = OrderedDict() # key -> (updated_at, {"status", "data"})
+        self._lock = threading.Lock()
+        self._last_expire = 0.0
+
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS job_results ("
+            " key TEXT PRIMARY KEY,"
+            " status TEXT NOT NULL,"
+            " data TEXT,"
+            " size INTEGER NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_job_results_updated ON job_results(updated_at)")
+
+    def put(self, key: str, status: str, data=None):
+        """작업 상태와 결과를 저장합니다. (같은 key가 있으면 덮어씀)"""
+        encoded = json.dumps(data, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO job_results (key, status, data, size, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (key, status, encoded, len(encoded.encode("utf-8")), now)
+            )
+            self._remember(key, now, {"status": status, "data": data})
+        if now - self._last_expire >= self.EXPIRE_INTERVAL_SECONDS:
+            self.expire()
+
+    def update_status(self, key: str, status: str, data=None):
+        """상태만 바꿉니다. data를 주면 결과도 함께 바꿉니다."""
+        if data is not None:
+            self.put(key, status, data)
+            return
+        with self._lock:
+            self._conn.execute(
+                "UPDATE job_results SET status = ?, updated_at = ? WHERE key = ?",
+                (status, time.time(), key)
+            )
+            self._hot.pop(key, None)
+
+    def get(self, key: str):
+        """{"status": ..., "data": ...} 를 반환합니다. 없거나 만료되었으면 None."""
+        now = time.time()
+        with self._lock:
+            hot = self._hot.get(key)
+            if hot is not None:
+                updated_at, value = hot
+                if now - updated_at <= self.ttl_seconds:
+                    self._hot.move_to_end(key)
+                    return value
+                self._hot.pop(key, None)
+
+            row = self._conn.execute(
+                "SELECT status, data, updated_at FROM job_results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[2] > self.ttl_seconds:
+                return None
+            value = {"status": row[0], "data": json.loads(row[1]) if row[1] is not None else None}
+            self._remember(key, row[2], value)
+            return value
+
+    def _remember(self, key: str, updated_at: float, value: dict):
+        self._hot[key] = (updated_at, value)
+        self._hot.move_to_end(key)
+        while len(self._hot) > self.memory_entries:
+            self._hot.popitem(last=False)
+
+    def expire(self) -> int:
+        """TTL이 지난 결과와 용량 초과분(오래된 것부터)을 삭제하고, 삭제한 개수를 반환합니다."""
+        now = time.time()
+        with self._lock:
+            self._last_expire = now
+            removed = self._conn.execute(
+                "DELETE FROM job_results WHERE updated_at < ?", (now - self.ttl_seconds,)
+            ).rowcount
+
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM job_results").fetchone()[0]
+            if total > self.max_bytes:
+                for key, size in self._conn.execute(
+                    "SELECT key, size FROM job_results ORDER BY updated_at"
+                ).fetchall():
+                    if total <= self.max_bytes:
+                        break
+                    self._conn.execute("DELETE FROM job_results WHERE key = ?", (key,))
+                    self._hot.pop(key, None)
+                    total -= size
+                    removed += 1
+
+            for key in [k for k, (updated_at, _) in self._hot.items() if now - updated_at > self.ttl_seconds]:
+                del self._hot[key]
+        if removed:
+            print(f"만료된 작업 결과 {removed}건 삭제")
+        return removed
+
+    def stats(self) -> dict:
+        """저장된 결과 수, 전체 크기, 메모리 LRU 크기를 반환합니다."""
+        with self._lock:
+            count, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM job_results"
+            ).fetchone()
+            return {"entries": count, "bytes": total, "max_bytes": self.max_bytes, "memory_entries": len(self._hot)}
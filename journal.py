@@ -0,0 +1,237 @@
+# /journal.py
+import json
+import time
+import sqlite3
+import threading
+from pathlib import Path
+
+# 저널에 남기지 않는 작업 항목 값 (프로세스가 바뀌면 의미가 없는 값)
+_TRANSIENT_TASK_KEYS = ("queued_at",)
+_TRANSIENT_PARAM_KEYS = ("ticket", "journal_id")
+# 저널 상태 -> 배치 진행 상황의 녹화본 상태 (완료된 작업은 기록된 결과 completed/cached)
+_BATCH_STATUS = {"queued": "queued", "running": "queued", "failed": "failed"}
+
+def replay_error(entry: dict, max_attempts: int):
+    """
+    재시작 후 다시 실행하면 안 되는 작업이면 실패 사유(예외)를, 다시 실행할 작업이면 None을 반환합니다.
+    - 처리 중에 서버가 max_attempts번 중단된 작업 (작업 자체가 서버를 죽이는 경우 재시작 반복 방지)
+    - 원본 파일이 사라진 작업
+    """
+    if entry["attempts"] >= max_attempts:
+        return RuntimeError(f"Server stopped {entry['attempts']} times while processing this job; not retrying.")
+    video_path = entry["task"]["params"]["video_path"]
+    if not Path(video_path).is_file():
+        return FileNotFoundError(f"Video file not found at: {video_path}")
+    return None
+
+class JobJournal:
+    """
+    접수한 작업(화자분리/오디오 변환)과 상태 변화를 SQLite 파일에 기록하는 작업 저널.
+
+    메모리 큐(job_queue, convert_queue)에 있던 작업은 서버가 재시작되거나 비정상 종료되면 사라지므로,
+    접수할 때 record()로 레인 항목을 저장하고 start()/finish()로 상태를 바꿉니다.
+    서버가 다시 시작되면 pending()으로 끝나지 않은 작업(접수만 된 작업, 처리 중에 끊긴 작업)을 접수 순서대로 받아 다시 넣습니다.
+    진행 중인 작업에 합류한 중복 요청은 attach()로 기록하며(상태 attached), 기존 작업이 끝날 때 함께 닫힙니다.
+    재시작 후에는 attached()로 받아 다시 실행하는 작업에 합류시켜, 합류한 키에도 결과가 통보되게 합니다.
+    완료/실패가 기록된 작업은 다시 실행되지 않으며, 완료 기록은 콜백을 outbox에 넣은 뒤에 하므로 통보도 사라지지 않습니다.
+    retention_seconds가 지난 완료/실패 기록은 삭제됩니다.
+    """
+
+    # expire()를 자동으로 실행하는 최소 간격 (초)
+    EXPIRE_INTERVAL_SECONDS = 60 * 60
+
+    def __init__(self, db_path: str, retention_seconds: float):
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.retention_seconds = retention_seconds
+        self._lock = threading.Lock()
+        self._last_expire = 0.0
+
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # 전원이 나가도 기록이 남도록 커밋마다 디스크에 반영 (작업당 몇 번뿐이므로 비용이 작음)
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " kind TEXT NOT NULL,"
+            " key TEXT NOT NULL,"
+            " task TEXT NOT NULL,"
+            " state TEXT NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " batch_key TEXT,"
+            " meta TEXT,"
+            " outcome TEXT,"
+            " output_path TEXT,"
+            " error TEXT,"
+            " created_at REAL NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs(state)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_batch ON jobs(batch_key)")
+
+    @staticmethod
+    def _encode_task(task: dict) -> str:
+        task = {name: value for name, value in task.items() if name not in _TRANSIENT_TASK_KEYS}
+        if "params" in task:
+            task["params"] = {name: value for name, value in task["params"].items() if name not in _TRANSIENT_PARAM_KEYS}
+        return json.dumps(task, ensure_ascii=False)
+
+    def record_many(self, kind: str, entries: list) -> list:
+        """
+        작업 여러 개를 한 트랜잭션으로 기록하고 저널 번호 목록을 반환합니다.
+        entries : [{"key", "task"(레인 항목), "batch_key", "meta", "state"(기본 queued), "error"}, ...]
+        """
+        now = time.time()
+        ids = []
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for entry in entries:
+                    cursor = self._conn.execute(
+                        "INSERT INTO jobs (kind, key, task, state, batch_key, meta, error, created_at, updated_at)"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (
+                            kind, entry["key"], self._encode_task(entry["task"]), entry.get("state", "queued"),
+                            entry.get("batch_key"), json.dumps(entry.get("meta"), ensure_ascii=False),
+                            entry.get("error"), now, now
+                        )
+                    )
+                    ids.append(cursor.lastrowid)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return ids
+
+    def record(self, kind: str, key: str, task: dict, batch_key: str = None, meta: dict = None) -> int:
+        """접수한 작업 하나를 기록하고 저널 번호를 반환합니다."""
+        return self.record_many(kind, [{"key": key, "task": task, "batch_key": batch_key, "meta": meta}])[0]
+
+    def attach(self, kind: str, key: str, inflight_key: str, video_path: str) -> int:
+        """진행 중인 작업(진행 중 작업 색인의 식별자 inflight_key)에 합류한 요청을 기록하고 저널 번호를 반환합니다."""
+        return self.record_many(kind, [{
+            "key": key,
+            "task": {"task_name": kind, "params": {"video_path": video_path, "key": key}},
+            "meta": {"inflight_key": inflight_key},
+            "state": "attached",
+        }])[0]
+
+    def start(self, job_id: int):
+        """작업 처리를 시작했음을 기록합니다. (처리 중에 끊겨 다시 실행된 횟수를 세기 위해 시도 횟수 증가)"""
+        if job_id is None:
+            return
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET state = 'running', attempts = attempts + 1, updated_at = ? WHERE id = ? AND state IN ('queued', 'running')",
+                (time.time(), job_id)
+            )
+
+    def finish(self, job_id: int, outcome: str, output_path: str = None, error: str = None):
+        """작업이 끝났음을 기록합니다. (outcome: completed / cached / failed)"""
+        if job_id is None:
+            return
+        now = time.time()
+        state = "failed" if outcome == "failed" else "done"
+        values = (state, outcome, output_path, error, now)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "UPDATE jobs SET state = ?, outcome = ?, output_path = ?, error = ?, updated_at = ? WHERE id = ?",
+                    (*values, job_id)
+                )
+                # 이 작업에 합류한 요청도 같은 결과로 닫음 (합류한 키의 콜백은 이미 outbox에 들어간 뒤)
+                row = self._conn.execute("SELECT task FROM jobs WHERE id = ?", (job_id,)).fetchone()
+                inflight_key = json.loads(row[0]).get("params", {}).get("inflight_key") if row else None
+                if inflight_key:
+                    self._conn.execute(
+                        "UPDATE jobs SET state = ?, outcome = ?, output_path = ?, error = ?, updated_at = ?"
+                        " WHERE state = 'attached' AND json_extract(meta, '$.inflight_key') = ?",
+                        (*values, inflight_key)
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        if now - self._last_expire >= self.EXPIRE_INTERVAL_SECONDS:
+            self.expire()
+
+    @staticmethod
+    def _row(row) -> dict:
+        return {
+            "id": row[0],
+            "kind": row[1],
+            "key": row[2],
+            "task": json.loads(row[3]),
+            "state": row[4],
+            "attempts": row[5],
+            "batch_key": row[6],
+            "meta": json.loads(row[7]) if row[7] else None,
+            "outcome": row[8],
+            "output_path": row[9],
+            "error": row[10],
+        }
+
+    _COLUMNS = "id, kind, key, task, state, attempts, batch_key, meta, outcome, output_path, error"
+
+    def pending(self) -> list:
+        """끝나지 않은 작업을 접수 순서대로 반환합니다."""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {self._COLUMNS} FROM jobs WHERE state IN ('queued', 'running') ORDER BY id"
+            ).fetchall()
+        return [self._row(row) for row in rows]
+
+    def attached(self) -> list:
+        """끝나지 않은 작업에 합류한 요청 (접수 순서대로, meta의 inflight_key로 기존 작업을 찾음)"""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {self._COLUMNS} FROM jobs WHERE state = 'attached' ORDER BY id"
+            ).fetchall()
+        return [self._row(row) for row in rows]
+
+    def batch_jobs(self, batch_key: str) -> list:
+        """배치에 속한 작업 전체 (배치 진행 상황을 다시 만들 때 사용)"""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {self._COLUMNS} FROM jobs WHERE batch_key = ? ORDER BY id", (batch_key,)
+            ).fetchall()
+        return [self._row(row) for row in rows]
+
+    def batch_state(self, batch_key: str):
+        """
+        배치 진행 상황을 다시 만들 재료 (BatchTracker.create의 인자)
+        반환값: (녹화본 목록 [{"key", "path", "status", "output_path", "error"}, ...], 배치 콜백 방식)
+        """
+        entries = self.batch_jobs(batch_key)
+        items = [
+            {
+                "key": entry["key"],
+                "path": entry["task"]["params"]["video_path"],
+                "status": _BATCH_STATUS.get(entry["state"], entry["outcome"]),
+                "output_path": entry["output_path"],
+                "error": entry["error"],
+            }
+            for entry in entries
+        ]
+        callback = (entries[0]["meta"] or {}).get("batch_callback", "batch") if entries else "batch"
+        return items, callback
+
+    def expire(self) -> int:
+        """보관 기간이 지난 완료/실패 기록을 삭제하고, 삭제한 개수를 반환합니다."""
+        now = time.time()
+        with self._lock:
+            self._last_expire = now
+            removed = self._conn.execute(
+                "DELETE FROM jobs WHERE state IN ('done', 'failed') AND updated_at < ?",
+                (now - self.retention_seconds,)
+            ).rowcount
+        if removed:
+            print(f"보관 기간이 지난 작업 저널 기록 {removed}건 삭제")
+        return removed
+
+    def stats(self) -> dict:
+        """상태별 작업 수"""
+        with self._lock:
+            rows = self._conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall()
+        return {"queued": 0, "running": 0, "attached": 0, "done": 0, "failed": 0, **dict(rows)}
@@ -1,80 +1,242 @@
 # /main.py
 
+import time
 import asyncio
+import json
 import uuid
-import shutil
+import traceback
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, HTTPException, Query, File, UploadFile, Form, Request
-from fastapi.responses import HTMLResponse, FileResponse
+from fastapi import FastAPI, HTTPException, Query, File, UploadFile, Form, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import HTMLResponse, FileResponse, StreamingResponse, PlainTextResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from pathlib import Path
+from typing import List, Literal, Optional
+from pydantic import BaseModel, Field
 import uvicorn
 
 # 모듈화된 파일에서 필요한 것들 import
 from config import (
-    DEFAULT_MODEL_SIZE, DEFAULT_DEVICE, DEFAULT_COMPUTE_TYPE,
+    DEFAULT_MODEL_SIZE, DEFAULT_DEVICE, DEFAULT_COMPUTE_TYPE, DEFAULT_LANGUAGE,
     DEFAULT_DIARIZATION_THRESHOLD, DEFAULT_MIN_DURATION_OFF,
-    DEFAULT_MIN_SPEAKERS, DEFAULT_MAX_SPEAKERS
+    DEFAULT_MIN_SPEAKERS, DEFAULT_MAX_SPEAKERS, PIPELINE_STAGE_QUEUE_SIZE, SSE_KEEPALIVE_SECONDS,
+    PIPELINE_WORKER_DEVICES, PIPELINE_WORKERS_SHARE_MODELS, CONVERT_CONCURRENCY, MODEL_WARMUP_ENABLED,
+    UPLOAD_MAX_BYTES, UPLOAD_MIN_FREE_BYTES, UPLOAD_CHUNK_BYTES, UPLOAD_EARLY_DEMUX,
+    ASR_BATCH_MAX_JOBS, BATCH_MAX_ITEMS, FANOUT_ENABLED, INFLIGHT_COALESCE_ENABLED,
+    LIVE_STEP_SECONDS, LIVE_WINDOW_SECONDS, LIVE_HOLDBACK_SECONDS, LIVE_CONTEXT_SECONDS, LIVE_MAX_PENDING_SECONDS, LIVE_MAX_SESSIONS,
+    JOB_JOURNAL_MAX_ATTEMPTS
 )
 
-from processor.tasks import process_video_and_callback, convert_video_to_audio, load_all_models
-from app_state import job_results, job_queue # <<<--- 여기서 큐와 결과 딕셔너리를 import
+from processor.tasks import (
+    convert_video_to_audio_async, convert_fanout_async, load_all_models, warm_up_models, send_batch_callback, fail_journaled_job,
+    DIARIZE_STAGES, DIARIZE_BATCH_STAGES, RESULT_CACHE, ARTIFACT_STORE, MODEL_POOL, ASR_BATCH_SIZER
+)
+from processor.pipeline import WorkerPool, Lane
+from processor.audio import probe_duration
+from admission import QueueFull
+from journal import replay_error
+from processor.live import LiveTranscriber, PcmDecoder, prepare_live_job, run_live_session, ffmpeg_pcm_chunks
+from upload import save_upload, UploadRejected
+from hardware import compute_type_for
+from app_state import job_results, job_queue, convert_queue, progress_hub, callback_dispatcher, metrics, batch_tracker, source_fanout, inflight_jobs, admission, job_journal # <<<--- 여기서 큐와 결과 저장소를 import
 
-worker_running = True       # 워커의 실행 상태를 제어하기 위한 플래그
-worker_task = None          # 전역 변수로 선언
+pipeline = None             # 화자분리 워커 풀 (워커마다 단계별 파이프라인, lifespan에서 생성)
+lanes = {}                  # 작업 종류별 레인 (lifespan에서 생성)
+live_sessions = {}          # 진행 중인 실시간 전사 세션 (키 -> LiveTranscriber)
+# 기본 모델 로딩 상태 (loading → ready / failed) - /readyz에서 사용
+model_status = {"state": "loading", "error": None, "seconds": None}
 
-async def worker():
+async def run_diarize_task(task_details: dict):
     """
-    큐에서 작업을 하나씩 꺼내 순차적으로 처리하는 워커 함수
+    화자분리 레인의 작업 처리 함수
+    이미 처리한 파일이면 캐시된 결과를 바로 전달하고,
+    아니면 추출 → ASR → 정렬 → 화자분리 → 후처리 파이프라인으로 넘기고 바로 다음 작업을 꺼냅니다.
+    (파이프라인 첫 단계 큐가 가득 차 있으면 자리가 날 때까지 대기)
     """
-    print("--- 작업 큐 워커 시작 ---")
-    while worker_running:
-        try:
-            # 큐에서 작업 가져오기 (작업이 없으면 여기서 대기)
-            task_details = await job_queue.get()
-            
-            # --- <<<--- 2. 작업 종류에 따른 분기 처리 ---
-            task_name = task_details.get("task_name")
-            task_params = task_details.get("params", {})
-
-            # process_video_and_callback 함수는 동기 함수이므로,
-            # asyncio 이벤트 루프를 막지 않도록 별도 스레드에서 실행
-            
-            if task_name == "diarize":
-                # 기존 whisperx 작업
-                await asyncio.to_thread(process_video_and_callback, **task_params)
-            elif task_name == "convert":
-                # 새로운 오디오 변환 작업
-                await asyncio.to_thread(convert_video_to_audio, **task_params)
-            else:
-                print(f"알 수 없는 작업 타입입니다: {task_name}")
-
-            # 작업이 끝났음을 큐에 알림
-            job_queue.task_done()
-        except Exception as e:
-            print(f"워커에서 에러 발생: {e}")
-            await asyncio.sleep(1) # 에러 발생 시 잠시 대기 후 계속
+    await pipeline.dispatch(task_details["params"])
+
+async def run_convert_task(task_details: dict):
+    """
+    오디오 변환 레인의 작업 처리 함수 (ffmpeg 하위 프로세스로 변환)
+    "fanout" 항목은 같은 영상에 대한 여러 요청(mp3/wav 변환, 화자분리 오디오 추출)을 ffmpeg 한 번으로 처리합니다.
+    """
+    if task_details["task_name"] == "fanout":
+        await convert_fanout_async(**task_details["params"])
+    else:
+        await convert_video_to_audio_async(**task_details["params"])
+
+def lane_depths() -> dict:
+    return {name: lane.depth() for name, lane in lanes.items()}
+
+async def load_models_in_background():
+    """
+    서버가 요청을 받기 시작한 뒤 기본 모델을 로드하고 예열합니다.
+    그동안 들어온 화자분리 작업은 대기열에 쌓이거나, 필요한 모델이 로드될 때까지 모델 풀에서 기다렸다가 이어서 처리됩니다.
+    (오디오 변환처럼 모델이 필요 없는 작업은 바로 처리)
+    """
+    started_at = time.monotonic()
+    try:
+        for device, replica in pipeline.model_slots():
+            # 작업이 배정될 때와 같은 연산 타입으로 로드해야 모델 풀에서 같은 모델로 인식됨
+            compute_type = compute_type_for(device, DEFAULT_COMPUTE_TYPE)
+            await asyncio.to_thread(load_all_models, device=device, compute_type=compute_type, replica=replica)
+            if MODEL_WARMUP_ENABLED:
+                await asyncio.to_thread(warm_up_models, device=device, compute_type=compute_type, replica=replica)
+    except Exception as e:
+        # 서버는 계속 동작 (작업에서 모델이 필요할 때 다시 로드를 시도)
+        print("---!!! 기본 모델 로딩 실패 !!!---")
+        traceback.print_exception(type(e), e, e.__traceback__)
+        model_status["state"] = "failed"
+        model_status["error"] = f"{type(e).__name__}: {e}"
+    else:
+        model_status["state"] = "ready"
+        print("서버 준비 완료: 기본 모델 로딩/예열이 끝났습니다.")
+    model_status["seconds"] = round(time.monotonic() - started_at, 1)
+
+def collect_runtime_metrics() -> list:
+    """/metrics 조회 시점의 큐 깊이, 콜백 발송 현황, 캐시 적중률, 로드된 모델 정보"""
+    lane_samples = []
+    for name, depth in lane_depths().items():
+        lane_samples.append(({"lane": name, "state": "queued"}, depth["queued"]))
+        lane_samples.append(({"lane": name, "state": "running"}, depth["running"]))
+    stage_samples = []
+    for name, depth in (pipeline.queue_depths() if pipeline else {}).items():
+        stage_samples.append(({"stage": name, "state": "queued"}, depth["queued"]))
+        stage_samples.append(({"stage": name, "state": "running"}, depth["running"]))
+
+    callbacks = callback_dispatcher.stats()
+    cache_samples = []
+    for name, cache in (("result", RESULT_CACHE), ("artifact", ARTIFACT_STORE)):
+        if cache is not None:
+            cache_samples.append(({"cache": name, "result": "hit"}, cache.hits))
+            cache_samples.append(({"cache": name, "result": "miss"}, cache.misses))
+
+    models = MODEL_POOL.stats()["models"]
+    def model_labels(model):
+        return {"kind": model["kind"], "name": model["name"], "device": model["device"], "replica": model["replica"]}
+
+    return [
+        ("ailivegate_lane_jobs", "Jobs waiting in or running from each lane.", "gauge", lane_samples),
+        ("ailivegate_stage_jobs", "Jobs waiting in front of or running in each pipeline stage.", "gauge", stage_samples),
+        ("ailivegate_callbacks_pending", "Callbacks waiting in the outbox (including in flight).", "gauge",
+            [({}, callbacks["pending"])]),
+        ("ailivegate_callbacks_total", "Callback delivery results.", "counter", [
+            ({"result": "sent"}, callbacks["sent"]),
+            ({"result": "retried"}, callbacks["retries"]),
+            ({"result": "failed"}, callbacks["failed"]),
+        ]),
+        ("ailivegate_cache_requests_total", "Cache lookups by result.", "counter", cache_samples),
+        ("ailivegate_admission_queued_audio_seconds", "Audio waiting in the diarize lane (ffprobe duration).", "gauge",
+            [({}, admission.stats()["queued_audio_seconds"])]),
+        ("ailivegate_admission_rejected_total", "Submissions rejected because the diarize queue was full.", "counter",
+            [({}, admission.rejected_total)]),
+        ("ailivegate_coalesced_submissions_total", "Duplicate submissions attached to an in-flight job.", "counter",
+            [({}, inflight_jobs.stats()["attached_total"])]),
+        ("ailivegate_models_ready", "1 once the default models are loaded and warmed up.", "gauge",
+            [({}, 1 if model_status["state"] == "ready" else 0)]),
+        ("ailivegate_model_load_seconds", "Time it took to load each pooled model.", "gauge",
+            [(model_labels(model), model["load_seconds"]) for model in models]),
+        ("ailivegate_model_estimated_bytes", "Estimated memory held by each pooled model.", "gauge",
+            [(model_labels(model), model["estimated_bytes"]) for model in models]),
+    ]
+
+def _restore_batches(pending: list):
+    """재시작 전에 끝나지 않은 배치의 진행 상황을 저널 기록으로 다시 만듭니다. (이미 끝난 녹화본은 기록된 결과로)"""
+    for batch_key in dict.fromkeys(entry["batch_key"] for entry in pending if entry["batch_key"]):
+        items, callback = job_journal.batch_state(batch_key)
+        batch_tracker.create(batch_key, items, callback)
+
+async def replay_journal():
+    """
+    서버가 재시작/비정상 종료되기 전에 끝나지 않은 작업(접수만 된 작업, 처리 중에 끊긴 작업)을 접수 순서대로 레인에 다시 넣습니다.
+    완료/실패가 기록된 작업은 다시 실행하지 않습니다.
+    - 원본 파일이 사라졌거나 처리 중에 JOB_JOURNAL_MAX_ATTEMPTS번 중단된 작업은 실패로 통보합니다.
+    - 화자분리 작업은 대기열 제한과 상관없이 받고(이미 접수한 작업), 중복 합류 색인과 배치 진행 상황도 다시 만듭니다.
+    - 기존 작업에 합류했던 요청도 다시 합류시켜, 기존 작업이 끝나면(실패로 통보하는 경우 포함) 함께 통보합니다.
+    """
+    pending = await asyncio.to_thread(job_journal.pending)
+    attached = await asyncio.to_thread(job_journal.attached)
+    if not pending and not attached:
+        return
+    print(f"작업 저널: 끝나지 않은 작업 {len(pending)}건(합류한 요청 {len(attached)}건)을 접수 순서대로 다시 실행합니다.")
+    await asyncio.to_thread(_restore_batches, pending)
+
+    # 중복 합류 색인을 먼저 모두 다시 만듦 (아래에서 바로 실패로 통보하는 작업도 합류한 키에 통보하도록)
+    leaders = set()
+    for entry in pending:
+        inflight_key = entry["task"]["params"].get("inflight_key")
+        if inflight_key:
+            inflight_jobs.add(inflight_key, entry["key"])
+            leaders.add(inflight_key)
+    for entry in attached:
+        inflight_key = (entry["meta"] or {}).get("inflight_key")
+        if inflight_key in leaders:
+            inflight_jobs.add(inflight_key, entry["key"])
+        else: # 기존 작업 기록이 먼저 끝난 경우 (통보는 이미 outbox에 들어감)
+            await asyncio.to_thread(job_journal.finish, entry["id"], "attached")
+
+    replayed = [] # 다시 넣을 화자분리 레인 항목
+    for entry in pending:
+        task_details, params = entry["task"], entry["task"]["params"]
+        error = replay_error(entry, JOB_JOURNAL_MAX_ATTEMPTS)
+        if error is not None:
+            await asyncio.to_thread(fail_journaled_job, entry, error)
+            continue
+
+        params["journal_id"] = entry["id"]
+        if entry["kind"] == "convert":
+            convert_queue.put_nowait({**task_details, "queued_at": time.monotonic()})
+            continue
+        if params.get("audio_path") and not Path(params["audio_path"]).is_file():
+            params["audio_path"] = None # 미리 뽑아 둔 오디오가 없으면 영상에서 다시 추출
+        replayed.append(task_details)
+
+    durations = await _probe_durations([
+        task_details["params"].get("audio_path") or task_details["params"]["video_path"] for task_details in replayed
+    ])
+    tickets, _ = admission.admit(
+        [(task_details["params"]["key"], duration) for task_details, duration in zip(replayed, durations)], force=True
+    )
+    for task_details, ticket in zip(replayed, tickets):
+        task_details["params"]["ticket"] = ticket
+        task_details["queued_at"] = time.monotonic()
+        job_queue.put_nowait(task_details)
 
 # --- <<<--- 2. 서버 시작/종료 시 워커 관리 ---
 # --- <<<--- lifespan 이벤트 핸들러로 변경 ---
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # -- 서버 시작 시 실행될 코드 --
-    global worker_task
-    print("서버 시작: AI 모델을 메모리에 로드합니다...")
-    await asyncio.to_thread(load_all_models)
-    worker_task = asyncio.create_task(worker())
+    global pipeline
+    progress_hub.bind_loop(asyncio.get_running_loop())
+    metrics.registry.add_collector(collect_runtime_metrics)
+    await callback_dispatcher.start()
+    pipeline = WorkerPool(
+        DIARIZE_STAGES, PIPELINE_STAGE_QUEUE_SIZE, PIPELINE_WORKER_DEVICES, PIPELINE_WORKERS_SHARE_MODELS,
+        batch_stages=DIARIZE_BATCH_STAGES, batch_max=ASR_BATCH_MAX_JOBS
+    )
+    pipeline.start()
+    # 화자분리 레인은 파이프라인에 작업을 넘기기만 하므로 하나면 충분 (실제 동시 처리 수는 워커 풀이 결정)
+    lanes["diarize"] = Lane("diarize", job_queue, run_diarize_task, concurrency=1)
+    lanes["convert"] = Lane("convert", convert_queue, run_convert_task, concurrency=CONVERT_CONCURRENCY)
+    for lane in lanes.values():
+        lane.start()
+    # 재시작 전에 끝나지 않은 작업을 새 요청보다 먼저 다시 넣음
+    await replay_journal()
+    # 모델 로딩은 백그라운드에서 - 로딩 중에도 요청을 받고 /healthz, /audio_convert는 바로 동작
+    print("서버 시작: AI 모델을 백그라운드에서 로드합니다...")
+    model_loader = asyncio.create_task(load_models_in_background())
     
     yield # 이 시점에서 애플리케이션이 실행됨
 
     # -- 서버 종료 시 실행될 코드 --
-    global worker_running
-    worker_running = False
     print("서버 종료: 워커를 안전하게 종료합니다...")
-    await asyncio.sleep(2)
-    if worker_task:
-        worker_task.cancel()
+    model_loader.cancel() # 진행 중인 로딩 스레드는 끝까지 실행되지만 더 기다리지 않음
+    for lane in lanes.values():
+        await lane.stop()
+    if pipeline:
+        await pipeline.stop()
+    await callback_dispatcher.stop()
 
 # --- FastAPI 설정 ---
 app = FastAPI(lifespan=lifespan) # FastAPI 앱 생성 시 lifespan을 등록
@@ -90,6 +252,45 @@ UPLOAD_DIR = Path("uploads")
 UPLOAD_DIR.mkdir(exist_ok=True)
 
 # --- <<<--- 3. 새로운 라우터 추가 ---
+def _claim_inflight(task_type: str, path: str, key: str, params: dict):
+    """
+    (작업 식별자, 기존 작업 정보)를 반환합니다. 같은 작업이 대기/처리 중이 아니면 기존 작업 정보는 None
+    중복 합류를 끄면 (None, None)
+    """
+    if not INFLIGHT_COALESCE_ENABLED:
+        return None, None
+    try:
+        inflight_key = inflight_jobs.identity(task_type, path, params)
+    except OSError: # 존재 확인 뒤에 파일이 지워지거나 바뀐 경우
+        raise HTTPException(status_code=404, detail=f"Video file not found at: {path}")
+    return inflight_key, inflight_jobs.add(inflight_key, key)
+
+def _queue_full(e: QueueFull) -> HTTPException:
+    """대기열이 가득 찼을 때의 503 응답 (CMS는 Retry-After 뒤에 다시 보내거나 다른 시간대로 분산)"""
+    return HTTPException(
+        status_code=503,
+        detail={"status": "rejected", "message": str(e), "retry_after": e.retry_after, "estimate": e.estimate},
+        headers={"Retry-After": str(e.retry_after)}
+    )
+
+async def _probe_durations(paths: list) -> list:
+    """녹화본 길이(초)를 ffprobe로 동시에 잽니다. (알 수 없으면 0)"""
+    return await asyncio.gather(*(asyncio.to_thread(probe_duration, str(path)) for path in paths))
+
+async def _attach(task_type: str, path: str, key: str, inflight_key: str, existing: dict, queue_size: int) -> dict:
+    """
+    기존 작업에 합류한 요청을 작업 저널에 남기고 attached 응답을 만듭니다.
+    (재시작 후 기존 작업이 다시 실행될 때도 이 키로 통보하기 위함)
+    """
+    if key != existing["key"]:
+        await asyncio.to_thread(job_journal.attach, task_type, key, inflight_key, path)
+    return {
+        "status": "attached",
+        "message": f"같은 작업이 이미 대기/처리 중입니다. 기존 작업이 끝나면 함께 통보합니다. (Key: {key}, 기존 작업: {existing['key']})",
+        "attached_to": existing["key"],
+        "queue_size": queue_size,
+    }
+
 @app.get("/audio_convert")
 async def create_audio_convert_task(path: str, key: str, type: str):
     """영상 파일을 오디오로 변환하는 작업을 큐에 추가"""
@@ -101,20 +302,34 @@ async def create_audio_convert_task(path: str, key: str, type: str):
     if type.lower() not in ['mp3', 'wav']:
         raise HTTPException(status_code=400, detail="Invalid type. 'type' must be 'mp3' or 'wav'.")
 
+    # CMS가 다시 보낸 요청이면 진행 중인 변환에 합류 (변환이 끝나면 이 키로도 콜백)
+    inflight_key, existing = _claim_inflight("convert", str(video_path), key, {"output_type": type.lower()})
+    if existing is not None:
+        return await _attach("convert", str(video_path), key, inflight_key, existing, convert_queue.qsize())
+
     task_details = {
         "task_name": "convert",
+        "queued_at": time.monotonic(), # 레인 대기 시간 측정용
         "params": {
             "video_path": str(video_path),
             "key": key,
-            "output_type": type.lower()
+            "output_type": type.lower(),
+            "inflight_key": inflight_key
         }
     }
-    await job_queue.put(task_details)
+    # 접수 기록 (서버가 재시작되면 끝나지 않은 변환을 다시 실행) - 재시작 후에는 묶지 않고 단독 변환으로 실행
+    task_details["params"]["journal_id"] = await asyncio.to_thread(job_journal.record, "convert", key, task_details)
+
+    if FANOUT_ENABLED:
+        # 같은 영상의 다른 변환/화자분리 요청과 함께 ffmpeg 한 번으로 처리되도록 잠깐 모았다가 변환 레인에 넣음
+        source_fanout.add_convert(str(video_path), key, type.lower(), inflight_key, task_details["params"]["journal_id"])
+    else:
+        await convert_queue.put(task_details)
 
     return {
         "status": "queued",
         "message": f"오디오 변환 작업이 대기열에 추가되었습니다. (Key: {key})",
-        "queue_size": job_queue.qsize()
+        "queue_size": convert_queue.qsize() # 변환 레인에서 대기 중인 작업 수
     }
 
 @app.get("/speaker")
@@ -122,6 +337,10 @@ async def create_speaker_task(
     path: str,
     key: str,
     model: str = DEFAULT_MODEL_SIZE, 
+    language: str = Query(
+        default=DEFAULT_LANGUAGE,
+        description="Spoken language code for ASR and alignment (e.g. ko, en)."
+    ),
     # 선택적 쿼리 파라미터 추가
     threshold: float = Query(
         default=DEFAULT_DIARIZATION_THRESHOLD,
@@ -146,11 +365,32 @@ async def create_speaker_task(
     video_path = Path(path)
     if not video_path.is_file():
         raise HTTPException(status_code=404, detail=f"Video file not found at: {path}")
-    
+    # 대기/완료 예상 시간 계산용 (대기열에 있는 녹화본 길이의 합)
+    duration, = await _probe_durations([video_path])
+
+    diarization_params = {
+        "threshold": threshold,
+        "min_duration_off": min_duration_off,
+        "min_speakers" : min_speakers,
+        "max_speakers" : max_speakers
+    }
+    # CMS가 다시 보낸 요청이면 진행 중인 작업에 합류 (작업이 끝나면 이 키로도 콜백)
+    inflight_key, existing = _claim_inflight(
+        "diarize", str(video_path), key, {"model": model, "language": language, "diarization_params": diarization_params}
+    )
+    if existing is not None:
+        return await _attach("diarize", str(video_path), key, inflight_key, existing, job_queue.qsize())
+    try:
+        (ticket,), estimate = admission.admit([(key, duration)])
+    except QueueFull as e:
+        inflight_jobs.release(inflight_key)
+        raise _queue_full(e)
+
     # --- <<<--- 3. 작업을 큐에 넣기 ---
     # 백그라운드 태스크를 직접 실행하는 대신, 작업 정보를 딕셔너리로 만들어 큐에 넣는다.
     task_details = {
         "task_name": "diarize", # 작업 타입 명시
+        "queued_at": time.monotonic(), # 레인 대기 시간 측정용
         "params" : {        
             "video_path": str(video_path),
             "key": key,
@@ -158,25 +398,309 @@ async def create_speaker_task(
             "model_name": model,
             "device": DEFAULT_DEVICE,
             "compute_type": DEFAULT_COMPUTE_TYPE,
+            "language": language,
             # 받은 파라미터를 params 딕셔너리에 추가
-            "diarization_params": {
-                "threshold": threshold,
-                "min_duration_off": min_duration_off,
-                "min_speakers" : min_speakers,
-                "max_speakers" : max_speakers
-            }
+            "diarization_params": diarization_params,
+            "inflight_key": inflight_key,
+            "ticket": ticket
         }
     }
-    await job_queue.put(task_details)
+    # 접수 기록 (서버가 재시작되면 끝나지 않은 작업을 접수 순서대로 다시 실행)
+    task_details["params"]["journal_id"] = await asyncio.to_thread(job_journal.record, "diarize", key, task_details)
+    # 같은 영상의 오디오 변환 요청이 모이는 중이면 함께 디코딩한 오디오로 처리 (아니면 바로 화자분리 레인에)
+    shared_decode = FANOUT_ENABLED and source_fanout.add_diarize(str(video_path), task_details)
+    if not shared_decode:
+        job_queue.put_nowait(task_details)
 
     # 클라이언트(CMS)에는 즉시 응답
     return {
         "status": "queued",
         "message": f"화자분석 작업이 대기열에 추가되었습니다. (Key: {key})",
+        "shared_decode": shared_decode, # 오디오 변환과 디코딩을 공유하는지 여부
+        "duration": duration, # 녹화본 길이 (초, ffprobe)
+        "estimate": estimate, # 대기/완료 예상 시간 (지난 작업의 실시간 배율 기준)
         "params_used": task_details["params"], # 어떤 파라미터가 사용되었는지 응답에 포함
         "queue_size": job_queue.qsize(), # 현재 대기 중인 작업 수
+        "stage_queues": pipeline.queue_depths() if pipeline else {}, # 단계별 대기/처리 중 작업 수
+    }
+
+class SpeakerBatchRequest(BaseModel):
+    """배치 제출 요청 본문 - paths 또는 directory(+pattern) 중 하나 이상, 나머지는 모든 녹화본에 공통으로 적용"""
+    paths: List[str] = []
+    keys: Optional[List[str]] = None # paths와 같은 순서의 녹화본별 키 (없으면 "<배치 키>-<번호>")
+    directory: Optional[str] = None
+    pattern: str = "*.mp4"
+    # 매니페스트 파일 이름과 녹화본별 키의 접두어로 쓰이므로 영문/숫자/_/-만 허용 (경로 조작 방지, 아니면 422)
+    batch_key: Optional[str] = Field(default=None, pattern=r"^[A-Za-z0-9_-]{1,64}$")
+    callback: Literal["batch", "each", "both"] = "batch"
+    model: str = DEFAULT_MODEL_SIZE
+    language: str = DEFAULT_LANGUAGE
+    threshold: float = DEFAULT_DIARIZATION_THRESHOLD
+    min_duration_off: float = DEFAULT_MIN_DURATION_OFF
+    min_speakers: int = DEFAULT_MIN_SPEAKERS
+    max_speakers: int = DEFAULT_MAX_SPEAKERS
+
+def _batch_sources(request: SpeakerBatchRequest, batch_key: str) -> list:
+    """요청의 녹화본 목록을 [(작업 키, 경로), ...]로 만듭니다. (중복 경로 제거, 요청 순서 유지)"""
+    if request.keys is not None and len(request.keys) != len(request.paths):
+        raise HTTPException(status_code=422, detail="keys must have the same length as paths.")
+    paths = list(request.paths)
+    if request.directory:
+        directory = Path(request.directory)
+        if not directory.is_dir():
+            raise HTTPException(status_code=404, detail=f"Directory not found at: {request.directory}")
+        paths += sorted(str(path) for path in directory.glob(request.pattern) if path.is_file())
+    paths = list(dict.fromkeys(paths))
+    if not paths:
+        raise HTTPException(status_code=422, detail="No recordings to process.")
+    if len(paths) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Too many recordings in one batch (max {BATCH_MAX_ITEMS}).")
+    keys = dict(zip(request.paths, request.keys or []))
+    sources = [(keys.get(path) or f"{batch_key}-{index}", path) for index, path in enumerate(paths)]
+    if len({key for key, _ in sources}) != len(sources):
+        raise HTTPException(status_code=422, detail="Recording keys must be unique.")
+    return sources
+
+@app.post("/speaker-batch")
+async def create_speaker_batch(request: SpeakerBatchRequest):
+    """
+    여러 녹화본의 회의록 생성 작업을 한 번에 추가하는 API 엔드포인트
+    모든 녹화본을 같은 파라미터로 이미 로드된 모델에서 처리하며, 짧은 녹화본끼리는 ASR을 묶어서 실행합니다.
+    진행 상황은 GET /speaker-batch/{batch_key} 또는 /job-events/{batch_key}로 확인하고,
+    모두 끝나면 배치 완료 콜백(callback="batch"/"both")이 한 번 전송됩니다.
+    """
+    batch_key = request.batch_key or uuid.uuid4().hex
+    existing = batch_tracker.get(batch_key, include_items=False)
+    if existing is not None and existing["remaining"] > 0:
+        raise HTTPException(status_code=409, detail=f"Batch is still running: {batch_key}")
+
+    items, queued = [], []
+    for key, path in _batch_sources(request, batch_key):
+        video_path = Path(path)
+        if video_path.is_file():
+            items.append({"key": key, "path": path, "status": "queued", "error": None})
+            queued.append((key, video_path))
+        else:
+            items.append({"key": key, "path": path, "status": "failed", "error": "Video file not found"})
+
+    # 짧은 녹화본부터 넣어, 비슷한 길이의 녹화본이 함께 ASR 단계에 도착하도록 (묶음 처리 기회 증가)
+    # 길이를 알 수 없는 파일은 파일 크기 순으로 뒤에
+    durations = await _probe_durations([video_path for _, video_path in queued])
+    order = sorted(
+        zip(durations, queued),
+        key=lambda entry: (entry[0] == 0, entry[0], entry[1][1].stat().st_size)
+    )
+    try:
+        # 모두 받거나 하나도 받지 않음 (배치 일부만 처리되지 않도록)
+        tickets, estimate = admission.admit([(key, duration) for duration, (key, _) in order])
+    except QueueFull as e:
+        raise _queue_full(e)
+
+    tasks = []
+    for ticket, (_, (key, video_path)) in zip(tickets, order):
+        tasks.append({
+            "task_name": "diarize",
+            "queued_at": time.monotonic(), # 레인 대기 시간 측정용
+            "params": {
+                "video_path": str(video_path),
+                "key": key,
+                "save_to_file": True,
+                "model_name": request.model,
+                "device": DEFAULT_DEVICE,
+                "compute_type": DEFAULT_COMPUTE_TYPE,
+                "language": request.language,
+                "diarization_params": {
+                    "threshold": request.threshold,
+                    "min_duration_off": request.min_duration_off,
+                    "min_speakers": request.min_speakers,
+                    "max_speakers": request.max_speakers
+                },
+                "batch_key": batch_key,
+                "send_callback": request.callback in ("each", "both"),
+                "ticket": ticket,
+            }
+        })
+    # 접수 기록 - 파일을 찾지 못한 녹화본도 실패로 남겨 재시작 후 배치 진행 상황을 그대로 다시 만듦
+    meta = {"batch_callback": request.callback}
+    journal_ids = await asyncio.to_thread(job_journal.record_many, "diarize", [
+        *(
+            {
+                "key": item["key"], "task": {"task_name": "diarize", "params": {"video_path": item["path"], "key": item["key"]}},
+                "batch_key": batch_key, "meta": meta, "state": "failed", "error": item["error"]
+            }
+            for item in items if item["status"] == "failed"
+        ),
+        *({"key": task_details["params"]["key"], "task": task_details, "batch_key": batch_key, "meta": meta} for task_details in tasks),
+    ])
+    for task_details, journal_id in zip(tasks, journal_ids[len(journal_ids) - len(tasks):]):
+        task_details["params"]["journal_id"] = journal_id
+
+    summary = batch_tracker.create(batch_key, items, request.callback)
+    if summary["remaining"] == 0: # 처리할 수 있는 녹화본이 없음
+        await asyncio.to_thread(send_batch_callback, summary)
+    for task_details in tasks:
+        job_queue.put_nowait(task_details)
+
+    return {
+        "status": "queued",
+        "message": f"배치 작업 {len(queued)}건이 대기열에 추가되었습니다. (Key: {batch_key})",
+        "batch_key": batch_key,
+        "total": summary["total"],
+        "queued": len(queued),
+        "failed": summary["failed"], # 파일을 찾지 못한 녹화본
+        "items": items,
+        "audio_seconds": round(sum(durations), 1), # 처리할 녹화본 길이의 합 (ffprobe)
+        "estimate": estimate, # 배치의 마지막 녹화본 기준 대기/완료 예상 시간
+        "queue_size": job_queue.qsize(),
     }
 
+@app.get("/speaker-batch/{batch_key}")
+async def get_speaker_batch(batch_key: str):
+    """배치 전체 진행률과 녹화본별 상태/결과 경로를 반환합니다."""
+    batch = batch_tracker.get(batch_key)
+    if batch is None:
+        raise HTTPException(status_code=404, detail="Batch not found.")
+    return batch
+
+async def _websocket_pcm_chunks(websocket: WebSocket, decoder: PcmDecoder):
+    """클라이언트가 보내는 바이너리 PCM 프레임을 샘플 배열로 내줍니다. 텍스트 "end"를 받으면 스트림 끝."""
+    while True:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(message.get("code", 1000))
+        if message.get("bytes"):
+            yield decoder.decode(message["bytes"])
+        elif (message.get("text") or "").strip() == "end":
+            return
+
+@app.websocket("/live/{key}")
+async def live_transcribe(
+    websocket: WebSocket,
+    key: str,
+    source: Optional[str] = None,
+    realtime: Optional[bool] = None,
+    format: Literal["f32le", "s16le"] = "f32le",
+    model: str = DEFAULT_MODEL_SIZE,
+    language: str = DEFAULT_LANGUAGE,
+    threshold: float = DEFAULT_DIARIZATION_THRESHOLD,
+    min_duration_off: float = DEFAULT_MIN_DURATION_OFF,
+    min_speakers: int = DEFAULT_MIN_SPEAKERS,
+    max_speakers: int = DEFAULT_MAX_SPEAKERS
+):
+    """
+    실시간 전사 WebSocket
+    - source가 없으면 클라이언트가 16kHz 모노 PCM(format: f32le/s16le)을 바이너리 프레임으로 보내고, 끝나면 텍스트 "end"를 보냅니다.
+    - source(파일 경로 또는 rtmp/http 등 ffmpeg가 읽을 수 있는 주소)를 주면 서버가 ffmpeg로 읽습니다.
+      realtime(기본: 로컬 파일이면 True)이면 원래 재생 속도로 읽어 실시간 스트림처럼 처리합니다.
+    서버는 {"type": "partial"|"final"|"done"|"error", ...} JSON 메시지를 보냅니다.
+    """
+    await websocket.accept()
+    error, close_code = None, 1008 # 1008: 잘못된 요청, 1013: 나중에 다시 시도
+    if key in live_sessions:
+        error = f"Live session already running: {key}"
+    elif len(live_sessions) >= LIVE_MAX_SESSIONS:
+        error, close_code = "Too many live sessions.", 1013
+    elif source and "://" not in source and not Path(source).is_file():
+        error = f"Source not found: {source}"
+    if error is not None:
+        await websocket.send_json({"type": "error", "error": error})
+        await websocket.close(code=close_code)
+        return
+
+    job = prepare_live_job(
+        key, model, DEFAULT_DEVICE, DEFAULT_COMPUTE_TYPE, language,
+        {
+            "threshold": threshold,
+            "min_duration_off": min_duration_off,
+            "min_speakers": min_speakers,
+            "max_speakers": max_speakers
+        }
+    )
+    transcriber = LiveTranscriber(
+        job, LIVE_STEP_SECONDS, LIVE_WINDOW_SECONDS, LIVE_HOLDBACK_SECONDS, LIVE_CONTEXT_SECONDS, LIVE_MAX_PENDING_SECONDS
+    )
+    if source:
+        chunks = ffmpeg_pcm_chunks(source, realtime if realtime is not None else "://" not in source)
+    else:
+        chunks = _websocket_pcm_chunks(websocket, PcmDecoder(format))
+
+    live_sessions[key] = transcriber
+    print(f"--- 실시간 전사 시작 (Key: {key}, 입력: {source or 'websocket'}) ---")
+    try:
+        await run_live_session(transcriber, chunks, websocket.send_json)
+    except WebSocketDisconnect:
+        print(f"실시간 전사 연결 끊김 (Key: {key})")
+        return
+    except Exception as e:
+        print("---!!! 실시간 전사 중 오류 발생 !!!---")
+        traceback.print_exception(type(e), e, e.__traceback__)
+        try:
+            await websocket.send_json({"type": "error", "error": f"{type(e).__name__}: {e}"})
+        except Exception:
+            return # 이미 연결이 끊김
+    finally:
+        live_sessions.pop(key, None)
+        print(f"--- 실시간 전사 종료 (Key: {key}, {transcriber.received_seconds:.1f}초) ---")
+    await websocket.close()
+
+@app.get("/queue-status")
+async def get_queue_status():
+    """레인별 작업 큐와 파이프라인 단계별 큐의 현재 깊이를 반환합니다."""
+    return {
+        "queue_size": job_queue.qsize(),
+        "lanes": lane_depths(),
+        "stage_queues": pipeline.queue_depths() if pipeline else {},
+        "workers": pipeline.worker_status() if pipeline else [],
+        "callbacks": callback_dispatcher.stats(),
+        "throughput": metrics.throughput(), # 장치/연산 타입별 처리량
+        "live_sessions": len(live_sessions),
+        "inflight": inflight_jobs.stats(), # 진행 중 작업 색인 (합류한 중복 요청 수 포함)
+        "admission": admission.stats(), # 대기열 제한과 남은 작업이 모두 끝나는 예상 시간
+        "journal": await asyncio.to_thread(job_journal.stats), # 작업 저널의 상태별 작업 수
+    }
+
+@app.get("/healthz")
+async def get_health():
+    """프로세스가 살아 있고 요청에 응답할 수 있는지 (모델 로딩 여부와 무관)"""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def get_readiness():
+    """
+    기본 모델 로딩/예열이 끝났는지 확인합니다. 준비 전이면 503.
+    준비 전에도 작업은 받으며(대기열에 쌓였다가 모델이 준비되면 처리), 오디오 변환은 바로 처리됩니다.
+    """
+    ready = model_status["state"] == "ready"
+    content = {
+        "status": "ready" if ready else model_status["state"],
+        "models": model_status,
+        "lanes": lane_depths(),
+    }
+    return JSONResponse(content, status_code=200 if ready else 503)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus 텍스트 형식의 메트릭 (단계별 처리 시간/RTF, 큐 깊이와 대기 시간, 작업 결과 건수, 모델 로딩 시간, 메모리)"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/cache-stats")
+async def get_cache_stats():
+    """결과 캐시와 중간 산출물 캐시의 적중/실패 횟수와 사용량을 반환합니다."""
+    async def stats_of(cache):
+        if cache is None:
+            return {"enabled": False}
+        return {"enabled": True, **await asyncio.to_thread(cache.stats)}
+
+    return {
+        "result_cache": await stats_of(RESULT_CACHE),
+        "artifact_cache": await stats_of(ARTIFACT_STORE),
+    }
+
+@app.get("/models")
+async def get_loaded_models():
+    """모델 풀에 로드된 모델 목록과 메모리 예산 사용량, 메모리 부족으로 줄어든 ASR 배치 크기 상한을 반환합니다."""
+    return {**MODEL_POOL.stats(), "asr_batch_caps": ASR_BATCH_SIZER.caps()}
+
 # --- UI를 위한 새로운 엔드포인트들 ---
 @app.get("/", response_class=HTMLResponse)
 async def read_item(request: Request):
@@ -190,19 +714,44 @@ async def upload_and_process_video(
     threshold: float = Form(...),
     min_duration_off: float = Form(...),
     min_speakers: int = Form(...),
-    max_speakers: int = Form(...)
+    max_speakers: int = Form(...),
+    language: str = Form(DEFAULT_LANGUAGE)
 ):
     """파일 업로드와 파라미터를 받아 작업을 큐에 추가합니다."""
     # 고유한 작업 키(key) 생성
     key = str(uuid.uuid4())
+    # 큰 파일을 다 받은 뒤에 거절하지 않도록, 대기열 자리는 업로드 전에 확인
+    try:
+        admission.check()
+    except QueueFull as e:
+        raise _queue_full(e)
     
-    # 업로드된 파일을 서버에 저장
+    # 업로드된 파일을 서버에 저장 (이벤트 루프를 막지 않도록 별도 스레드에서 청크 단위로 쓰면서 해시 계산)
     temp_path = UPLOAD_DIR / f"{key}_{file.filename}"
-    with temp_path.open("wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    demux_path = UPLOAD_DIR / f"{key}_audio.wav" if UPLOAD_EARLY_DEMUX else None
+    try:
+        upload = await asyncio.to_thread(
+            save_upload,
+            file.file,
+            temp_path,
+            expected_size=file.size,
+            max_bytes=UPLOAD_MAX_BYTES,
+            min_free_bytes=UPLOAD_MIN_FREE_BYTES,
+            chunk_size=UPLOAD_CHUNK_BYTES,
+            demux_path=demux_path
+        )
+    except UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    finally:
+        await file.close()
+
+    # 업로드를 받는 동안 대기열이 찼더라도 이미 받은 파일은 처리
+    duration, = await _probe_durations([upload["audio_path"] or temp_path])
+    (ticket,), estimate = admission.admit([(key, duration)], force=True)
 
     task_details = {
         "task_name": "diarize",
+        "queued_at": time.monotonic(),
         "params": {
             "video_path": str(temp_path),
             "key": key,
@@ -210,35 +759,92 @@ async def upload_and_process_video(
             "model_name": model,
             "device": DEFAULT_DEVICE,
             "compute_type": DEFAULT_COMPUTE_TYPE,
+            "language": language,
+            "content_hash": upload["sha256"],
+            "audio_path": upload["audio_path"],
             "diarization_params": {
                 "threshold": threshold,
                 "min_duration_off": min_duration_off,
                 "min_speakers": min_speakers,
                 "max_speakers": max_speakers
-            }
+            },
+            "ticket": ticket
         }
     }
     
     # 작업 상태를 'processing'으로 초기화
-    job_results[key] = {"status": "processing", "data": None}
-    await job_queue.put(task_details)
+    job_results.put(key, "processing")
+    # 접수 기록 (서버가 재시작되면 업로드된 파일로 다시 실행)
+    task_details["params"]["journal_id"] = await asyncio.to_thread(job_journal.record, "diarize", key, task_details)
+    progress_hub.publish(key, "queued")
+    job_queue.put_nowait(task_details)
 
     return {
         "status": "queued",
         "message": "작업이 성공적으로 대기열에 추가되었습니다.",
-        "key": key
+        "key": key,
+        "size": upload["size"],
+        "sha256": upload["sha256"],
+        "estimate": estimate
     }
     
 # --- <<<--- 3. UI용 새 라우터: 결과 확인 API 추가 ---
 @app.get("/job-result/{key}")
 async def get_job_result(key: str):
     """UI가 폴링하여 작업 상태와 결과를 가져가는 API"""
-    result = job_results.get(key)
+    result = await asyncio.to_thread(job_results.get, key)
     if not result:
         raise HTTPException(status_code=404, detail="Job not found.")
     return result
 # --- 여기까지 ---
 
+def _sse_message(event: dict) -> str:
+    return f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+@app.get("/job-events/{key}")
+async def stream_job_events(key: str, request: Request):
+    """
+    UI가 작업 진행 상황을 Server-Sent Events로 받는 API (폴링 대체)
+    상태 변화와 단계별 진행(extract/asr/align/diarize/finalize)을 보내고,
+    최종 결과(completed/failed)를 한 번 보낸 뒤 연결을 닫습니다.
+    """
+    # 구독을 먼저 해 두어야 결과 확인과 구독 사이에 완료된 이벤트를 놓치지 않음
+    queue = progress_hub.subscribe(key)
+
+    async def event_stream():
+        try:
+            stored = await asyncio.to_thread(job_results.get, key)
+            if stored and stored["status"] in ("completed", "failed"):
+                yield _sse_message({"key": key, **stored})
+                return
+
+            latest = progress_hub.latest(key)
+            if latest:
+                yield _sse_message(latest)
+                if latest["status"] in ("completed", "failed"):
+                    return
+            elif stored is None:
+                yield _sse_message({"key": key, "status": "not_found"})
+                return
+
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n" # 프록시가 유휴 연결을 끊지 않도록 주기적으로 주석 전송
+                    continue
+                yield _sse_message(event)
+                if event["status"] in ("completed", "failed"):
+                    return
+        finally:
+            progress_hub.unsubscribe(key, queue)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/results/{key}/{file_type}")
 async def get_result_file(key: str, file_type: str):
     """처리 완료된 결과 파일을 반환합니다. (폴링용)"""
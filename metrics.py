@@ -0,0 +1,305 @@
+# /metrics.py
+import os
+import sys
+import json
+import math
+import threading
+from pathlib import Path
+
+# 단계/작업 소요 시간용 히스토그램 구간 (초) - 몇 초짜리 변환부터 몇 시간짜리 녹화본까지
+DEFAULT_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600, 7200)
+# 실시간 배율(처리 시간 / 오디오 길이)용 구간
+RTF_BUCKETS = (0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1, 2)
+# ASR 배치 크기용 구간
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {} # 라벨 값 튜플 -> 값
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _labels(self, key: tuple) -> dict:
+        return dict(zip(self.labelnames, key))
+
+    def samples(self) -> list:
+        """[(이름, 라벨 딕셔너리, 값)] 목록"""
+        with self._lock:
+            return [(self.name, self._labels(key), value) for key, value in self._values.items()]
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["buckets"][i] += 1
+                    break
+            state["sum"] += value
+            state["count"] += 1
+
+    def samples(self) -> list:
+        result = []
+        with self._lock:
+            for key, state in self._values.items():
+                labels = self._labels(key)
+                cumulative = 0
+                for bound, count in zip(self.buckets, state["buckets"]):
+                    cumulative += count
+                    result.append((f"{self.name}_bucket", {**labels, "le": _format_value(bound)}, cumulative))
+                result.append((f"{self.name}_sum", labels, state["sum"]))
+                result.append((f"{self.name}_count", labels, state["count"]))
+        return result
+
+class MetricsRegistry:
+    """
+    Prometheus 텍스트 형식(/metrics)으로 내보낼 메트릭 모음.
+    값을 직접 기록하는 메트릭(Counter/Gauge/Histogram) 외에,
+    큐 깊이처럼 조회 시점에 계산하는 값은 add_collector()로 등록한 함수가 만듭니다.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help_text: str, labelnames: tuple = ()) -> Counter:
+        return self._register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name: str, help_text: str, labelnames: tuple = ()) -> Gauge:
+        return self._register(Gauge(name, help_text, labelnames))
+
+    def histogram(self, name: str, help_text: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def add_collector(self, collector):
+        """
+        collector()는 [(이름, 설명, 타입, [(라벨 딕셔너리, 값), ...]), ...] 를 반환하는 함수입니다.
+        예외가 나면 해당 수집기만 건너뜁니다.
+        """
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        for collector in self._collectors:
+            try:
+                families = collector()
+            except Exception as e:
+                print(f"메트릭 수집 실패 ({getattr(collector, '__name__', collector)}): {e}")
+                continue
+            for name, help_text, metric_type, samples in families:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+def process_memory_bytes() -> dict:
+    """프로세스 메모리 사용량 (상주 메모리, 최대 상주 메모리, GPU 할당량)"""
+    memory = {}
+    try:
+        with open("/proc/self/statm", "r") as f:
+            memory["resident"] = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        memory["peak_resident"] = peak if sys.platform == "darwin" else peak * 1024 # 리눅스는 KB 단위
+    except ImportError: # Windows
+        pass
+    torch = sys.modules.get("torch") # 이미 로드된 경우에만 조회 (메트릭 때문에 torch를 import하지 않음)
+    if torch is not None and torch.cuda.is_available():
+        memory["cuda_allocated"] = torch.cuda.memory_allocated()
+        memory["cuda_reserved"] = torch.cuda.memory_reserved()
+    return memory
+
+class PipelineMetrics:
+    """
+    처리 파이프라인의 메트릭과 작업별 구조화 로그.
+
+    - 단계별 소요 시간/오디오 길이/실시간 배율(RTF), 레인/단계 큐 대기 시간
+    - 무음 건너뛰기(VAD)로 처리하지 않은 오디오 길이
+    - 장치(GPU/CPU)와 연산 타입별 처리량
+    - ASR 배치 크기와 메모리 부족(OOM)으로 배치를 줄여 다시 시도한 횟수
+    - 작업 종류(diarize/convert)별 결과(completed/failed/cached) 건수
+    - 작업이 끝날 때마다 한 줄짜리 JSON 기록 (콘솔 + job_log_path 파일)
+    """
+
+    def __init__(self, job_log_path: str = None):
+        self.registry = MetricsRegistry()
+        self.stage_seconds = self.registry.histogram(
+            "ailivegate_stage_seconds", "Time spent in each processing stage.", ("stage",)
+        )
+        self.stage_audio_seconds = self.registry.counter(
+            "ailivegate_stage_audio_seconds_total", "Seconds of audio processed by each stage.", ("stage",)
+        )
+        self.stage_rtf = self.registry.histogram(
+            "ailivegate_stage_real_time_factor", "Stage time divided by audio duration.", ("stage",), RTF_BUCKETS
+        )
+        self.stage_wait_seconds = self.registry.histogram(
+            "ailivegate_stage_wait_seconds", "Time a job waited in the queue in front of each stage.", ("stage",)
+        )
+        self.lane_wait_seconds = self.registry.histogram(
+            "ailivegate_lane_wait_seconds", "Time a request waited in its lane before being picked up.", ("lane",)
+        )
+        self.job_seconds = self.registry.histogram(
+            "ailivegate_job_seconds", "Time from job submission until it finished.", ("kind", "outcome")
+        )
+        self.vad_removed_seconds = self.registry.counter(
+            "ailivegate_vad_removed_audio_seconds_total", "Seconds of silence skipped before ASR and diarization.", ()
+        )
+        self.device_audio_seconds = self.registry.counter(
+            "ailivegate_device_audio_seconds_total", "Seconds of audio transcribed per device and compute type.",
+            ("device", "compute_type")
+        )
+        self.device_busy_seconds = self.registry.counter(
+            "ailivegate_device_processing_seconds_total", "Processing time spent per device and compute type.",
+            ("device", "compute_type")
+        )
+        self.asr_batch_size = self.registry.histogram(
+            "ailivegate_asr_batch_size", "Batch size used for each ASR call.", ("device",), BATCH_SIZE_BUCKETS
+        )
+        self.asr_oom_retries = self.registry.counter(
+            "ailivegate_asr_oom_retries_total", "ASR calls retried with a smaller batch after running out of memory.", ("device",)
+        )
+        self._throughput = {} # (장치, 연산 타입) -> {"jobs", "audio_seconds", "processing_seconds"}
+        self._throughput_lock = threading.Lock()
+        self.jobs_total = self.registry.counter(
+            "ailivegate_jobs_total", "Finished jobs by kind and outcome.", ("kind", "outcome")
+        )
+        self.job_log_path = Path(job_log_path) if job_log_path else None
+        if self.job_log_path is not None:
+            self.job_log_path.parent.mkdir(parents=True, exist_ok=True)
+        self._log_lock = threading.Lock()
+        self.registry.add_collector(self._collect_process)
+
+    def observe_stage(self, stage: str, seconds: float, audio_seconds: float):
+        self.stage_seconds.observe(seconds, stage=stage)
+        if audio_seconds:
+            self.stage_audio_seconds.inc(audio_seconds, stage=stage)
+            self.stage_rtf.observe(seconds / audio_seconds, stage=stage)
+
+    def observe_stage_wait(self, stage: str, seconds: float):
+        self.stage_wait_seconds.observe(seconds, stage=stage)
+
+    def observe_lane_wait(self, lane: str, seconds: float):
+        self.lane_wait_seconds.observe(seconds, lane=lane)
+
+    def observe_vad(self, removed_seconds: float):
+        self.vad_removed_seconds.inc(removed_seconds)
+
+    def observe_asr_batch(self, device: str, batch_size: int, oom_retries: int):
+        self.asr_batch_size.observe(batch_size, device=device)
+        if oom_retries:
+            self.asr_oom_retries.inc(oom_retries, device=device)
+
+    def observe_throughput(self, device: str, compute_type: str, audio_seconds: float, processing_seconds: float):
+        self.device_audio_seconds.inc(audio_seconds, device=device, compute_type=compute_type)
+        self.device_busy_seconds.inc(processing_seconds, device=device, compute_type=compute_type)
+        with self._throughput_lock:
+            totals = self._throughput.setdefault((device, compute_type), {"jobs": 0, "audio_seconds": 0.0, "processing_seconds": 0.0})
+            totals["jobs"] += 1
+            totals["audio_seconds"] += audio_seconds
+            totals["processing_seconds"] += processing_seconds
+
+    def real_time_factor(self):
+        """지금까지 끝난 작업 전체의 처리 시간 / 오디오 길이 (끝난 작업이 없으면 None) - 대기 시간 예상용"""
+        with self._throughput_lock:
+            audio_seconds = sum(totals["audio_seconds"] for totals in self._throughput.values())
+            processing_seconds = sum(totals["processing_seconds"] for totals in self._throughput.values())
+        return processing_seconds / audio_seconds if audio_seconds else None
+
+    def throughput(self) -> list:
+        """장치/연산 타입별 처리량 (GPU 경로와 CPU 경로 비교용)"""
+        with self._throughput_lock:
+            items = [(key, dict(totals)) for key, totals in self._throughput.items()]
+        return [
+            {
+                "device": device,
+                "compute_type": compute_type,
+                "jobs": totals["jobs"],
+                "audio_hours": round(totals["audio_seconds"] / 3600, 3),
+                # 처리 시간 / 오디오 길이 (작을수록 빠름), 처리 시간 1시간당 처리한 오디오 시간
+                "real_time_factor": round(totals["processing_seconds"] / totals["audio_seconds"], 4),
+                "audio_hours_per_hour": round(totals["audio_seconds"] / totals["processing_seconds"], 2)
+                    if totals["processing_seconds"] else None,
+            }
+            for (device, compute_type), totals in items
+        ]
+
+    def record_job(self, record: dict):
+        """끝난 작업 하나를 집계하고 구조화 로그로 남깁니다. (record에는 kind, outcome, total_seconds 필수)"""
+        self.jobs_total.inc(kind=record["kind"], outcome=record["outcome"])
+        self.job_seconds.observe(record["total_seconds"], kind=record["kind"], outcome=record["outcome"])
+        line = json.dumps({"event": "job_finished", **record}, ensure_ascii=False, default=str)
+        print(f"[job] {line}")
+        if self.job_log_path is not None:
+            try:
+                with self._log_lock, open(self.job_log_path, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+            except OSError as e:
+                print(f"작업 로그 기록 실패: {e}")
+
+    @staticmethod
+    def _collect_process():
+        memory = process_memory_bytes()
+        return [(
+            "ailivegate_process_memory_bytes", "Process memory usage.", "gauge",
+            [({"type": name}, value) for name, value in memory.items()]
+        )]
+
+    def render(self) -> str:
+        return self.registry.render()
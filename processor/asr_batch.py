@@ -0,0 +1,98 @@
+# /processor/asr_batch.py
+
+import math
+import threading
+
+from hardware import is_cpu, free_memory_bytes
+from processor.audio import SAMPLE_RATE
+from processor.models import estimate_model_bytes, free_device_memory
+
+# whisperx는 말소리 구간을 최대 30초 조각으로 묶어 배치로 인식하므로, 녹화본의 조각 수보다 큰 배치는 의미가 없음
+ASR_CHUNK_SECONDS = 30
+
+def is_out_of_memory(e: Exception) -> bool:
+    """GPU/CPU 메모리 부족 예외인지 (torch OutOfMemoryError, CTranslate2 "CUDA failed with error out of memory" 등)"""
+    if isinstance(e, MemoryError):
+        return True
+    message = str(e).lower()
+    return "out of memory" in message or "alloc_failed" in message
+
+class AsrBatchSizer:
+    """
+    ASR(whisperx transcribe) 배치 크기를 장치의 여유 메모리와 오디오 길이로 정하고, 메모리 부족이 나면 줄여서 다시 실행합니다.
+
+    - 배치 크기 = min(상한, 오디오의 30초 조각 수, 여유 메모리 × memory_fraction ÷ 배치 항목 하나의 추정 메모리)
+      배치 항목 하나의 메모리는 ASR 모델 추정 메모리 × item_memory_ratio로 봅니다. (큰 모델일수록 활성값도 큼)
+    - 메모리 부족이면 배치 크기를 절반으로 줄여 다시 시도하고(1까지), 그 크기를 (장치, 모델, 연산 타입)별 상한으로 기억하여
+      이후 작업이 같은 실패를 반복하지 않게 합니다.
+    - auto=False이면 장치별 고정 크기(fixed_gpu/fixed_cpu)에서 시작합니다. (메모리 부족 시 줄이는 것은 동일)
+    """
+
+    def __init__(
+        self,
+        max_gpu: int,
+        max_cpu: int,
+        fixed_gpu: int,
+        fixed_cpu: int,
+        item_memory_ratio: float,
+        memory_fraction: float,
+        auto: bool = True
+    ):
+        self.max_gpu = max_gpu
+        self.max_cpu = max_cpu
+        self.fixed_gpu = fixed_gpu
+        self.fixed_cpu = fixed_cpu
+        self.item_memory_ratio = item_memory_ratio
+        self.memory_fraction = memory_fraction
+        self.auto = auto
+        self._caps = {} # (장치, 모델, 연산 타입) -> 메모리 부족 후 줄인 상한
+        self._lock = threading.Lock()
+
+    def choose(self, device: str, model_name: str, compute_type: str, audio_seconds: float) -> int:
+        """이번 호출에 사용할 배치 크기"""
+        with self._lock:
+            cap = self._caps.get((device, model_name, compute_type))
+        if not self.auto:
+            size = self.fixed_cpu if is_cpu(device) else self.fixed_gpu
+            return max(1, min(size, cap or size))
+
+        size = self.max_cpu if is_cpu(device) else self.max_gpu
+        if cap is not None:
+            size = min(size, cap)
+        size = min(size, math.ceil(audio_seconds / ASR_CHUNK_SECONDS))
+        free = free_memory_bytes(device)
+        if free is not None:
+            item_bytes = estimate_model_bytes("asr", model_name, compute_type) * self.item_memory_ratio
+            size = min(size, int(free * self.memory_fraction // item_bytes))
+        return max(1, size)
+
+    def _lower_cap(self, device: str, model_name: str, compute_type: str, size: int):
+        key = (device, model_name, compute_type)
+        with self._lock:
+            self._caps[key] = min(self._caps.get(key, size), size)
+
+    def caps(self) -> dict:
+        """메모리 부족으로 줄어든 상한 {"장치/모델/연산 타입": 배치 크기}"""
+        with self._lock:
+            return {"/".join(key): size for key, size in self._caps.items()}
+
+    def transcribe(self, asr_model, audio, language: str, device: str, model_name: str, compute_type: str):
+        """
+        배치 크기를 정해 asr_model.transcribe를 실행합니다.
+        반환값: (결과, {"batch_size": 성공한 배치 크기, "oom_retries": 메모리 부족으로 다시 시도한 횟수})
+        """
+        size = self.choose(device, model_name, compute_type, len(audio) / SAMPLE_RATE)
+        retries = 0
+        while True:
+            try:
+                result = asr_model.transcribe(audio, language=language, batch_size=size)
+                return result, {"batch_size": size, "oom_retries": retries}
+            except Exception as e:
+                if not is_out_of_memory(e) or size <= 1:
+                    raise
+                print(f"   - ASR 메모리 부족 (배치 크기 {size}) - {max(1, size // 2)}(으)로 줄여 다시 시도합니다. ({type(e).__name__})")
+            # 예외(트레이스백이 잡고 있는 텐서)를 놓은 뒤에 캐시를 비워야 메모리가 실제로 반환됨
+            size = max(1, size // 2)
+            self._lower_cap(device, model_name, compute_type, size)
+            free_device_memory()
+            retries += 1
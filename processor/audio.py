@@ -0,0 +1,95 @@
+# /processor/audio.py
+
+import os
+import tempfile
+import numpy as np
+import ffmpeg
+
+# whisperx가 기대하는 입력 형식 (16kHz 모노 float32)
+SAMPLE_RATE = 16000
+
+# ffmpeg 표준출력에서 한 번에 읽을 바이트 수 (memmap 모드용)
+_READ_CHUNK_BYTES = 4 * 1024 * 1024
+
+def probe_duration(path: str) -> float:
+    """ffprobe로 미디어 파일의 길이(초)를 구합니다. 알 수 없으면 0.0을 반환합니다."""
+    try:
+        info = ffmpeg.probe(path)
+    except ffmpeg.Error:
+        return 0.0
+    duration = info.get("format", {}).get("duration")
+    return float(duration) if duration else 0.0
+
+def _pcm_output(path: str, start: float = None, duration: float = None):
+    """영상/오디오 파일을 16kHz 모노 float32 PCM으로 표준출력에 쓰는 ffmpeg 스트림"""
+    input_kwargs = {}
+    if start:
+        input_kwargs["ss"] = start
+    if duration:
+        input_kwargs["t"] = duration
+    return ffmpeg.input(path, **input_kwargs).output(
+        "pipe:", format="f32le", acodec="pcm_f32le", ac=1, ar=str(SAMPLE_RATE)
+    ).global_args("-nostdin", "-nostats", "-loglevel", "error") # stderr 파이프가 차서 멈추지 않도록 로그 최소화
+
+def decode_audio(
+    path: str,
+    use_mmap: bool = False,
+    mmap_dir: str = None,
+    start: float = None,
+    duration: float = None
+) -> np.ndarray:
+    """
+    ffmpeg를 한 번만 실행하여 미디어 파일을 16kHz 모노 float32 NumPy 배열로 디코딩합니다.
+    중간 WAV 파일을 만들지 않으므로 whisperx.load_audio 대신 바로 ASR/정렬/화자분리에 넘길 수 있습니다.
+
+    use_mmap=True 이면 디코딩 결과를 임시 파일로 흘려 쓰고 np.memmap으로 엽니다.
+    수 시간짜리 녹화본도 전체를 RAM에 올리지 않고 OS 페이지 캐시에 맡길 수 있습니다.
+    이 경우 작업이 끝나면 release_audio()로 임시 파일을 정리해야 합니다.
+
+    start/duration(초)을 주면 해당 구간만 디코딩합니다. (긴 녹화본의 구간별 처리용)
+    """
+    if not use_mmap:
+        try:
+            out, _ = _pcm_output(path, start, duration).run(capture_stdout=True, capture_stderr=True)
+        except ffmpeg.Error as e:
+            raise RuntimeError(f"오디오 디코딩 실패: {e.stderr.decode('utf8', errors='ignore')}") from e
+        return np.frombuffer(out, dtype=np.float32)
+
+    process = _pcm_output(path, start, duration).run_async(pipe_stdout=True, pipe_stderr=True)
+    tmp = tempfile.NamedTemporaryFile(prefix="pcm_", suffix=".f32", dir=mmap_dir, delete=False)
+    try:
+        with tmp:
+            while True:
+                chunk = process.stdout.read(_READ_CHUNK_BYTES)
+                if not chunk:
+                    break
+                tmp.write(chunk)
+        stderr = process.stderr.read()
+        if process.wait() != 0:
+            raise RuntimeError(f"오디오 디코딩 실패: {stderr.decode('utf8', errors='ignore')}")
+        if os.path.getsize(tmp.name) == 0:
+            os.unlink(tmp.name)
+            return np.zeros(0, dtype=np.float32)
+        return np.memmap(tmp.name, dtype=np.float32, mode="r")
+    except Exception:
+        process.kill()
+        if os.path.exists(tmp.name):
+            os.unlink(tmp.name)
+        raise
+
+def release_audio(audio):
+    """decode_audio(use_mmap=True)로 만든 memmap의 임시 파일을 닫고 삭제합니다. 일반 배열이면 아무 일도 하지 않습니다."""
+    if not isinstance(audio, np.memmap) or not audio.filename:
+        return
+    filename = audio.filename
+    mm = getattr(audio, "_mmap", None)
+    if mm is not None:
+        try:
+            mm.close()
+        except BufferError:
+            # 아직 배열 조각(view)을 참조하는 곳이 있으면 닫을 수 없음 (GC가 정리)
+            pass
+    try:
+        os.unlink(filename)
+    except OSError as e:
+        print(f"임시 PCM 파일 삭제 실패: {filename} ({e})")
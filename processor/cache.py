@@ -0,0 +1,213 @@
+# /processor/cache.py
+
+import os
+import json
+import pickle
+import hashlib
+import time
+import threading
+from pathlib import Path
+
+def hash_audio(audio) -> str:
+    """디코딩된 PCM 배열의 내용으로 sha256 해시를 계산합니다. (컨테이너/파일명이 달라도 같은 소리면 같은 해시)"""
+    return hashlib.sha256(memoryview(audio).cast("B")).hexdigest()
+
+def make_cache_key(audio_hash: str, model_name: str, diarization_params: dict, **options) -> str:
+    """
+    오디오 해시 + 모델 이름 + 화자분리 파라미터로 결과 캐시 키를 만듭니다.
+    options : 결과에 영향을 주는 그 밖의 처리 설정 (예: vad) - 주지 않으면 이전 버전과 같은 키
+    """
+    payload = json.dumps(
+        {"audio": audio_hash, "model": model_name, "diarization": diarization_params, **options},
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class _DiskLRU:
+    """
+    키 하나당 파일 하나로 값을 저장하는 디스크 캐시의 공통 부분.
+    전체 크기가 max_bytes를 넘으면 가장 오래 사용하지 않은 항목부터 삭제합니다. (LRU, 파일 mtime 기준)
+    """
+
+    suffix = ""
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = Path(directory)
+        self.entries_dir = self.directory / "entries"
+        self.entries_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _read(self, path: Path):
+        raise NotImplementedError
+
+    def _write(self, path: Path, value):
+        raise NotImplementedError
+
+    def get(self, key: str):
+        """캐시된 값을 반환합니다. 없으면 None."""
+        entry_path = self.entries_dir / f"{key}{self.suffix}"
+        with self._lock:
+            try:
+                value = self._read(entry_path)
+                self._touch(entry_path) # LRU 순서 갱신
+            except (OSError, ValueError, EOFError, pickle.UnpicklingError):
+                self.misses += 1
+                return None
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value):
+        """값을 저장하고, 용량을 넘으면 오래된 항목을 삭제합니다."""
+        with self._lock:
+            entry_path = self.entries_dir / f"{key}{self.suffix}"
+            tmp_path = entry_path.with_name(f"{entry_path.name}.{threading.get_ident()}.tmp")
+            try:
+                self._write(tmp_path, value)
+                os.replace(tmp_path, entry_path)
+                self._touch(entry_path)
+            except (OSError, pickle.PicklingError) as e:
+                print(f"캐시 저장 실패 ({self.directory}, 키: {key}): {e}")
+                if tmp_path.exists():
+                    tmp_path.unlink()
+                return
+            self._evict()
+
+    def _evict(self):
+        entries = []
+        total = 0
+        for entry in self.entries_dir.glob(f"*{self.suffix}"):
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, entry))
+            total += stat.st_size
+
+        entries.sort() # 가장 오래 사용하지 않은 항목이 앞으로
+        for _, size, entry in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                entry.unlink()
+                total -= size
+            except OSError:
+                pass
+
+    @staticmethod
+    def _touch(path: Path):
+        # 파일시스템 시계 해상도가 낮아도 순서가 뒤섞이지 않도록 나노초 단위로 직접 기록
+        now = time.time_ns()
+        os.utime(path, ns=(now, now))
+
+    def stats(self) -> dict:
+        """적중/실패 횟수와 현재 캐시 크기를 반환합니다."""
+        count = 0
+        total = 0
+        for entry in self.entries_dir.glob(f"*{self.suffix}"):
+            try:
+                total += entry.stat().st_size
+                count += 1
+            except OSError:
+                continue # 통계를 내는 도중 삭제된 항목
+        total_requests = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total_requests, 4) if total_requests else 0.0,
+            "entries": count,
+            "bytes": total,
+            "max_bytes": self.max_bytes,
+        }
+
+class ResultCache(_DiskLRU):
+    """
+    처리 결과(txt/vtt)를 디스크에 저장하는 내용 기반(content-addressed) 캐시.
+
+    - entries/<키>.json : 결과 본문
+    - sources/<파일식별자>.txt : (경로, 크기, 수정시각) → 오디오 해시
+      sources/<업로드 내용 해시>.txt : 업로드 파일 sha256 → 오디오 해시 (같은 파일을 다시 업로드한 경우)
+      같은 파일이 다시 들어오면 디코딩 없이 바로 캐시를 조회할 수 있습니다.
+    """
+
+    suffix = ".json"
+
+    def __init__(self, directory: str, max_bytes: int):
+        super().__init__(directory, max_bytes)
+        self.sources_dir = self.directory / "sources"
+        self.sources_dir.mkdir(parents=True, exist_ok=True)
+
+    def _read(self, path: Path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write(self, path: Path, value):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(value, f, ensure_ascii=False)
+
+    @staticmethod
+    def _source_id(path: str) -> str:
+        stat = os.stat(path)
+        identity = f"{Path(path).resolve()}|{stat.st_size}|{stat.st_mtime_ns}"
+        return hashlib.sha256(identity.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _content_id(content_hash: str) -> str:
+        return hashlib.sha256(f"content|{content_hash}".encode("utf-8")).hexdigest()
+
+    def _lookup(self, source_id: str):
+        try:
+            return (self.sources_dir / f"{source_id}.txt").read_text(encoding="utf-8").strip()
+        except OSError:
+            return None
+
+    def _remember(self, source_id: str, audio_hash: str):
+        index_path = self.sources_dir / f"{source_id}.txt"
+        tmp_path = index_path.with_name(f"{index_path.name}.{threading.get_ident()}.tmp")
+        tmp_path.write_text(audio_hash, encoding="utf-8")
+        os.replace(tmp_path, index_path)
+
+    def lookup_source(self, path: str, content_hash: str = None):
+        """
+        이전에 디코딩한 적 있는 (변경되지 않은) 파일이면 그 오디오 해시를 반환합니다.
+        content_hash(파일 내용 sha256)를 주면 경로가 달라도 같은 내용의 파일을 찾습니다.
+        """
+        try:
+            audio_hash = self._lookup(self._source_id(path))
+        except OSError:
+            audio_hash = None
+        if audio_hash is None and content_hash is not None:
+            audio_hash = self._lookup(self._content_id(content_hash))
+        return audio_hash
+
+    def remember_source(self, path: str, audio_hash: str, content_hash: str = None):
+        """파일 식별자(와 파일 내용 해시) → 오디오 해시 매핑을 기록합니다."""
+        try:
+            self._remember(self._source_id(path), audio_hash)
+            if content_hash is not None:
+                self._remember(self._content_id(content_hash), audio_hash)
+        except OSError as e:
+            print(f"캐시 소스 인덱스 기록 실패: {path} ({e})")
+
+class ArtifactStore(_DiskLRU):
+    """
+    녹화본별 중간 산출물(ASR+정렬 결과, pyannote 세그멘테이션/임베딩)을 pickle로 저장하는 캐시.
+    화자분리 파라미터만 바꿔 다시 돌릴 때 ASR/정렬/임베딩 추출을 건너뛰는 데 사용합니다.
+    """
+
+    suffix = ".pkl"
+
+    def _read(self, path: Path):
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+    def _write(self, path: Path, value):
+        with open(path, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+def make_artifact_key(audio_hash: str, kind: str, **identity) -> str:
+    """오디오 해시 + 산출물 종류 + 산출물을 만든 모델 정보로 중간 산출물 키를 만듭니다."""
+    payload = json.dumps({"audio": audio_hash, "kind": kind, **identity}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
@@ -0,0 +1,72 @@
+# /processor/diarize.py
+
+from config import (
+    DEFAULT_DIARIZATION_THRESHOLD, DEFAULT_MIN_DURATION_OFF, DEFAULT_MIN_SPEAKERS, DEFAULT_MAX_SPEAKERS
+)
+from processor.audio import SAMPLE_RATE
+
+# pyannote SpeakerDiarization 파이프라인이 training 모드에서 세그멘테이션/임베딩을 보관하는 키 접두사
+# (같은 file 딕셔너리로 다시 호출하면 이 값들을 재사용하고 클러스터링만 다시 수행)
+FEATURE_CACHE_PREFIX = "training_cache/"
+
+def enable_feature_reuse(diarize_model):
+    """
+    pyannote 파이프라인을 training 모드로 전환하여 세그멘테이션/임베딩을 file 딕셔너리에 보관·재사용하게 합니다.
+    training 모드는 추론 결과에는 영향이 없고, 중간 결과를 캐싱하는 동작만 켭니다.
+    """
+    diarize_model.model.training = True
+
+def run_diarization(diarize_model, audio, diarization_params: dict, cached_features: dict = None):
+    """
+    whisperx DiarizationPipeline.__call__ 과 같은 결과(DataFrame)를 만들되,
+    이전에 계산한 pyannote 세그멘테이션/임베딩(cached_features)이 있으면 재사용합니다.
+
+    파이프라인 객체의 파라미터를 바꾸므로, 호출하는 쪽에서 이 파이프라인을 독점하고 있어야 합니다.
+    (MODEL_POOL.use 블록 안에서 호출) 빠진 파라미터는 기본값으로 채워 이전 작업의 설정이 남지 않게 합니다.
+
+    반환값: (diarize_segments DataFrame, 다음 실행에서 재사용할 features 딕셔너리)
+    """
+    # torch/pandas는 무거우므로 서버 시작 시가 아니라 처음 화자분리할 때 import
+    import torch
+    import pandas as pd
+
+    pipeline = diarize_model.model
+    params = {
+        "threshold": DEFAULT_DIARIZATION_THRESHOLD,
+        "min_duration_off": DEFAULT_MIN_DURATION_OFF,
+        "min_speakers": DEFAULT_MIN_SPEAKERS,
+        "max_speakers": DEFAULT_MAX_SPEAKERS,
+        **diarization_params,
+    }
+
+    # 파이프라인 내부 속성 값을 이 작업의 설정으로 직접 변경합니다.
+    pipeline.clustering.threshold = params['threshold']
+    pipeline.segmentation.min_duration_off = params['min_duration_off']
+
+    audio_file = {
+        'waveform': torch.from_numpy(audio[None, :]),
+        'sample_rate': SAMPLE_RATE,
+    }
+    if cached_features:
+        audio_file.update(cached_features)
+
+    # pyannote가 내부에서 file 딕셔너리를 감쌀 수 있으므로, 실제로 사용된 객체를 hook으로 붙잡아 둡니다.
+    used_file = {}
+    def capture_file(step_name, step_artifact, file=None, **kwargs):
+        if file is not None:
+            used_file["file"] = file
+
+    segments = pipeline(
+        audio_file,
+        min_speakers=params['min_speakers'],
+        max_speakers=params['max_speakers'],
+        hook=capture_file,
+    )
+
+    file = used_file.get("file", audio_file)
+    features = {key: file[key] for key in list(file.keys()) if key.startswith(FEATURE_CACHE_PREFIX)}
+
+    diarize_df = pd.DataFrame(segments.itertracks(yield_label=True), columns=['segment', 'label', 'speaker'])
+    diarize_df['start'] = diarize_df['segment'].apply(lambda x: x.start)
+    diarize_df['end'] = diarize_df['segment'].apply(lambda x: x.end)
+    return diarize_df, features
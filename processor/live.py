@@ -0,0 +1,308 @@
+# /processor/live.py
+
+import io
+import time
+import asyncio
+import ffmpeg
+import numpy as np
+
+from processor.audio import SAMPLE_RATE
+from processor.diarize import run_diarization
+from processor.models import DIARIZATION_MODEL_NAME
+from processor.postprocess import TranscriptStreamWriter
+from processor.windowed import SpeakerStitcher, _shift_result
+from processor.tasks import MODEL_POOL, transcribe
+
+# 받을 수 있는 PCM 형식 (16kHz 모노) -> NumPy 자료형
+PCM_FORMATS = {"f32le": np.float32, "s16le": np.int16}
+# 이보다 짧은(초) 오디오는 부분 결과용으로 인식하지 않음
+_MIN_STEP_AUDIO_SECONDS = 0.5
+
+class PcmDecoder:
+    """바이트 단위로 잘려 들어오는 16kHz 모노 PCM을 float32 샘플로 바꿉니다. (샘플 경계에 걸친 바이트는 다음 조각으로 넘김)"""
+
+    def __init__(self, sample_format: str = "f32le"):
+        self.dtype = np.dtype(PCM_FORMATS[sample_format])
+        self._rest = b""
+
+    def decode(self, data: bytes) -> np.ndarray:
+        data = self._rest + data
+        usable = len(data) - len(data) % self.dtype.itemsize
+        self._rest = data[usable:]
+        samples = np.frombuffer(data[:usable], dtype=self.dtype)
+        if self.dtype == np.int16:
+            return samples.astype(np.float32) / 32768.0
+        return samples
+
+def prepare_live_job(key: str, model_name: str, device: str, compute_type: str, language: str, diarization_params: dict) -> dict:
+    """실시간 세션의 모델/파라미터 정보 (transcribe()가 prepare_diarize_job과 같은 키를 읽고 배치 크기를 기록)"""
+    return {
+        "key": key,
+        "model_name": model_name,
+        "device": device,
+        "compute_type": compute_type,
+        "language": language,
+        "replica": 0,
+        "diarization_params": diarization_params,
+        "asr_batch_size": None,
+        "asr_oom_retries": 0,
+    }
+
+class LiveTranscriber:
+    """
+    실시간으로 들어오는 오디오를 구간을 옮겨 가며 인식하고, 확정한 발언에 화자를 붙여 내보내는 세션.
+
+    - feed(samples)로 오디오를 받고, step_seconds만큼 새로 쌓일 때마다 step()을 실행합니다.
+    - step()은 아직 확정하지 않은 오디오 전체를 다시 인식하여 부분 결과(partial)를 만듭니다.
+    - 확정하지 않은 오디오가 window_seconds를 넘으면, 끝에서 holdback_seconds 전에 끝나는 발언까지
+      정렬 → 화자분리(이전에 확정한 오디오 context_seconds 포함) → 화자 지정하여 최종 결과(final)로 확정합니다.
+      화자 라벨은 겹친 구간을 기준으로 SpeakerStitcher가 세션 전체에서 이어 붙입니다.
+    - 확정한 발언은 TranscriptStreamWriter로 회의록/VTT에 쌓이므로, 세션이 끝나면 일반 작업과 같은 형식의 결과가 남습니다.
+
+    모델은 단계마다 MODEL_POOL에서 잠깐씩 빌려 쓰므로 같은 장치의 배치 작업과 번갈아 실행됩니다.
+    feed()/collect()는 이벤트 루프에서, step()/finish()는 작업 스레드에서 호출합니다. (run_live_session 참고)
+    """
+
+    def __init__(
+        self,
+        job: dict,
+        step_seconds: float,
+        window_seconds: float,
+        holdback_seconds: float,
+        context_seconds: float,
+        max_pending_seconds: float
+    ):
+        self.job = job
+        self.step_seconds = step_seconds
+        self.window_seconds = window_seconds
+        self.holdback_seconds = holdback_seconds
+        self.context_seconds = context_seconds
+        self.max_pending_seconds = max(max_pending_seconds, window_seconds)
+        self._chunks = []        # 아직 audio에 붙이지 않은 조각 (이벤트 루프에서 추가)
+        self.received = 0        # 지금까지 받은 샘플 수
+        self.collected = 0       # 마지막으로 collect()한 시점의 샘플 수
+        self.audio = np.zeros(0, dtype=np.float32)
+        self.audio_start = 0.0   # audio[0]의 세션 기준 시각 (초)
+        self.committed = 0.0     # 이 시각까지의 발언은 확정됨
+        self.stitcher = SpeakerStitcher()
+        self.txt = io.StringIO()
+        self.vtt = io.StringIO()
+        self.writer = TranscriptStreamWriter(self.txt, self.vtt)
+
+    @property
+    def received_seconds(self) -> float:
+        return self.received / SAMPLE_RATE
+
+    def feed(self, samples: np.ndarray):
+        """16kHz 모노 float32 샘플을 받습니다."""
+        if len(samples):
+            self._chunks.append(samples)
+            self.received += len(samples)
+
+    def due(self) -> bool:
+        """마지막 인식 이후 step_seconds 이상 새 오디오가 쌓였는지"""
+        return (self.received - self.collected) / SAMPLE_RATE >= self.step_seconds
+
+    def collect(self):
+        """받아 둔 조각을 인식할 오디오 뒤에 붙입니다."""
+        if self._chunks:
+            self.audio = np.concatenate([self.audio, *self._chunks])
+            self._chunks = []
+        self.collected = self.received
+
+    def _index(self, seconds: float) -> int:
+        return max(0, int(round((seconds - self.audio_start) * SAMPLE_RATE)))
+
+    def step(self, final: bool = False) -> list:
+        """
+        확정하지 않은 오디오를 인식하여 보낼 메시지 목록을 반환합니다.
+        final=True이면 (스트림 끝) 남은 발언을 모두 확정합니다.
+        """
+        started_at = time.monotonic()
+        offset = self.committed
+        end = self.audio_start + len(self.audio) / SAMPLE_RATE
+        pending = self.audio[self._index(offset):]
+        pending_seconds = len(pending) / SAMPLE_RATE
+        if pending_seconds < _MIN_STEP_AUDIO_SECONDS and not (final and len(pending)):
+            return []
+
+        job = self.job
+        with MODEL_POOL.use("asr", job["model_name"], job["device"], job["compute_type"], replica=job["replica"]) as asr_model:
+            segments = transcribe(asr_model, pending, [job])["segments"]
+
+        messages = []
+        if final or pending_seconds >= self.window_seconds:
+            cut, commit_until = self._commit_point(segments, pending_seconds, final)
+            if commit_until is not None:
+                final_message = self._commit(segments[:cut], offset, offset + commit_until)
+                if final_message is not None:
+                    messages.append(final_message)
+                segments = segments[cut:]
+
+        if segments:
+            messages.append({
+                "type": "partial",
+                "start": round(self.committed, 3),
+                "end": round(end, 3),
+                "segments": [
+                    {"start": round(seg["start"] + offset, 3), "end": round(seg["end"] + offset, 3), "text": seg["text"].strip()}
+                    for seg in segments
+                ],
+            })
+        for message in messages:
+            message["processing_seconds"] = round(time.monotonic() - started_at, 3)
+        return messages
+
+    def _commit_point(self, segments: list, pending_seconds: float, final: bool):
+        """
+        이번에 확정할 (앞쪽 세그먼트 수, 확정할 시각 - offset 기준)을 정합니다. 확정하지 않으면 시각은 None.
+        말하는 중일 수 있는 끝부분(holdback_seconds)에 걸친 발언은 다음 번 인식으로 미룹니다.
+        """
+        if final:
+            return len(segments), pending_seconds
+        limit = pending_seconds - self.holdback_seconds
+        if not segments:
+            # 말소리가 없으면 끝부분만 남기고 넘어감
+            return 0, limit
+        cut = 0
+        while cut < len(segments) and segments[cut]["end"] <= limit:
+            cut += 1
+        if cut:
+            return cut, segments[cut - 1]["end"]
+        if pending_seconds >= self.max_pending_seconds:
+            # 끝없이 이어지는 발언 - 지연/메모리 상한을 넘지 않도록 전부 확정
+            return len(segments), pending_seconds
+        return 0, None
+
+    def _commit(self, segments: list, offset: float, commit_until: float):
+        """segments(offset 기준)를 정렬/화자 지정하여 회의록에 쓰고 최종 결과 메시지를 반환합니다. (발언이 없으면 None)"""
+        import whisperx
+
+        job = self.job
+        message = None
+        if segments:
+            audio = self.audio[self._index(offset):self._index(commit_until)]
+            with MODEL_POOL.use("align", device=job["device"], language=job["language"], replica=job["replica"]) as align_model_data:
+                result = whisperx.align(
+                    segments,
+                    align_model_data["model"],
+                    align_model_data["metadata"],
+                    audio,
+                    job["device"],
+                    return_char_alignments=False
+                )
+            _shift_result(result, offset)
+
+            # 이전에 확정한 오디오의 끝부분을 함께 넣어야 화자 라벨을 이어 붙일 수 있음
+            diarize_start = max(self.audio_start, offset - self.context_seconds)
+            diarize_audio = self.audio[self._index(diarize_start):self._index(commit_until)]
+            with MODEL_POOL.use("diarize", DIARIZATION_MODEL_NAME, job["device"], replica=job["replica"]) as diarize_model:
+                diarize_df, _ = run_diarization(diarize_model, diarize_audio, job["diarization_params"])
+            diarize_df['start'] += diarize_start
+            diarize_df['end'] += diarize_start
+            self.stitcher.stitch(diarize_df, keep_after=commit_until - self.context_seconds)
+            result = whisperx.assign_word_speakers(diarize_df, result)
+
+            # 이번에 추가된 VTT 큐는 최종 VTT 파일과 글자 단위로 같음
+            vtt_before = self.vtt.tell()
+            self.writer.add_many(result["segments"])
+            message = {
+                "type": "final",
+                "start": round(offset, 3),
+                "end": round(commit_until, 3),
+                "segments": [
+                    {
+                        "start": round(seg["start"], 3),
+                        "end": round(seg["end"], 3),
+                        "speaker": seg.get("speaker", "UNKNOWN"),
+                        "text": seg["text"].strip(),
+                    }
+                    for seg in result["segments"]
+                ],
+                "vtt": self.vtt.getvalue()[vtt_before:],
+            }
+
+        self.committed = commit_until
+        # 다음 화자분리에 넣을 context_seconds만 남기고 버림
+        keep_from = self._index(commit_until - self.context_seconds)
+        if keep_from:
+            self.audio = self.audio[keep_from:]
+            self.audio_start += keep_from / SAMPLE_RATE
+        return message
+
+    def finish(self) -> dict:
+        """세션을 마무리하고 전체 회의록/VTT를 담은 메시지를 반환합니다."""
+        self.writer.close()
+        return {
+            "type": "done",
+            "duration": round(self.received_seconds, 3),
+            "txt": self.txt.getvalue(),
+            "vtt": self.vtt.getvalue(),
+            "asr_batch_size": self.job["asr_batch_size"],
+        }
+
+async def run_live_session(transcriber: LiveTranscriber, chunks, send):
+    """
+    chunks(16kHz 모노 float32 샘플 배열을 내주는 async iterator)를 받으며 transcriber로 인식하고,
+    메시지(partial/final, 마지막에 done)를 send(dict)로 보냅니다.
+    인식하는 동안에도 입력은 계속 받으므로, 처리가 늦어지면 다음 인식에서 밀린 오디오를 한 번에 처리합니다.
+    """
+    due = asyncio.Event()
+
+    async def read():
+        async for samples in chunks:
+            transcriber.feed(samples)
+            if transcriber.due():
+                due.set()
+
+    reader = asyncio.create_task(read())
+    try:
+        while True:
+            waiter = asyncio.create_task(due.wait())
+            await asyncio.wait({reader, waiter}, return_when=asyncio.FIRST_COMPLETED)
+            waiter.cancel()
+            if reader.done():
+                break
+            due.clear()
+            transcriber.collect()
+            for message in await asyncio.to_thread(transcriber.step):
+                await send(message)
+        reader.result() # 입력 쪽 오류(연결 끊김, ffmpeg 실패)를 그대로 전달
+
+        transcriber.collect()
+        for message in await asyncio.to_thread(transcriber.step, True):
+            await send(message)
+        await send(await asyncio.to_thread(transcriber.finish))
+    finally:
+        reader.cancel()
+
+async def ffmpeg_pcm_chunks(source: str, realtime: bool = True, chunk_seconds: float = 0.5):
+    """
+    ffmpeg가 읽을 수 있는 입력(파일, rtmp/http/srt 스트림 등)을 16kHz 모노 float32 조각으로 내줍니다.
+    realtime=True이면 -re로 원래 재생 속도에 맞춰 읽습니다. (로컬 파일을 실시간 스트림처럼 재생하여 시험할 때)
+    """
+    input_kwargs = {"re": None} if realtime else {}
+    args = ffmpeg.input(source, **input_kwargs).output(
+        "pipe:", format="f32le", acodec="pcm_f32le", ac=1, ar=str(SAMPLE_RATE)
+    ).global_args("-nostdin", "-nostats", "-loglevel", "error").compile()
+    process = await asyncio.create_subprocess_exec(
+        *args,
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    decoder = PcmDecoder("f32le")
+    read_bytes = int(chunk_seconds * SAMPLE_RATE) * 4
+    try:
+        while True:
+            data = await process.stdout.read(read_bytes)
+            if not data:
+                break
+            yield decoder.decode(data)
+        stderr = await process.stderr.read()
+        if await process.wait() != 0:
+            raise RuntimeError(f"오디오 스트림 읽기 실패: {stderr.decode('utf8', errors='ignore')}")
+    finally:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
@@ -0,0 +1,215 @@
+# /processor/models.py
+
+import gc
+import time
+import threading
+from contextlib import contextmanager
+
+from config import HF_TOKEN
+
+DIARIZATION_MODEL_NAME = "pyannote/speaker-diarization-3.1"
+
+# 모델별 대략적인 메모리 사용량 (float16 기준, 바이트) - 메모리 예산 계산용
+_GB = 1024 ** 3
+ASR_MEMORY_ESTIMATES = {
+    "tiny": 0.1 * _GB,
+    "base": 0.2 * _GB,
+    "small": 0.6 * _GB,
+    "medium": 1.6 * _GB,
+    "large-v3-turbo": 1.7 * _GB,
+    "turbo": 1.7 * _GB,
+}
+ASR_DEFAULT_ESTIMATE = 3.2 * _GB # large-v1/v2/v3 및 알 수 없는 모델
+ALIGN_MEMORY_ESTIMATE = 1.3 * _GB
+DIARIZE_MEMORY_ESTIMATE = 0.4 * _GB
+# compute_type별 배율 (float16 대비)
+COMPUTE_TYPE_FACTORS = {"float16": 1.0, "bfloat16": 1.0, "int8_float16": 0.6, "int8": 0.5, "float32": 2.0}
+
+def estimate_model_bytes(kind: str, name: str = None, compute_type: str = None) -> int:
+    """모델 종류/이름/연산 타입으로 메모리 사용량을 추정합니다."""
+    if kind == "asr":
+        base = ASR_MEMORY_ESTIMATES.get(name, ASR_DEFAULT_ESTIMATE)
+        return int(base * COMPUTE_TYPE_FACTORS.get(compute_type, 1.0))
+    if kind == "align":
+        return int(ALIGN_MEMORY_ESTIMATE)
+    return int(DIARIZE_MEMORY_ESTIMATE)
+
+# CPU에서 모델 하나가 사용할 스레드 수 (configure_cpu_threads로 설정, 0이면 라이브러리 기본값)
+_cpu_threads = 0
+
+def configure_cpu_threads(threads: int):
+    """CPU에서 실행하는 모델(CTranslate2 ASR, torch 정렬/화자분리)의 스레드 수를 정합니다."""
+    global _cpu_threads
+    _cpu_threads = threads
+
+def _apply_torch_threads(device: str):
+    if _cpu_threads and split_device(device)[0] == "cpu":
+        import torch
+        torch.set_num_threads(_cpu_threads)
+
+def split_device(device: str):
+    """'cuda:1' → ('cuda', 1), 'cpu' → ('cpu', 0)"""
+    kind, _, index = device.partition(":")
+    return kind, int(index) if index else 0
+
+def _load_asr(name, device, compute_type, language):
+    import whisperx
+    # CTranslate2는 'cuda:1' 형식을 받지 않으므로 장치 종류와 번호를 나눠서 전달
+    device_kind, device_index = split_device(device)
+    options = {"threads": _cpu_threads} if device_kind == "cpu" and _cpu_threads else {}
+    return whisperx.load_model(name, device_kind, device_index=device_index, compute_type=compute_type, **options)
+
+def _load_align(name, device, compute_type, language):
+    import whisperx
+    _apply_torch_threads(device)
+    model_a, metadata = whisperx.load_align_model(language_code=language, device=device)
+    return {"model": model_a, "metadata": metadata}
+
+def _load_diarize(name, device, compute_type, language):
+    from whisperx.diarize import DiarizationPipeline
+    _apply_torch_threads(device)
+    # hf_token은 huggingface-cli login을 통해 자동으로 사용됩니다.
+    return DiarizationPipeline(name, use_auth_token=HF_TOKEN, device=device)
+
+DEFAULT_LOADERS = {
+    "asr": _load_asr,
+    "align": _load_align,
+    "diarize": _load_diarize,
+}
+
+def free_device_memory():
+    gc.collect()
+    try:
+        import torch
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+    except ImportError:
+        pass
+
+class ModelPool:
+    """
+    (종류, 모델 이름, 장치, 연산 타입, 언어, 복제본 번호)를 키로 모델을 필요할 때 로드하고 여러 작업이 공유하는 모델 풀.
+
+    로드된 모델의 추정 메모리 합계가 budget_bytes를 넘으면, 사용 중이 아닌 모델 중
+    가장 오래 사용하지 않은 것부터 내립니다. (LRU)
+    사용 중인 모델만으로 예산을 넘는 경우에는 경고만 출력하고 로드합니다.
+
+    whisperx/pyannote 모델 객체는 호출 중에 내부 상태(토크나이저, 화자분리 파라미터 등)를 바꾸므로
+    한 인스턴스는 한 번에 한 작업만 사용합니다. 여러 워커가 같은 장치에서 동시에 돌리려면
+    replica 번호를 달리하여 각자 인스턴스를 갖게 합니다.
+    """
+
+    def __init__(self, budget_bytes: int, loaders: dict = None, on_load=None):
+        self.budget_bytes = budget_bytes
+        # 벤치마크/테스트에서 가짜 모델로 바꿔 끼울 수 있도록 로더를 주입 가능하게 둠
+        self.loaders = dict(loaders or DEFAULT_LOADERS)
+        # on_load(kind, model)는 모델을 새로 로드할 때마다 호출됩니다. (추가 설정용)
+        self.on_load = on_load
+        self._entries = {}     # key -> {"model", "bytes", "in_use", "last_used", "load_seconds"}
+        self._load_locks = {}  # key -> threading.Lock (같은 모델을 동시에 두 번 로드하지 않도록)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(kind: str, name: str = None, device: str = None, compute_type: str = None, language: str = None, replica: int = 0):
+        if kind == "asr":
+            # ASR 모델은 다국어 모델이므로 언어는 transcribe 시점에 지정
+            return ("asr", name, device, compute_type, None, replica)
+        if kind == "align":
+            # 정렬 모델은 언어별로 다름 (모델 이름/연산 타입은 whisperx가 언어로 결정)
+            return ("align", None, device, None, language, replica)
+        return ("diarize", name or DIARIZATION_MODEL_NAME, device, None, None, replica)
+
+    def _load(self, key):
+        kind, name, device, compute_type, language, replica = key
+        with self._lock:
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        with load_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    return entry
+
+            size = estimate_model_bytes(kind, name, compute_type)
+            self._make_room(size)
+
+            print(f"모델 로딩 중: {kind} (이름: {name}, 장치: {device}, 타입: {compute_type}, 언어: {language}, 복제본: {replica})")
+            started = time.perf_counter()
+            model = self.loaders[kind](name, device, compute_type, language)
+            load_seconds = time.perf_counter() - started
+            if self.on_load is not None:
+                self.on_load(kind, model)
+            print(f"모델 로딩 완료: {kind} ({load_seconds:.1f}초)")
+
+            entry = {
+                "model": model, "bytes": size, "in_use": 0, "last_used": time.monotonic(),
+                "load_seconds": load_seconds, "lock": threading.Lock(),
+            }
+            with self._lock:
+                self._entries[key] = entry
+            return entry
+
+    def _make_room(self, needed: int):
+        evicted = []
+        with self._lock:
+            used = sum(entry["bytes"] for entry in self._entries.values())
+            idle = sorted(
+                (entry["last_used"], key) for key, entry in self._entries.items() if entry["in_use"] == 0
+            )
+            for _, key in idle:
+                if used + needed <= self.budget_bytes:
+                    break
+                used -= self._entries[key]["bytes"]
+                evicted.append(key)
+                del self._entries[key]
+            if used + needed > self.budget_bytes:
+                print(f"경고: 모델 메모리 예산 초과 (사용 중 {used / _GB:.1f}GB + 추가 {needed / _GB:.1f}GB)")
+        if evicted:
+            print(f"모델 내림 (LRU): {evicted}")
+            free_device_memory()
+
+    @contextmanager
+    def use(self, kind: str, name: str = None, device: str = None, compute_type: str = None, language: str = None, replica: int = 0):
+        """
+        모델을 빌려 씁니다. (블록 안에서는 내려가지 않고, 다른 작업이 같은 인스턴스를 쓰지 못함)
+
+            with MODEL_POOL.use("asr", "large-v3", "cuda", "float16") as asr_model:
+                asr_model.transcribe(...)
+        """
+        key = self.make_key(kind, name, device, compute_type, language, replica)
+        while True:
+            entry = self._load(key)
+            with self._lock:
+                # 로드 직후 다른 스레드가 내렸을 수 있으므로 다시 확인
+                if self._entries.get(key) is entry:
+                    entry["in_use"] += 1
+                    break
+        try:
+            with entry["lock"]:
+                yield entry["model"]
+        finally:
+            with self._lock:
+                entry["in_use"] -= 1
+                entry["last_used"] = time.monotonic()
+
+    def preload(self, kind: str, name: str = None, device: str = None, compute_type: str = None, language: str = None, replica: int = 0):
+        """모델을 미리 로드해 둡니다. (서버 시작 시 기본 모델 준비용)"""
+        self._load(self.make_key(kind, name, device, compute_type, language, replica))
+
+    def stats(self) -> dict:
+        """로드된 모델 목록과 메모리 예산 사용량을 반환합니다."""
+        with self._lock:
+            models = [
+                {
+                    "kind": key[0], "name": key[1], "device": key[2], "compute_type": key[3], "language": key[4],
+                    "replica": key[5],
+                    "estimated_bytes": entry["bytes"], "in_use": entry["in_use"],
+                    "load_seconds": round(entry["load_seconds"], 2),
+                }
+                for key, entry in self._entries.items()
+            ]
+        return {
+            "budget_bytes": self.budget_bytes,
+            "used_bytes": sum(model["estimated_bytes"] for model in models),
+            "models": models,
+        }
@@ -0,0 +1,283 @@
+# /processor/pipeline.py
+
+import time
+import asyncio
+
+from processor.tasks import (
+    prepare_diarize_job, try_cached_result, handle_job_failure, cleanup_job, run_stage, run_batch_stage
+)
+from app_state import progress_hub, metrics
+from hardware import compute_type_for
+
+class StagedPipeline:
+    """
+    여러 단계(추출 → ASR → 정렬 → 화자분리 → 후처리)를 각각의 비동기 워커로 실행하는 파이프라인.
+
+    단계 사이에는 크기가 제한된 asyncio.Queue를 두어 작업을 넘겨줍니다.
+    덕분에 작업 N이 GPU에서 ASR을 하는 동안 작업 N+1은 ffmpeg로 오디오를 추출할 수 있고,
+    뒤 단계가 밀리면 앞 단계가 자연스럽게 대기(backpressure)합니다.
+
+    batch_stages에 있는 단계는 큐에 함께 대기 중인 작업을 최대 batch_max건까지 한꺼번에 꺼내,
+    묶음 나누기 함수가 정한 묶음마다 묶음 단계 함수를 한 번 호출합니다. (혼자인 작업은 보통 단계 함수로 처리)
+    """
+
+    def __init__(self, stages: list, queue_size: int, batch_stages: dict = None, batch_max: int = 1):
+        # stages: [("extract", fn), ("asr", fn), ...] 형태, fn(job)은 동기 함수
+        # batch_stages: {"asr": (batch_fn, plan_fn)} 형태, batch_fn(jobs)은 동기 함수, plan_fn(jobs)은 [[job, ...], ...] 반환
+        self.stages = stages
+        self.batch_stages = batch_stages or {}
+        self.batch_max = max(1, batch_max)
+        # 묶음 단계 앞 큐는 한 번에 묶을 수 있을 만큼 작업이 쌓이도록 batch_max까지 늘림
+        self.queues = {
+            name: asyncio.Queue(maxsize=max(queue_size, self.batch_max) if name in self.batch_stages else queue_size)
+            for name, _ in stages
+        }
+        self.running = {name: 0 for name, _ in stages}
+        self.tasks = []
+
+    async def submit(self, job: dict):
+        """첫 번째 단계 큐에 작업을 넣습니다. (큐가 가득 차면 여기서 대기)"""
+        first_stage = self.stages[0][0]
+        job["queued_at"] = time.monotonic()
+        await self.queues[first_stage].put(job)
+
+    async def _stage_worker(self, index: int):
+        name, stage_fn = self.stages[index]
+        in_queue = self.queues[name]
+        next_queue = self.queues[self.stages[index + 1][0]] if index + 1 < len(self.stages) else None
+        batch_stage = self.batch_stages.get(name)
+
+        print(f"--- 파이프라인 단계 워커 시작: {name} ---")
+        while True:
+            jobs = [await in_queue.get()]
+            # 묶음 단계면 함께 대기 중인 작업도 꺼냄 (기다리지는 않음)
+            while batch_stage is not None and len(jobs) < self.batch_max and not in_queue.empty():
+                jobs.append(in_queue.get_nowait())
+            self.running[name] += len(jobs)
+            for job in jobs:
+                wait = time.monotonic() - job.pop("queued_at")
+                job["waits"][name] = wait
+                metrics.observe_stage_wait(name, wait)
+                progress_hub.publish(job["key"], "processing", stage=name)
+            try:
+                groups = self._plan(batch_stage, jobs)
+                for group in groups:
+                    if len(group) > 1:
+                        await self._run_batch(group, name, stage_fn, batch_stage[0], next_queue)
+                    else:
+                        await self._run_single(group[0], name, stage_fn, next_queue)
+            except Exception as e:
+                # 한 작업의 에러로 단계 워커가 멈추지 않도록 기록만 하고 계속 진행
+                print(f"{name} 단계 워커에서 에러 발생: {type(e).__name__} - {e}")
+            finally:
+                self.running[name] -= len(jobs)
+                for _ in jobs:
+                    in_queue.task_done()
+
+    @staticmethod
+    def _plan(batch_stage, jobs: list) -> list:
+        if len(jobs) == 1:
+            return [jobs]
+        try:
+            return batch_stage[1](jobs)
+        except Exception as e:
+            print(f"묶음 나누기 실패 - 작업별로 처리합니다: {type(e).__name__} - {e}")
+            return [[job] for job in jobs]
+
+    async def _run_single(self, job: dict, name: str, stage_fn, next_queue):
+        try:
+            # 단계 함수는 동기 함수이므로 별도 스레드에서 실행
+            await asyncio.to_thread(run_stage, job, name, stage_fn)
+        except Exception as e:
+            # 실패한 작업은 다음 단계로 넘기지 않고 여기서 종료
+            await asyncio.to_thread(self._fail_job, job, e)
+        else:
+            await self._forward(job, next_queue)
+
+    async def _run_batch(self, jobs: list, name: str, stage_fn, batch_fn, next_queue):
+        try:
+            await asyncio.to_thread(run_batch_stage, jobs, name, batch_fn)
+        except Exception as e:
+            # 묶음 처리가 실패하면 어느 작업 때문인지 알 수 없으므로 작업별로 다시 처리
+            print(f"{name} 단계 묶음 처리 실패 ({len(jobs)}건) - 작업별로 다시 처리합니다: {type(e).__name__} - {e}")
+            for job in jobs:
+                await self._run_single(job, name, stage_fn, next_queue)
+        else:
+            for job in jobs:
+                await self._forward(job, next_queue)
+
+    async def _forward(self, job: dict, next_queue):
+        # 캐시 적중 등으로 작업이 이미 끝났으면 다음 단계로 넘기지 않음
+        if next_queue is not None and not job.get("done"):
+            job["queued_at"] = time.monotonic()
+            await next_queue.put(job)
+        else:
+            await asyncio.to_thread(StagedPipeline._cleanup_job, job)
+
+    @staticmethod
+    def _cleanup_job(job: dict):
+        try:
+            cleanup_job(job)
+        except Exception as e:
+            # 정리 중 에러가 나더라도 같은 묶음의 다른 작업과 단계 워커는 계속 동작해야 함
+            print(f"작업 정리 중 에러 발생 (Key: {job.get('key')}): {type(e).__name__} - {e}")
+
+    @staticmethod
+    def _fail_job(job: dict, e: Exception):
+        try:
+            handle_job_failure(job, e)
+        except Exception as callback_error:
+            # 실패 처리 중 에러가 나더라도 단계 워커는 계속 동작해야 함
+            print(f"실패 처리 중 에러 발생 (Key: {job.get('key')}): {callback_error}")
+        finally:
+            StagedPipeline._cleanup_job(job)
+
+    def start(self):
+        """단계별 워커 태스크를 생성합니다."""
+        self.tasks = [
+            asyncio.create_task(self._stage_worker(i)) for i in range(len(self.stages))
+        ]
+
+    async def stop(self):
+        """모든 단계 워커를 취소합니다."""
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    def queue_depths(self) -> dict:
+        """단계별 대기 중/처리 중 작업 수를 반환합니다."""
+        return {
+            name: {"queued": self.queues[name].qsize(), "running": self.running[name]}
+            for name, _ in self.stages
+        }
+
+class WorkerPool:
+    """
+    여러 개의 StagedPipeline(워커)을 두고, 새 작업을 가장 한가한 워커에 배정하는 풀.
+
+    워커마다 장치(예: "cuda:0", "cuda:1", "cpu")가 정해져 있어 장치가 여럿이면 녹화본 여러 개를 동시에 처리합니다.
+    share_models=False 이면 같은 장치의 워커도 각자 모델 복제본(replica)을 가지므로 서로 기다리지 않고,
+    True 이면 모델을 공유하되 한 모델 인스턴스는 한 번에 한 작업만 사용합니다. (메모리 절약)
+    """
+
+    def __init__(
+        self, stages: list, queue_size: int, devices: list, share_models: bool,
+        batch_stages: dict = None, batch_max: int = 1
+    ):
+        self.workers = []
+        replicas_per_device = {}
+        for device in devices:
+            replica = 0 if share_models else replicas_per_device.get(device, 0)
+            replicas_per_device[device] = replicas_per_device.get(device, 0) + 1
+            self.workers.append({
+                "device": device,
+                "replica": replica,
+                "pipeline": StagedPipeline(stages, queue_size, batch_stages, batch_max),
+            })
+
+    @staticmethod
+    def _load(worker: dict) -> int:
+        depths = worker["pipeline"].queue_depths()
+        return sum(depth["queued"] + depth["running"] for depth in depths.values())
+
+    async def dispatch(self, params: dict):
+        """
+        화자분리 요청(params) 하나를 처리합니다.
+        이미 처리한 파일이면 캐시된 결과를 바로 전달하고, 아니면 작업을 만들어 워커에 배정합니다.
+        """
+        job = prepare_diarize_job(**params)
+        try:
+            cache_hit = await asyncio.to_thread(try_cached_result, job)
+        except Exception as e:
+            await asyncio.to_thread(StagedPipeline._fail_job, job, e)
+            return # 실패를 이미 통보했으므로 파이프라인에 넘기지 않음
+        if cache_hit:
+            await asyncio.to_thread(StagedPipeline._cleanup_job, job)
+        else:
+            await self.submit(job)
+
+    async def submit(self, job: dict):
+        """가장 한가한 워커의 장치/모델 복제본으로 작업을 배정합니다."""
+        worker = min(self.workers, key=self._load)
+        job["device"] = worker["device"]
+        # CPU 워커에 배정되면 float16 대신 int8 등 CPU에서 쓸 수 있는 연산 타입으로
+        job["compute_type"] = compute_type_for(worker["device"], job["compute_type"])
+        job["replica"] = worker["replica"]
+        await worker["pipeline"].submit(job)
+
+    def model_slots(self) -> list:
+        """워커들이 사용하는 (장치, 복제본 번호) 목록 (중복 제거, 모델 미리 로드용)"""
+        return list(dict.fromkeys((worker["device"], worker["replica"]) for worker in self.workers))
+
+    def start(self):
+        for worker in self.workers:
+            worker["pipeline"].start()
+
+    async def stop(self):
+        for worker in self.workers:
+            await worker["pipeline"].stop()
+
+    def queue_depths(self) -> dict:
+        """모든 워커를 합산한 단계별 대기 중/처리 중 작업 수"""
+        total = {}
+        for worker in self.workers:
+            for name, depth in worker["pipeline"].queue_depths().items():
+                stage = total.setdefault(name, {"queued": 0, "running": 0})
+                stage["queued"] += depth["queued"]
+                stage["running"] += depth["running"]
+        return total
+
+    def worker_status(self) -> list:
+        """워커별 장치, 복제본 번호, 단계별 대기/처리 중 작업 수"""
+        return [
+            {"device": worker["device"], "replica": worker["replica"], "stages": worker["pipeline"].queue_depths()}
+            for worker in self.workers
+        ]
+
+class Lane:
+    """
+    자기만의 대기열과 동시 실행 수 제한을 가진 작업 레인.
+
+    종류가 다른 작업(예: 짧은 오디오 변환과 긴 화자분리)을 서로 다른 레인에 넣으면
+    한쪽이 밀려 있어도 다른 쪽 작업은 기다리지 않습니다.
+    handler(item)은 비동기 함수이며, 레인마다 최대 concurrency개가 동시에 실행됩니다.
+    item이 딕셔너리이고 "queued_at"(time.monotonic() 값)이 있으면 레인 대기 시간을 메트릭에 기록합니다.
+    """
+
+    def __init__(self, name: str, queue: asyncio.Queue, handler, concurrency: int):
+        self.name = name
+        self.queue = queue
+        self.handler = handler
+        self.concurrency = max(1, concurrency)
+        self.running = 0
+        self.tasks = []
+
+    async def _consumer(self):
+        while True:
+            item = await self.queue.get()
+            self.running += 1
+            if isinstance(item, dict) and "queued_at" in item:
+                metrics.observe_lane_wait(self.name, time.monotonic() - item["queued_at"])
+            try:
+                await self.handler(item)
+            except Exception as e:
+                # 한 작업의 에러로 레인이 멈추지 않도록 기록만 하고 계속 진행
+                print(f"{self.name} 레인에서 에러 발생: {e}")
+            finally:
+                self.running -= 1
+                self.queue.task_done()
+
+    def start(self):
+        print(f"--- {self.name} 레인 시작 (동시 실행: {self.concurrency}) ---")
+        self.tasks = [asyncio.create_task(self._consumer()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    def depth(self) -> dict:
+        """대기 중/실행 중 작업 수와 동시 실행 한도를 반환합니다."""
+        return {"queued": self.queue.qsize(), "running": self.running, "concurrency": self.concurrency}
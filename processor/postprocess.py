@@ -0,0 +1,227 @@
+# /processor/postprocess.py
+
+import io
+import numpy as np
+
+# 프로젝트 루트의 config.py에서 설정값 가져오기
+from config import MERGE_THRESHOLD_SECONDS, SHORT_SEGMENT_WORD_COUNT
+
+# --- <<<--- 1. VTT 생성 함수 추가 ---
+def format_vtt_time(seconds: float) -> str:
+    """초(float)를 VTT 타임스탬프 형식 (HH:MM:SS.mmm)으로 변환"""
+    # ... (이전과 동일한 시간 변환 로직, 밀리초 추가) ...
+    hours, remainder = divmod(int(seconds), 3600)
+    minutes, remainder = divmod(remainder, 60)
+    secs = int(remainder)
+    millis = int((seconds - int(seconds)) * 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}.{millis:03d}"
+
+def format_vtt_times(values: list) -> list:
+    """
+    format_vtt_time을 여러 값에 한꺼번에 적용합니다. (NumPy로 시/분/초/밀리초를 한 번에 계산)
+    float64 계산 순서가 format_vtt_time과 같으므로 결과 문자열도 같습니다.
+    파이썬 float/int가 아닌 값(np.float32 등)이 섞여 있으면 계산 정밀도가 달라지므로 하나씩 변환합니다.
+    """
+    if not all(type(value) is float or type(value) is int for value in values):
+        return [format_vtt_time(value) for value in values]
+    seconds = np.asarray(values, dtype=np.float64)
+    whole = np.trunc(seconds)
+    millis = np.trunc((seconds - whole) * 1000).astype(np.int64).tolist()
+    hours, remainder = np.divmod(whole.astype(np.int64), 3600)
+    minutes, secs = np.divmod(remainder, 60)
+    return [
+        f"{h:02d}:{m:02d}:{s:02d}.{ms:03d}"
+        for h, m, s, ms in zip(hours.tolist(), minutes.tolist(), secs.tolist(), millis)
+    ]
+
+def generate_vtt_content(result: dict) -> str:
+    """whisperx 결과물을 받아 WebVTT 형식의 문자열을 생성"""
+    if 'segments' not in result or not result['segments']:
+        return "WEBVTT\n\n"
+
+    lines = ["WEBVTT", ""] # VTT 파일 헤더
+
+    for segment in result['segments']:
+        start_time = format_vtt_time(segment['start'])
+        end_time = format_vtt_time(segment['end'])
+        
+        # 화자 정보를 자막에 포함시킬 수 있음 (선택적)
+        speaker = segment.get('speaker', 'UNKNOWN')
+        text = segment.get('text', '').strip()
+
+        # 자막 큐 추가
+        lines.append(f"{start_time} --> {end_time}")
+        lines.append(f"<{speaker}> {text}") # 예: <SPEAKER_01> 안녕하세요.
+        lines.append("") # 각 큐 사이에 빈 줄 추가
+
+    return "\n".join(lines)
+# --- 여기까지 ---
+
+def generate_formatted_transcript(result: dict) -> str:
+    # 1. 초기 세그먼트 정리 및 형식 변환
+    processed_segments = []
+    if "segments" in result and result["segments"]:
+        for seg in result["segments"]:
+            if 'speaker' not in seg:
+                seg['speaker'] = 'UNKNOWN'
+            
+            start_time = int(seg['start'])
+            
+            def format_time(seconds):
+                hours, remainder = divmod(seconds, 3600)
+                minutes, seconds = divmod(remainder, 60)
+                return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+
+            processed_segments.append({
+                'start': seg['start'],
+                'end': seg['end'],
+                'timestamp': format_time(start_time),
+                'speaker': seg['speaker'],
+                'text': seg['text'].strip()
+            })
+
+    # 2. 짧은 발언 병합 로직
+    merged_segments = []
+    if processed_segments:       
+        merged_segments.append(processed_segments[0])
+
+        for i in range(1, len(processed_segments)):
+            current_seg = processed_segments[i]
+            prev_seg = merged_segments[-1] # 병합된 리스트의 마지막 세그먼트
+
+            # 현재 세그먼트의 단어 수 계산
+            current_word_count = len(current_seg['text'].split())
+            
+            # 병합 조건 확인:
+            # 1. 이전 발언이 끝난 후 MERGE_THRESHOLD_SECONDS 안에 현재 발언이 시작되었는가?
+            # 2. 현재 발언의 단어 수가 SHORT_SEGMENT_WORD_COUNT 이하인가?
+            # 3. (선택적) 또는 화자가 UNKNOWN 인가?
+            time_gap = current_seg['start'] - prev_seg['end']
+            
+            if (time_gap < MERGE_THRESHOLD_SECONDS and current_word_count <= SHORT_SEGMENT_WORD_COUNT) or current_seg['speaker'] == 'UNKNOWN':
+                # -- 병합 수행 --
+                # 텍스트를 이전 세그먼트에 합치기
+                prev_seg['text'] += " " + current_seg['text']
+                # 종료 시간을 현재 세그먼트의 종료 시간으로 업데이트
+                prev_seg['end'] = current_seg['end']
+            else:
+                # 병합하지 않고 새 세그먼트로 추가
+                merged_segments.append(current_seg)
+
+    # 텍스트를 담을 리스트
+    output_lines = []
+
+    if merged_segments:
+        current_speaker = merged_segments[0]['speaker']
+        output_lines.append(f"[{merged_segments[0]['timestamp']}] [{current_speaker}]:")
+
+        for i in range(len(merged_segments)):
+            segment = merged_segments[i]
+            speaker = segment['speaker']
+            text = segment['text']
+            timestamp = segment['timestamp']
+           
+            if speaker == current_speaker:
+                output_lines[-1] += f" {text}"
+            else:
+                output_lines.append(f"\n[{timestamp}] [{speaker}]: {text}")
+                current_speaker = speaker
+    else:
+        output_lines.append("처리할 발언이 없습니다.")
+
+    return "".join(output_lines)
+
+
+def generate_transcript_outputs(result: dict):
+    """
+    회의록(TXT)과 VTT를 세그먼트 한 번 순회로 함께 만듭니다. → (txt, vtt)
+    generate_formatted_transcript / generate_vtt_content를 각각 호출한 것과 바이트 단위로 같습니다.
+    """
+    txt_out, vtt_out = io.StringIO(), io.StringIO()
+    writer = TranscriptStreamWriter(txt_out, vtt_out)
+    writer.add_many(result.get('segments') or [])
+    writer.close()
+    return txt_out.getvalue(), vtt_out.getvalue()
+
+class TranscriptStreamWriter:
+    """
+    세그먼트를 하나씩 받아 회의록(TXT)과 VTT를 바로 출력 스트림에 쓰는 작성기.
+    generate_formatted_transcript / generate_vtt_content와 바이트 단위로 같은 결과를 만들되,
+    전체 세그먼트 목록을 메모리에 들고 있지 않아도 됩니다. (일반 작업은 generate_transcript_outputs, 긴 녹화본은 구간별로 사용)
+
+    병합 규칙상 마지막 발언은 다음 세그먼트에 합쳐질 수 있으므로, 직전 발언 하나만 보류해 두었다가 씁니다.
+    병합 여부는 "직전 세그먼트의 종료 시각"만으로 정해지므로(병합된 발언의 종료 시각 = 마지막으로 합친 세그먼트의 종료 시각)
+    보류 중인 발언은 텍스트 조각 목록으로만 들고 있다가 쓸 때 한 번에 이어 붙입니다.
+    """
+
+    def __init__(self, txt_out, vtt_out):
+        # txt_out, vtt_out: write(str)를 지원하는 객체 (파일, io.StringIO 등)
+        self._txt_write = txt_out.write
+        self._vtt_write = vtt_out.write
+        self.pending_parts = None    # 아직 병합이 끝나지 않은 직전 발언의 텍스트 조각들
+        self.pending_start = 0.0
+        self.pending_speaker = None
+        self.prev_end = 0.0          # 직전 세그먼트의 종료 시각
+        self.current_speaker = None  # 마지막으로 출력한 화자
+        self.txt_started = False
+        self.vtt_cues = 0
+        self._vtt_write("WEBVTT\n")
+
+    def add(self, seg: dict):
+        """whisperx 세그먼트 하나를 추가합니다."""
+        self._add(seg, format_vtt_time(seg['start']), format_vtt_time(seg['end']))
+
+    def add_many(self, segments: list):
+        """세그먼트 여러 개를 순서대로 추가합니다. (VTT 타임스탬프는 한꺼번에 계산)"""
+        count = len(segments)
+        times = format_vtt_times([seg['start'] for seg in segments] + [seg['end'] for seg in segments])
+        for seg, start_time, end_time in zip(segments, times[:count], times[count:]):
+            self._add(seg, start_time, end_time)
+
+    def _add(self, seg: dict, start_time: str, end_time: str):
+        start = seg['start']
+        end = seg['end']
+        speaker = seg.get('speaker', 'UNKNOWN')
+        text = seg['text'].strip()
+
+        # VTT: 세그먼트마다 큐 하나
+        self._vtt_write(f"\n{start_time} --> {end_time}\n<{speaker}> {text}\n")
+        self.vtt_cues += 1
+
+        # TXT: 짧은 발언 병합 (단어 수는 시간 조건을 만족할 때만 셈)
+        if self.pending_parts is not None and (
+            speaker == 'UNKNOWN'
+            or (start - self.prev_end < MERGE_THRESHOLD_SECONDS and len(text.split()) <= SHORT_SEGMENT_WORD_COUNT)
+        ):
+            self.pending_parts.append(text)
+        else:
+            if self.pending_parts is not None:
+                self._write_txt()
+            self.pending_parts = [text]
+            self.pending_start = start
+            self.pending_speaker = speaker
+        self.prev_end = end
+
+    def _write_txt(self):
+        speaker = self.pending_speaker
+        text = " ".join(self.pending_parts)
+        if self.txt_started and speaker == self.current_speaker:
+            self._txt_write(f" {text}")
+            return
+        hours, remainder = divmod(int(self.pending_start), 3600)
+        minutes, seconds = divmod(remainder, 60)
+        prefix = "\n" if self.txt_started else ""
+        self._txt_write(f"{prefix}[{hours:02d}:{minutes:02d}:{seconds:02d}] [{speaker}]: {text}")
+        self.txt_started = True
+        self.current_speaker = speaker
+
+    def close(self):
+        """보류 중인 마지막 발언을 쓰고 마무리합니다. (스트림 자체는 닫지 않음)"""
+        if self.pending_parts is not None:
+            self._write_txt()
+            self.pending_parts = None
+        if not self.txt_started:
+            self._txt_write("처리할 발언이 없습니다.")
+            self.txt_started = True
+        if self.vtt_cues == 0:
+            self._vtt_write("\n")
@@ -1,282 +1,824 @@
 # /processor/tasks.py
 
-import whisperx
 import gc
+import io
+import os
+import time
+import shutil
+import tempfile
+import asyncio
 import ffmpeg
-import requests
+import numpy as np
 from pathlib import Path
-from whisperx.diarize import DiarizationPipeline
 import traceback
+from bisect import bisect_right
 
 # 프로젝트 루트의 config.py에서 설정값 가져오기
-from config import SPEAKER_CALLBACK_URL, MERGE_THRESHOLD_SECONDS, SHORT_SEGMENT_WORD_COUNT, HF_TOKEN, AUDIO_CALLBACK_URL
-from app_state import job_results
+from config import (
+    SPEAKER_CALLBACK_URL, AUDIO_CALLBACK_URL, BATCH_CALLBACK_URL,
+    DEFAULT_MODEL_SIZE, DEFAULT_DEVICE, DEFAULT_COMPUTE_TYPE, DEFAULT_LANGUAGE, MODEL_MEMORY_BUDGET_BYTES,
+    MODEL_WARMUP_SECONDS, MODEL_WARMUP_AUDIO, CPU_THREADS,
+    ASR_BATCH_SIZE_AUTO, ASR_BATCH_SIZE_MAX_GPU, ASR_BATCH_SIZE_MAX_CPU, ASR_BATCH_SIZE_GPU, ASR_BATCH_SIZE_CPU,
+    ASR_BATCH_ITEM_MEMORY_RATIO, ASR_BATCH_MEMORY_FRACTION,
+    PIPELINE_WORKER_DEVICES, ASR_BATCH_MAX_JOBS, ASR_BATCH_MAX_SECONDS, ASR_BATCH_GAP_SECONDS,
+    AUDIO_MMAP_MIN_SECONDS, AUDIO_MMAP_DIR, RESULT_CACHE_ENABLED, RESULT_CACHE_DIR, RESULT_CACHE_MAX_BYTES,
+    ARTIFACT_CACHE_ENABLED, ARTIFACT_CACHE_DIR, ARTIFACT_CACHE_MAX_BYTES,
+    WINDOWED_MIN_SECONDS, WINDOW_SECONDS, WINDOW_OVERLAP_SECONDS,
+    VAD_ENABLED, VAD_FRAME_SECONDS, VAD_THRESHOLD_DB, VAD_DYNAMIC_RANGE_DB, VAD_MIN_SILENCE_SECONDS, VAD_PADDING_SECONDS
+)
+from app_state import job_results, progress_hub, callback_dispatcher, metrics, batch_tracker, job_queue, inflight_jobs, admission, job_journal
+from processor.audio import decode_audio, release_audio, probe_duration, SAMPLE_RATE
+from processor.cache import ResultCache, ArtifactStore, hash_audio, make_cache_key, make_artifact_key
+from processor.diarize import enable_feature_reuse, run_diarization
+from processor.postprocess import generate_transcript_outputs, TranscriptStreamWriter
+from processor.windowed import process_windowed
+from processor.vad import apply_vad, add_to_report
+from processor.models import ModelPool, DIARIZATION_MODEL_NAME, configure_cpu_threads
+from processor.asr_batch import AsrBatchSizer
+from hardware import threads_per_worker
 
-# --- <<<--- 1. 모델을 담을 전역 변수 선언 ---
-MODELS = {
-    "asr": None,
-    "align": None,
-    "diarize": None
-}
+# 같은 녹화본이 재전송되었을 때 전체 파이프라인을 다시 돌리지 않기 위한 결과 캐시
+RESULT_CACHE = ResultCache(RESULT_CACHE_DIR, RESULT_CACHE_MAX_BYTES) if RESULT_CACHE_ENABLED else None
+# 화자분리 파라미터만 바꿔 다시 돌릴 때 재사용할 중간 산출물(ASR+정렬 결과, pyannote 세그멘테이션/임베딩)
+ARTIFACT_STORE = ArtifactStore(ARTIFACT_CACHE_DIR, ARTIFACT_CACHE_MAX_BYTES) if ARTIFACT_CACHE_ENABLED else None
 
-def load_all_models(model_name="large-v3", device="cuda", compute_type="float16"):
+# ASR/화자분리 전에 긴 무음을 잘라내는 설정 (None이면 사용 안 함)
+VAD_SETTINGS = {
+    "frame_seconds": VAD_FRAME_SECONDS,
+    "threshold_db": VAD_THRESHOLD_DB,
+    "dynamic_range_db": VAD_DYNAMIC_RANGE_DB,
+    "min_silence_seconds": VAD_MIN_SILENCE_SECONDS,
+    "padding_seconds": VAD_PADDING_SECONDS,
+} if VAD_ENABLED else None
+
+def _processing_options() -> dict:
+    # 무음 건너뛰기는 결과(타임스탬프/인식 내용)를 바꿀 수 있으므로 캐시 키에 포함 (끄면 이전 버전과 같은 키)
+    return {"vad": VAD_SETTINGS} if VAD_SETTINGS else {}
+
+def _cache_key(job: dict, audio_hash: str) -> str:
+    return make_cache_key(audio_hash, job["model_name"], job["diarization_params"], **_processing_options())
+
+def _on_model_load(kind: str, model):
+    if kind == "diarize" and ARTIFACT_STORE is not None:
+        # 세그멘테이션/임베딩을 보관해 두었다가 파라미터만 바뀐 재실행에서 재사용
+        enable_feature_reuse(model)
+
+# --- <<<--- 1. 모델 풀: (종류, 모델 이름, 장치, 연산 타입, 언어)별로 필요할 때 로드하여 작업 간 공유 ---
+MODEL_POOL = ModelPool(MODEL_MEMORY_BUDGET_BYTES, on_load=_on_model_load)
+# CPU 워커끼리 코어를 나눠 쓰도록 모델별 스레드 수 지정
+configure_cpu_threads(CPU_THREADS or threads_per_worker(PIPELINE_WORKER_DEVICES))
+
+# 장치 여유 메모리/오디오 길이로 ASR 배치 크기를 정하고, 메모리 부족이면 줄여서 다시 실행
+ASR_BATCH_SIZER = AsrBatchSizer(
+    max_gpu=ASR_BATCH_SIZE_MAX_GPU,
+    max_cpu=ASR_BATCH_SIZE_MAX_CPU,
+    fixed_gpu=ASR_BATCH_SIZE_GPU,
+    fixed_cpu=ASR_BATCH_SIZE_CPU,
+    item_memory_ratio=ASR_BATCH_ITEM_MEMORY_RATIO,
+    memory_fraction=ASR_BATCH_MEMORY_FRACTION,
+    auto=ASR_BATCH_SIZE_AUTO
+)
+
+def transcribe(asr_model, audio, jobs: list) -> dict:
     """
-    서버 시작 시 모든 AI 모델을 한 번만 로드하여 전역 변수에 저장합니다.
+    jobs[0]의 모델/장치/언어로 음성 인식을 실행하고, 사용한 배치 크기와 메모리 부족 재시도 횟수를 작업별로 기록합니다.
+    (묶음 ASR이면 jobs에 묶인 작업 전부, 구간 처리면 구간 중 가장 작은 배치 크기가 남음)
     """
-    print("--- 공유 AI 모델 로딩 시작 ---")
- 
-    # 1. ASR 모델 로드
-    print(f"ASR 모델({model_name}) 로딩 중...")
-    MODELS["asr"] = whisperx.load_model(model_name, device, compute_type=compute_type)
-    
-    # 2. Align 모델 로드 (언어는 'ko'로 고정)
-    print("Align 모델 로딩 중...")
-    model_a, metadata = whisperx.load_align_model(language_code="ko", device=device)
-    MODELS["align"] = {"model": model_a, "metadata": metadata}
-    
-    # 3. Diarization 모델 로드
-    print("Diarization 모델 로딩 중...")
-    # hf_token은 huggingface-cli login을 통해 자동으로 사용됩니다.
-    MODELS["diarize"] = DiarizationPipeline("pyannote/speaker-diarization-3.1", use_auth_token=HF_TOKEN, device=device)
-    
+    job = jobs[0]
+    result, used = ASR_BATCH_SIZER.transcribe(
+        asr_model, audio, job["language"], job["device"], job["model_name"], job["compute_type"]
+    )
+    metrics.observe_asr_batch(job["device"], used["batch_size"], used["oom_retries"])
+    for each in jobs:
+        previous = each["asr_batch_size"]
+        each["asr_batch_size"] = used["batch_size"] if previous is None else min(previous, used["batch_size"])
+        each["asr_oom_retries"] += used["oom_retries"]
+    return result
+
+def load_all_models(
+    model_name=DEFAULT_MODEL_SIZE,
+    device=DEFAULT_DEVICE,
+    compute_type=DEFAULT_COMPUTE_TYPE,
+    language=DEFAULT_LANGUAGE,
+    replica=0
+):
+    """
+    서버 시작 시 기본 AI 모델들을 미리 로드해 둡니다.
+    다른 모델/언어는 작업에서 처음 요청할 때 로드됩니다.
+    """
+    print(f"--- 공유 AI 모델 로딩 시작 (장치: {device}, 복제본: {replica}) ---")
+    MODEL_POOL.preload("asr", model_name, device, compute_type, replica=replica)
+    MODEL_POOL.preload("align", device=device, language=language, replica=replica)
+    MODEL_POOL.preload("diarize", DIARIZATION_MODEL_NAME, device, replica=replica)
     print("--- 모든 AI 모델 로딩 완료 ---")
 
-# --- <<<--- 1. VTT 생성 함수 추가 ---
-def format_vtt_time(seconds: float) -> str:
-    """초(float)를 VTT 타임스탬프 형식 (HH:MM:SS.mmm)으로 변환"""
-    # ... (이전과 동일한 시간 변환 로직, 밀리초 추가) ...
-    hours, remainder = divmod(int(seconds), 3600)
-    minutes, remainder = divmod(remainder, 60)
-    secs = int(remainder)
-    millis = int((seconds - int(seconds)) * 1000)
-    return f"{hours:02d}:{minutes:02d}:{secs:02d}.{millis:03d}"
-
-def generate_vtt_content(result: dict) -> str:
-    """whisperx 결과물을 받아 WebVTT 형식의 문자열을 생성"""
-    if 'segments' not in result or not result['segments']:
-        return "WEBVTT\n\n"
-
-    lines = ["WEBVTT", ""] # VTT 파일 헤더
-
-    for segment in result['segments']:
-        start_time = format_vtt_time(segment['start'])
-        end_time = format_vtt_time(segment['end'])
-        
-        # 화자 정보를 자막에 포함시킬 수 있음 (선택적)
-        speaker = segment.get('speaker', 'UNKNOWN')
-        text = segment.get('text', '').strip()
-
-        # 자막 큐 추가
-        lines.append(f"{start_time} --> {end_time}")
-        lines.append(f"<{speaker}> {text}") # 예: <SPEAKER_01> 안녕하세요.
-        lines.append("") # 각 큐 사이에 빈 줄 추가
-
-    return "\n".join(lines)
-# --- 여기까지 ---
+def _warmup_audio():
+    if MODEL_WARMUP_AUDIO:
+        return decode_audio(MODEL_WARMUP_AUDIO, duration=MODEL_WARMUP_SECONDS)
+    rng = np.random.default_rng(0)
+    return (rng.standard_normal(int(MODEL_WARMUP_SECONDS * SAMPLE_RATE)) * 0.05).astype(np.float32)
+
+def warm_up_models(
+    model_name=DEFAULT_MODEL_SIZE,
+    device=DEFAULT_DEVICE,
+    compute_type=DEFAULT_COMPUTE_TYPE,
+    language=DEFAULT_LANGUAGE,
+    replica=0
+):
+    """
+    미리 로드한 기본 모델을 짧은 오디오로 한 번씩 실행합니다. (ASR → 정렬 → 화자분리)
+    첫 실행에만 드는 비용(CUDA 커널/cuDNN 초기화, 메모리 할당 등)을 서버 준비 단계에서 치러 둡니다.
+    예열 실패는 작업 처리에 지장이 없으므로 기록만 합니다.
+    """
+    import whisperx
+
+    print(f"--- 모델 예열 시작 (장치: {device}, 복제본: {replica}) ---")
+    started_at = time.monotonic()
+    try:
+        audio = _warmup_audio()
+        with MODEL_POOL.use("asr", model_name, device, compute_type, replica=replica) as asr_model:
+            result = asr_model.transcribe(audio, language=language, batch_size=1)
+        if result["segments"]:
+            with MODEL_POOL.use("align", device=device, language=language, replica=replica) as align_model_data:
+                whisperx.align(
+                    result["segments"], align_model_data["model"], align_model_data["metadata"],
+                    audio, device, return_char_alignments=False
+                )
+        with MODEL_POOL.use("diarize", DIARIZATION_MODEL_NAME, device, replica=replica) as diarize_model:
+            run_diarization(diarize_model, audio, {})
+    except Exception as e:
+        print(f"모델 예열 실패 (작업은 계속 받습니다): {type(e).__name__} - {e}")
+        return
+    print(f"--- 모델 예열 완료 ({time.monotonic() - started_at:.1f}초) ---")
 
 # --- <<<--- 1. 새로운 오디오 변환 작업 함수 추가 ---
 def convert_video_to_audio(
     video_path: str,
     key: str,
-    output_type: str # 'mp3' or 'wav'
+    output_type: str, # 'mp3' or 'wav'
+    inflight_key: str = None,
+    journal_id: int = None
 ):
     """
     영상 파일을 지정된 오디오 포맷으로 변환하는 태스크.
+    inflight_key : 진행 중 작업 색인의 식별자 (끝나면 합류한 중복 요청에도 같은 결과를 통보)
+    journal_id : 작업 저널 번호 (시작/종료를 기록하여 재시작 후 끝나지 않은 변환만 다시 실행)
     """
     print(f"--- 오디오 변환 작업 시작 (Key: {key}) ---")
     print(f"영상 파일: {video_path}, 변환 타입: {output_type}")
     
     # 출력 파일 경로 생성 (예: D:\test.mp3)
     output_audio_path = Path(video_path).with_suffix(f'.{output_type}')
+    started_at = time.monotonic()
+    job_journal.start(journal_id)
 
     try:
-        if output_type == 'mp3':
-            # Clova Speech용 MP3 설정
-            ffmpeg.input(video_path).output(
-                str(output_audio_path),
-                acodec='libmp3lame', # MP3 인코더
-                audio_bitrate='192k',
-                ac=1, # Mono 채널
-                ar='16000' # 16kHz 샘플링 레이트
-            ).run(overwrite_output=True, quiet=True)
-        elif output_type == 'wav':
-            # Google Speech-to-Text용 WAV 설정
-            ffmpeg.input(video_path).output(
-                str(output_audio_path),
-                acodec='pcm_s16le', # 16-bit PCM 인코딩
-                ac=1, # Mono 채널
-                ar='16000' # 16kHz 샘플링 레이트
-            ).run(overwrite_output=True, quiet=True)
-        else:
-            raise ValueError(f"지원하지 않는 오디오 타입입니다: {output_type}")
-            
-        print(f"오디오 파일 변환 완료: {output_audio_path}")
-        
-        # 완료 콜백 전송
+        _convert_stream(video_path, output_audio_path, output_type).run(overwrite_output=True, quiet=True)
+        _convert_succeeded(key, output_audio_path, output_type, started_at, inflight_key, journal_id)
+    except Exception as e:
+        _convert_failed(key, output_audio_path, output_type, e, started_at, inflight_key, journal_id)
+    finally:
+        print(f"--- 오디오 변환 작업 종료 (Key: {key}) ---")
+
+async def convert_video_to_audio_async(
+    video_path: str,
+    key: str,
+    output_type: str, # 'mp3' or 'wav'
+    inflight_key: str = None,
+    journal_id: int = None
+):
+    """
+    convert_video_to_audio의 비동기 버전 (변환 레인용).
+    ffmpeg를 asyncio 하위 프로세스로 실행하므로 스레드를 점유하지 않고 여러 변환을 동시에 돌릴 수 있습니다.
+    """
+    print(f"--- 오디오 변환 작업 시작 (Key: {key}) ---")
+    print(f"영상 파일: {video_path}, 변환 타입: {output_type}")
+
+    output_audio_path = Path(video_path).with_suffix(f'.{output_type}')
+    started_at = time.monotonic()
+    await asyncio.to_thread(job_journal.start, journal_id)
+
+    try:
+        args = _convert_stream(video_path, output_audio_path, output_type).compile(overwrite_output=True)
+        process = await asyncio.create_subprocess_exec(
+            *args,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE
+        )
+        _, stderr = await process.communicate()
+        if process.returncode != 0:
+            raise ffmpeg.Error("ffmpeg", None, stderr)
+        # 콜백은 블로킹 HTTP 요청이므로 별도 스레드에서 전송
+        await asyncio.to_thread(_convert_succeeded, key, output_audio_path, output_type, started_at, inflight_key, journal_id)
+    except Exception as e:
+        await asyncio.to_thread(_convert_failed, key, output_audio_path, output_type, e, started_at, inflight_key, journal_id)
+    finally:
+        print(f"--- 오디오 변환 작업 종료 (Key: {key}) ---")
+
+def _convert_output_options(output_type: str) -> dict:
+    """변환 타입별 ffmpeg 출력 옵션"""
+    if output_type == 'mp3':
+        # Clova Speech용 MP3 설정
+        return {
+            "acodec": 'libmp3lame', # MP3 인코더
+            "audio_bitrate": '192k',
+            "ac": 1, # Mono 채널
+            "ar": '16000' # 16kHz 샘플링 레이트
+        }
+    if output_type == 'wav':
+        # Google Speech-to-Text용 WAV 설정
+        return {
+            "acodec": 'pcm_s16le', # 16-bit PCM 인코딩
+            "ac": 1, # Mono 채널
+            "ar": '16000' # 16kHz 샘플링 레이트
+        }
+    raise ValueError(f"지원하지 않는 오디오 타입입니다: {output_type}")
+
+def _convert_stream(video_path: str, output_audio_path: Path, output_type: str):
+    """변환 타입에 맞는 ffmpeg 출력 스트림을 만듭니다."""
+    return ffmpeg.input(video_path).output(str(output_audio_path), **_convert_output_options(output_type))
+
+async def convert_fanout_async(video_path: str, converts: list, diarize_tasks: list):
+    """
+    같은 영상에 대한 오디오 변환(mp3/wav)과 화자분리 오디오 추출을 ffmpeg 한 번으로 처리합니다. (변환 레인용)
+    영상은 한 번만 디먹스/디코딩되고, 출력 형식마다 리샘플링/인코딩만 따로 합니다.
+    converts : [{"key", "output_type", "inflight_key", "journal_id"}, ...] - 요청(key)마다 콜백을 보냄 (같은 형식을 여러 번 요청하면 파일은 하나)
+    diarize_tasks : 화자분리 레인 항목 목록 - 뽑아 둔 오디오(audio_path)를 붙여 화자분리 레인에 넣음
+    """
+    if not diarize_tasks and len(converts) == 1:
+        await convert_video_to_audio_async(video_path, **converts[0])
+        return
+
+    output_types = list(dict.fromkeys(convert["output_type"] for convert in converts))
+    output_paths = {output_type: Path(video_path).with_suffix(f'.{output_type}') for output_type in output_types}
+    print(f"--- 공유 디코딩 시작: {video_path} (변환: {', '.join(output_types) or '없음'}, 화자분리: {len(diarize_tasks)}건) ---")
+    started_at = time.monotonic()
+    for convert in converts:
+        await asyncio.to_thread(job_journal.start, convert.get("journal_id"))
+
+    source = ffmpeg.input(video_path).audio
+    outputs = [
+        source.output(str(output_paths[output_type]), **_convert_output_options(output_type))
+        for output_type in output_types
+    ]
+    audio_path = None
+    if diarize_tasks:
+        # 업로드 중 미리 뽑아 두는 오디오(UPLOAD_EARLY_DEMUX)와 같은 형식 - 추출 단계는 영상 대신 이 파일을 디코딩
+        fd, audio_path = tempfile.mkstemp(prefix="fanout_", suffix=".wav", dir=AUDIO_MMAP_DIR)
+        os.close(fd)
+        outputs.append(source.output(audio_path, acodec="pcm_f32le", ac=1, ar=SAMPLE_RATE))
+
+    try:
+        args = ffmpeg.merge_outputs(*outputs).global_args("-nostdin").compile(overwrite_output=True)
+        process = await asyncio.create_subprocess_exec(
+            *args,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE
+        )
+        _, stderr = await process.communicate()
+        if process.returncode != 0:
+            raise ffmpeg.Error("ffmpeg", None, stderr)
+    except Exception as e:
+        for convert in converts:
+            await asyncio.to_thread(
+                _convert_failed, convert["key"], output_paths[convert["output_type"]], convert["output_type"], e, started_at,
+                convert.get("inflight_key"), convert.get("journal_id")
+            )
+        if audio_path is not None:
+            Path(audio_path).unlink(missing_ok=True)
+            audio_path = None # 화자분리 작업은 평소처럼 영상을 직접 디코딩
+    else:
+        for convert in converts:
+            await asyncio.to_thread(
+                _convert_succeeded, convert["key"], output_paths[convert["output_type"]], convert["output_type"], started_at,
+                convert.get("inflight_key"), convert.get("journal_id")
+            )
+    finally:
+        print(f"--- 공유 디코딩 종료: {video_path} ({time.monotonic() - started_at:.1f}초) ---")
+
+    if audio_path is not None:
+        # 작업이 끝나면 audio_path를 지우므로 작업마다 자기 파일(하드 링크)을 가짐 (먼저 넣은 작업이 지우기 전에 모두 만듦)
+        for index, task_details in enumerate(diarize_tasks):
+            task_details["params"]["audio_path"] = audio_path if index == 0 else _link_copy(audio_path, index)
+    for task_details in diarize_tasks:
+        task_details["queued_at"] = time.monotonic()
+        job_queue.put_nowait(task_details)
+
+def _link_copy(path: str, index: int) -> str:
+    copy_path = str(Path(path).with_name(f"{Path(path).stem}_{index}.wav"))
+    try:
+        os.link(path, copy_path)
+    except OSError: # 하드 링크를 지원하지 않는 파일 시스템
+        shutil.copyfile(path, copy_path)
+    return copy_path
+
+def _record_convert(key: str, output_type: str, started_at: float, outcome: str, error: str = None):
+    metrics.record_job({
+        "kind": "convert",
+        "key": key,
+        "outcome": outcome,
+        "output_type": output_type,
+        "total_seconds": round(time.monotonic() - started_at, 3),
+        "error": error,
+    })
+
+def _convert_succeeded(
+    key: str, output_audio_path: Path, output_type: str, started_at: float, inflight_key: str = None, journal_id: int = None
+):
+    print(f"오디오 파일 변환 완료: {output_audio_path}")
+    _record_convert(key, output_type, started_at, "completed")
+
+    # 완료 콜백 전송 (같은 변환을 다시 요청한 다른 키에도)
+    for callback_key in [key, *inflight_jobs.release(inflight_key)]:
         send_completion_callback(
             url=AUDIO_CALLBACK_URL,
             success=True,
-            key=key,
+            key=callback_key,
             path=str(output_audio_path),
             extra_params={'type': output_type}
         )
-            
-    except Exception as e:
-        error_message = f"오디오 변환 작업 실패 (Key: {key}): {e}"
-        print(error_message)
+    # 콜백을 outbox에 넣은 뒤에 완료로 기록 (그 사이에 서버가 죽으면 변환을 다시 실행하고 다시 통보)
+    job_journal.finish(journal_id, "completed", str(output_audio_path))
+
+def _convert_failed(
+    key: str, output_audio_path: Path, output_type: str, e: Exception, started_at: float, inflight_key: str = None,
+    journal_id: int = None
+):
+    error_message = f"오디오 변환 작업 실패 (Key: {key}): {e}"
+    if isinstance(e, ffmpeg.Error) and e.stderr:
+        error_message += f"\n{e.stderr.decode('utf-8', errors='replace')}"
+    print(error_message)
+    _record_convert(key, output_type, started_at, "failed", f"{type(e).__name__}: {e}")
+    for callback_key in [key, *inflight_jobs.release(inflight_key)]:
         send_completion_callback(
             url=AUDIO_CALLBACK_URL,
             success=False,
-            key=key,
+            key=callback_key,
             path=str(output_audio_path),
             error=str(e),
             extra_params={'type': output_type}
         )
-    finally:
-        print(f"--- 오디오 변환 작업 종료 (Key: {key}) ---")
+    job_journal.finish(journal_id, "failed", str(output_audio_path), f"{type(e).__name__}: {e}")
 # --- 여기까지 ---
 
-def process_video_and_callback(
+def prepare_diarize_job(
     video_path: str,
     key: str,
     save_to_file: bool,
     model_name: str,
     device: str,
     compute_type: str,
-    # --- <<<--- 튜닝 파라미터를 받을 딕셔너리 추가 ---
-    diarization_params: dict     # diarization_params는 {'threshold': 0.55, 'min_duration_off': 0.8} 형태
-):
+    diarization_params: dict,
+    language: str = DEFAULT_LANGUAGE,
+    content_hash: str = None,
+    audio_path: str = None,
+    batch_key: str = None,
+    send_callback: bool = True,
+    inflight_key: str = None,
+    ticket: str = None,
+    journal_id: int = None
+) -> dict:
     """
-    영상 파일을 받아 회의록과 VTT 파일을 생성하는 태스크 (튜닝 파라미터 적용)
+    화자분리 작업 하나의 상태(파라미터 + 단계별 중간 결과)를 담는 딕셔너리를 만듭니다.
+    각 단계 함수는 이 딕셔너리를 받아 필요한 값을 읽고, 결과를 다시 기록합니다.
+    content_hash : 업로드 파일의 sha256 (같은 파일을 다시 올리면 디코딩 없이 캐시 조회)
+    audio_path : 업로드 중에 미리 뽑아 둔 오디오 파일 (있으면 영상 대신 이 파일을 디코딩하고 작업 종료 시 삭제)
+    batch_key : 배치 제출(/speaker-batch)에 속한 작업이면 배치 키 (끝나면 배치 진행 상황에 반영)
+    send_callback : False이면 녹화본별 완료 콜백을 보내지 않음 (배치 완료 콜백만 받는 경우)
+    inflight_key : 진행 중 작업 색인의 식별자 (끝나면 합류한 중복 요청에도 같은 결과를 통보)
+    ticket : 입장 제어(admission)에서 받은 표 (끝나면 반납하여 대기열 자리와 예상 시간에 반영)
+    journal_id : 작업 저널 번호 (시작/종료를 기록하여 재시작 후 끝나지 않은 작업만 다시 실행)
     """
-    print(f"--- 작업 시작 (Key: {key}) ---")
-    print(f"영상 파일: {video_path}")
-    print(f"모델: {model_name}, 장치: {device}, 타입: {compute_type}")
-    print(f"화자 분리 파라미터: {diarization_params}")
+    output_path = Path(video_path)
+    # 결과 파일은 원본 영상과 같은 폴더에 "<영상이름>_whisper.txt/vtt" 로 저장
+    output_txt_path = output_path.parent / f"{output_path.stem}_whisper.txt"
+    output_vtt_path = output_path.parent / f"{output_path.stem}_whisper.vtt"
+    # 실패 시 에러 내용은 key 값을 파일명으로 사용하여 기록
+    error_txt_path = output_path.parent / f"{key}_whisper.txt"
 
-    # key 값을 파일명으로 사용
-    output_path = Path(video_path).parent / key
-    
-    output_txt_path = output_path.with_name(f"{output_path.name}_whisper.txt")
-    output_vtt_path = output_path.with_name(f"{output_path.name}_whisper.vtt")
+    return {
+        "video_path": video_path,
+        "audio_path": audio_path,
+        "content_hash": content_hash,
+        "key": key,
+        "save_to_file": save_to_file,
+        "model_name": model_name,
+        "device": device,
+        "compute_type": compute_type,
+        "language": language,
+        "replica": 0, # 모델 복제본 번호 (워커 풀이 워커별로 지정)
+        "diarization_params": diarization_params,
+        "batch_key": batch_key,
+        "send_callback": send_callback,
+        "inflight_key": inflight_key,
+        "ticket": ticket,
+        "journal_id": journal_id,
+        "output_txt_path": output_txt_path,
+        "output_vtt_path": output_vtt_path,
+        "error_txt_path": error_txt_path,
+        # 단계별 중간 결과
+        "audio": None,
+        "duration": 0.0,
+        "windowed": False, # True이면 구간 단위로 처리 (긴 녹화본)
+        "audio_hash": None,
+        "cache_key": None,
+        "alignment_cached": False,
+        "asr_batch_size": None, # 실제로 사용한 ASR 배치 크기 (메모리 부족으로 줄였으면 줄인 값)
+        "asr_oom_retries": 0,
+        "timeline": None, # 무음을 잘라냈으면 압축 시각 → 원래 시각 변환표 (SpeechTimeline)
+        "vad": None, # 무음 건너뛰기 기록 {"speech_seconds", "removed_seconds"}
+        "done": False, # True가 되면 이후 단계를 건너뜀 (캐시 적중 등)
+        "result": None,
+        # 메트릭/작업 로그용
+        "submitted_at": time.monotonic(),
+        "timings": {}, # 단계 이름 -> 처리 시간(초)
+        "waits": {},   # 단계 이름 -> 단계 큐 대기 시간(초)
+        "outcome": None, # completed / cached / failed
+        "error": None,
+    }
+
+def run_stage(job: dict, name: str, stage_fn):
+    """단계 함수를 실행하고 소요 시간을 작업 기록(job["timings"])과 메트릭에 남깁니다."""
+    started_at = time.monotonic()
+    try:
+        stage_fn(job)
+    finally:
+        elapsed = time.monotonic() - started_at
+        job["timings"][name] = elapsed
+        # 추출 단계에서 길이를 알아내므로 추출이 실패했으면 오디오 길이는 0
+        metrics.observe_stage(name, elapsed, job["duration"])
+
+def try_cached_result(job: dict) -> bool:
+    """
+    같은 파일(경로/크기/수정시각 동일)을 이전에 처리한 적이 있으면 디코딩 없이 캐시된 결과를 바로 전달합니다.
+    캐시를 사용했으면 True를 반환합니다.
+    """
+    if RESULT_CACHE is None:
+        return False
+    audio_hash = RESULT_CACHE.lookup_source(job["video_path"], job["content_hash"])
+    if audio_hash is None:
+        return False
+
+    job["cache_key"] = _cache_key(job, audio_hash)
+    cached = RESULT_CACHE.get(job["cache_key"])
+    if cached is None:
+        return False
+
+    print(f"결과 캐시 적중 (Key: {job['key']}) - 처리 과정을 건너뜁니다.")
+    job["outcome"] = "cached"
+    deliver_result(job, cached["txt"], cached["vtt"])
+    job["done"] = True
+    return True
+
+def extract_audio_stage(job: dict):
+    """1단계: 영상에서 16kHz 모노 오디오를 디스크를 거치지 않고 메모리(NumPy 배열)로 바로 디코딩합니다."""
+    print(f"--- 작업 시작 (Key: {job['key']}) ---")
+    print(f"영상 파일: {job['video_path']}")
+    print(f"모델: {job['model_name']}, 장치: {job['device']}, 타입: {job['compute_type']}, 언어: {job['language']}")
+    print(f"화자 분리 파라미터: {job['diarization_params']}")
+    # 파이프라인 단계 큐에서 기다린 시간까지 대기로 보고, 실제로 처리를 시작한 시점부터 남은 시간을 계산
+    admission.start(job["ticket"])
+    job_journal.start(job["journal_id"])
+
+    # 업로드 중에 미리 뽑아 둔 오디오가 있으면 영상 대신 그 파일을 사용
+    source_path = job["audio_path"] or job["video_path"]
+    job["duration"] = probe_duration(source_path)
+
+    # 아주 긴 녹화본은 전체를 디코딩하지 않고, ASR 단계에서 구간 단위로 디코딩/처리합니다.
+    if WINDOWED_MIN_SECONDS is not None and job["duration"] >= WINDOWED_MIN_SECONDS:
+        job["windowed"] = True
+        print(f"1. 긴 녹화본({job['duration']:.0f}초) - 구간 단위 처리 모드로 전환합니다.")
+        return
+
+    # 매우 긴 녹화본은 RAM 대신 memmap(임시 파일)을 사용 (AUDIO_MMAP_MIN_SECONDS가 None이면 사용 안 함)
+    use_mmap = AUDIO_MMAP_MIN_SECONDS is not None and job["duration"] >= AUDIO_MMAP_MIN_SECONDS
+
+    print(f"1. 오디오 추출 중... (memmap: {use_mmap})")
+    job["audio"] = decode_audio(source_path, use_mmap=use_mmap, mmap_dir=AUDIO_MMAP_DIR)
+    print("오디오 추출 완료.")
+
+    if RESULT_CACHE is not None or ARTIFACT_STORE is not None:
+        job["audio_hash"] = hash_audio(job["audio"])
 
+    # 디코딩한 오디오 내용으로 캐시를 한 번 더 조회 (다른 경로/파일명으로 올라온 같은 녹화본)
+    if RESULT_CACHE is not None:
+        audio_hash = job["audio_hash"]
+        RESULT_CACHE.remember_source(job["video_path"], audio_hash, job["content_hash"])
+        cache_key = _cache_key(job, audio_hash)
+        if cache_key != job["cache_key"]:
+            job["cache_key"] = cache_key
+            cached = RESULT_CACHE.get(cache_key)
+            if cached is not None:
+                print(f"결과 캐시 적중 (Key: {job['key']})")
+                job["outcome"] = "cached"
+                deliver_result(job, cached["txt"], cached["vtt"])
+                job["done"] = True
+                return
+
+    # 긴 무음을 잘라내고 말소리만 이어 붙여 이후 단계(ASR/정렬/화자분리)에 넘김
+    if VAD_SETTINGS is not None:
+        audio, timeline = apply_vad(job["audio"], VAD_SETTINGS, mmap_dir=AUDIO_MMAP_DIR)
+        if timeline is not None:
+            release_audio(job["audio"])
+            job["audio"] = audio
+            job["timeline"] = timeline
+            job["vad"] = add_to_report(job["vad"], timeline)
+            print(f"무음 건너뛰기: {timeline.removed_seconds:.0f}초 제거, 말소리 {timeline.speech_seconds:.0f}초만 처리합니다.")
+
+def _transcript_artifact_key(job: dict) -> str:
+    # ASR+정렬 결과는 화자분리 파라미터와 무관하므로 오디오/모델/언어로만 구분
+    return make_artifact_key(
+        job["audio_hash"], "transcript", model=job["model_name"], language=job["language"], **_processing_options()
+    )
+
+def _diarization_artifact_key(job: dict) -> str:
+    return make_artifact_key(job["audio_hash"], "diarization_features", model=DIARIZATION_MODEL_NAME, **_processing_options())
+
+def run_windowed_job(job: dict):
+    """
+    긴 녹화본을 겹치는 구간 단위로 끝까지 처리하고 결과를 전달합니다.
+    각 구간이 모든 모델을 거쳐야 하므로 이 작업은 ASR 단계를 점유한 채 한 번에 처리됩니다.
+    회의록/VTT는 구간이 끝날 때마다 출력 파일(.part, 끝까지 처리한 뒤 완료 파일 이름으로 바꿈) 또는 UI용 버퍼에 바로 기록됩니다.
+    """
+    def run(txt_out, vtt_out):
+        with MODEL_POOL.use("asr", job["model_name"], job["device"], job["compute_type"], replica=job["replica"]) as asr_model, \
+                MODEL_POOL.use("align", device=job["device"], language=job["language"], replica=job["replica"]) as align_model_data, \
+                MODEL_POOL.use("diarize", DIARIZATION_MODEL_NAME, job["device"], replica=job["replica"]) as diarize_model:
+            return process_windowed(
+                job, asr_model, align_model_data, diarize_model,
+                TranscriptStreamWriter(txt_out, vtt_out),
+                window_seconds=WINDOW_SECONDS,
+                overlap_seconds=WINDOW_OVERLAP_SECONDS,
+                transcribe=lambda audio: transcribe(asr_model, audio, [job]),
+                vad_settings=VAD_SETTINGS,
+                on_window=lambda index, total: progress_hub.publish(
+                    job["key"], "processing", stage="asr", window=index, windows=total
+                ),
+            )
+
+    if job["save_to_file"]:
+        # 중간에 실패하면 잘린 회의록이 완료 파일 이름으로 남지 않도록 .part에 쓰고, 끝까지 처리한 뒤에 이름을 바꿈
+        txt_part = job["output_txt_path"].with_name(job["output_txt_path"].name + ".part")
+        vtt_part = job["output_vtt_path"].with_name(job["output_vtt_path"].name + ".part")
+        try:
+            with open(txt_part, 'w', encoding='utf-8') as txt_out, open(vtt_part, 'w', encoding='utf-8') as vtt_out:
+                audio_hash = run(txt_out, vtt_out)
+            os.replace(txt_part, job["output_txt_path"])
+            os.replace(vtt_part, job["output_vtt_path"])
+        finally:
+            txt_part.unlink(missing_ok=True)
+            vtt_part.unlink(missing_ok=True)
+        final_transcript = vtt_content = None
+        if RESULT_CACHE is not None:
+            final_transcript = job["output_txt_path"].read_text(encoding='utf-8')
+            vtt_content = job["output_vtt_path"].read_text(encoding='utf-8')
+    else:
+        txt_out, vtt_out = io.StringIO(), io.StringIO()
+        audio_hash = run(txt_out, vtt_out)
+        final_transcript, vtt_content = txt_out.getvalue(), vtt_out.getvalue()
+
+    if RESULT_CACHE is not None:
+        RESULT_CACHE.remember_source(job["video_path"], audio_hash, job["content_hash"])
+        cache_key = _cache_key(job, audio_hash)
+        RESULT_CACHE.put(cache_key, {"txt": final_transcript, "vtt": vtt_content})
+
+    deliver_result(job, final_transcript, vtt_content, files_written=True)
+    job["done"] = True
+
+def _reuse_transcript(job: dict) -> bool:
+    """같은 녹화본을 같은 모델로 인식한 적이 있으면 (화자분리 파라미터만 바뀐 재실행) 저장된 정렬 결과를 사용합니다."""
+    if ARTIFACT_STORE is None or not job["audio_hash"]:
+        return False
+    cached = ARTIFACT_STORE.get(_transcript_artifact_key(job))
+    if cached is None:
+        return False
+    print(f"   - 저장된 ASR/정렬 결과 재사용 (Key: {job['key']})")
+    job["result"] = cached
+    job["alignment_cached"] = True
+    return True
+
+def asr_stage(job: dict):
+    """2단계: 로드된 ASR 모델로 음성 인식을 수행합니다."""
+    if job["windowed"]:
+        run_windowed_job(job)
+        return
+
+    if _reuse_transcript(job):
+        return
+
+    # 요청한 모델을 모델 풀에서 빌려 씀 (처음 요청된 모델이면 이때 로드)
+    print(f"   - 음성 인식(ASR) 진행 중... (Key: {job['key']})")
+    with MODEL_POOL.use("asr", job["model_name"], job["device"], job["compute_type"], replica=job["replica"]) as asr_model:
+        job["result"] = transcribe(asr_model, job["audio"], [job])
+
+def _audio_seconds(job: dict) -> float:
+    # 무음을 잘라냈으면 잘라낸 뒤의 길이 (ASR에 실제로 넣는 길이)
+    return len(job["audio"]) / SAMPLE_RATE
+
+def _asr_batch_key(job: dict):
+    """다른 작업과 ASR을 묶어 처리할 수 있으면 묶음 기준(같은 모델 인스턴스 + 언어)을, 아니면 None을 반환합니다."""
+    if job["windowed"] or job["audio"] is None or not job["language"]:
+        return None
+    if _audio_seconds(job) > ASR_BATCH_MAX_SECONDS:
+        return None
+    return (job["model_name"], job["device"], job["compute_type"], job["replica"], job["language"])
+
+def plan_asr_batches(jobs: list) -> list:
+    """
+    ASR 단계 앞에 함께 대기 중이던 작업들을 [[작업, ...], ...] 묶음으로 나눕니다. (대기열 순서 유지)
+    같은 모델/언어의 짧은 녹화본끼리 최대 ASR_BATCH_MAX_JOBS건, 합계 ASR_BATCH_MAX_SECONDS초까지 묶고
+    구간 처리 작업이나 긴 녹화본은 혼자 처리합니다.
+    """
+    groups = []
+    open_groups = {} # 묶음 기준 -> 아직 자리가 남은 묶음
+    for job in jobs:
+        batch_key = _asr_batch_key(job)
+        if batch_key is None:
+            groups.append([job])
+            continue
+        group = open_groups.get(batch_key)
+        if group is None or len(group) >= ASR_BATCH_MAX_JOBS or \
+                sum(map(_audio_seconds, group)) + _audio_seconds(job) > ASR_BATCH_MAX_SECONDS:
+            group = open_groups[batch_key] = []
+            groups.append(group)
+        group.append(job)
+    return groups
+
+def asr_batch_stage(jobs: list):
+    """
+    2단계(묶음): 짧은 녹화본 여러 개를 무음으로 이어 붙여 한 번의 ASR 호출로 인식한 뒤, 세그먼트를 녹화본별로 나눕니다.
+    녹화본마다 따로 호출할 때보다 GPU 배치가 꽉 차고 호출당 고정 비용(VAD, 특징 추출 준비 등)이 한 번만 듭니다.
+    """
+    pending = [job for job in jobs if not _reuse_transcript(job)]
+    if not pending:
+        return
+    first = pending[0]
+    gap = np.zeros(int(ASR_BATCH_GAP_SECONDS * SAMPLE_RATE), dtype=np.float32)
+    parts, starts, lengths = [], [], []
+    offset = 0
+    for job in pending:
+        if parts:
+            parts.append(gap)
+            offset += len(gap)
+        parts.append(np.asarray(job["audio"], dtype=np.float32))
+        starts.append(offset / SAMPLE_RATE)
+        lengths.append(len(job["audio"]) / SAMPLE_RATE)
+        offset += len(job["audio"])
+
+    print(f"   - 음성 인식(ASR) 묶음 처리 중... ({len(pending)}건, Key: {', '.join(job['key'] for job in pending)})")
+    combined = np.concatenate(parts)
+    del parts
+    with MODEL_POOL.use("asr", first["model_name"], first["device"], first["compute_type"], replica=first["replica"]) as asr_model:
+        result = transcribe(asr_model, combined, pending)
+    del combined
+
+    # 세그먼트 가운데 시각이 속한 녹화본으로 나누고, 그 녹화본의 시작 시각만큼 당김
+    segments = [[] for _ in pending]
+    for seg in result["segments"]:
+        index = max(bisect_right(starts, (seg["start"] + seg["end"]) / 2) - 1, 0)
+        start = min(max(seg["start"] - starts[index], 0.0), lengths[index])
+        end = min(max(seg["end"] - starts[index], start), lengths[index])
+        segments[index].append({**seg, "start": round(start, 3), "end": round(end, 3)})
+    for job, job_segments in zip(pending, segments):
+        job["result"] = {"segments": job_segments, "language": result.get("language", job["language"])}
+
+def run_batch_stage(jobs: list, name: str, batch_fn):
+    """묶음 단계 함수를 실행하고, 소요 시간을 오디오 길이 비율로 나눠 작업별 기록과 메트릭에 남깁니다."""
+    started_at = time.monotonic()
     try:
-        # --- 1. 오디오 추출 ---
-        audio_path_obj = Path(video_path).with_suffix('.wav')
-        audio_path = str(audio_path_obj)
-        
-        print("1. 오디오 추출 중...")
-        ffmpeg.input(video_path).output(
-            audio_path, acodec='pcm_s16le', ac=1, ar='16000'
-        ).run(overwrite_output=True, quiet=True)
-        print("오디오 추출 완료.")
-
-        # --- <<<--- 2. 전역 모델 재사용 ---
-        print("2. 로드된 모델을 사용하여 처리 시작...")
-        
-        # 모델을 새로 로드하는 대신, 전역 변수에서 가져옵니다.
-        asr_model = MODELS["asr"]
-        align_model_data = MODELS["align"]
-        diarize_model = MODELS["diarize"]
-
-        if not all([asr_model, align_model_data, diarize_model]):
-            # 모델이 로드되지 않은 경우 에러 처리
-            raise RuntimeError("모델이 정상적으로 로드되지 않았습니다. 서버를 재시작하세요.")
-
-        audio = whisperx.load_audio(audio_path)
-
-        # 2-1. ASR
-        print("   - 음성 인식(ASR) 진행 중...")
-        result = asr_model.transcribe(audio, language="ko", batch_size=16)
-        
-        # 2-2. Align
-        print("   - 타임스탬프 정렬 중...")
-        result = whisperx.align(
-            result["segments"], 
-            align_model_data["model"], 
-            align_model_data["metadata"], 
-            audio, 
-            device, 
+        batch_fn(jobs)
+    finally:
+        elapsed = time.monotonic() - started_at
+        total_duration = sum(job["duration"] for job in jobs)
+        for job in jobs:
+            share = job["duration"] / total_duration if total_duration else 1 / len(jobs)
+            job["timings"][name] = elapsed * share
+            metrics.observe_stage(name, elapsed * share, job["duration"])
+
+def align_stage(job: dict):
+    """3단계: 단어 단위 타임스탬프를 정렬합니다."""
+    if job["alignment_cached"]:
+        return
+
+    import whisperx
+
+    print(f"   - 타임스탬프 정렬 중... (Key: {job['key']})")
+    with MODEL_POOL.use("align", device=job["device"], language=job["language"], replica=job["replica"]) as align_model_data:
+        job["result"] = whisperx.align(
+            job["result"]["segments"],
+            align_model_data["model"],
+            align_model_data["metadata"],
+            job["audio"],
+            job["device"],
             return_char_alignments=False
         )
+    if ARTIFACT_STORE is not None and job["audio_hash"]:
+        # 화자 지정(assign_word_speakers)이 결과를 수정하기 전에 저장
+        ARTIFACT_STORE.put(_transcript_artifact_key(job), job["result"])
+
+def diarize_stage(job: dict):
+    """4단계: 화자 분리 후 단어별 화자를 지정합니다."""
+    import whisperx
+
+    diarization_params = job["diarization_params"]
+    print(f"   - 화자 분리 진행 중... (Key: {job['key']})")
+    print(f"  - 파라미터 적용: {diarization_params}")
 
-        # 2-3. Diarize
-        print("   - 화자 분리 진행 중...")
-        print(f"  - 파라미터 적용: {diarization_params}")
-         
-        # 2-3-1. 파이프라인 내부 속성 값을 직접 변경합니다.
-        #    'pipeline'이 아니라 'model' 속성을 통해 pyannote 객체에 접근합니다.
-        if 'threshold' in diarization_params:
-            diarize_model.model.clustering.threshold = diarization_params['threshold']
-        if 'min_duration_off' in diarization_params:
-            diarize_model.model.segmentation.min_duration_off = diarization_params['min_duration_off']
-
-        # 2-3-2. 파라미터가 수정된 모델로 화자 분리를 실행합니다.
-        diarize_segments = diarize_model(
-            audio, 
-            min_speakers=diarization_params['min_speakers'],
-            max_speakers=diarization_params['max_speakers']
+    # 4-1. 같은 녹화본의 세그멘테이션/임베딩이 저장되어 있으면 클러스터링만 다시 수행합니다.
+    use_store = ARTIFACT_STORE is not None and job["audio_hash"]
+    cached_features = ARTIFACT_STORE.get(_diarization_artifact_key(job)) if use_store else None
+    if cached_features:
+        print("  - 저장된 세그멘테이션/임베딩 재사용 (클러스터링만 수행)")
+
+    # 4-2. 파라미터를 적용하여 화자 분리를 실행합니다.
+    with MODEL_POOL.use("diarize", DIARIZATION_MODEL_NAME, job["device"], replica=job["replica"]) as diarize_model:
+        diarize_segments, features = run_diarization(
+            diarize_model, job["audio"], diarization_params, cached_features=cached_features
         )
-        
-        # 2-3-3. assign_word_speakers 호출
-        result = whisperx.assign_word_speakers(diarize_segments, result)
-        print("화자 분리 완료.")
-                
-        # --- 3. 후처리 및 파일 저장 ---
-        print("3. 후처리 및 파일 저장 중...")
-        
-        final_transcript = generate_formatted_transcript(result)
-        vtt_content = generate_vtt_content(result)
-
-        if save_to_file:
-            # API 호출의 경우: 파일로 저장하고 콜백 전송
-            output_path = Path(video_path)
-            output_txt_path = output_path.parent / f"{output_path.stem}_whisper.txt"
-            output_vtt_path = output_path.parent / f"{output_path.stem}_whisper.vtt"
+    if use_store and not cached_features and features:
+        ARTIFACT_STORE.put(_diarization_artifact_key(job), features)
+
+    # 4-3. assign_word_speakers 호출
+    job["result"] = whisperx.assign_word_speakers(diarize_segments, job["result"])
+    if job["timeline"] is not None:
+        # 무음을 잘라낸 오디오 기준 시각 → 원래 녹화본 시각
+        job["timeline"].remap_result(job["result"])
+    # 이후 단계에서는 오디오가 필요 없으므로 메모리를 바로 반환
+    release_audio(job["audio"])
+    job["audio"] = None
+    print("화자 분리 완료.")
 
+def finalize_stage(job: dict):
+    """5단계: 후처리 후 파일 저장/콜백 전송 또는 UI 결과 저장."""
+    print("3. 후처리 및 파일 저장 중...")
+    final_transcript, vtt_content = generate_transcript_outputs(job["result"])
+
+    if RESULT_CACHE is not None and job["cache_key"]:
+        RESULT_CACHE.put(job["cache_key"], {"txt": final_transcript, "vtt": vtt_content})
+
+    deliver_result(job, final_transcript, vtt_content)
+
+def deliver_result(job: dict, final_transcript: str, vtt_content: str, files_written: bool = False):
+    """
+    완성된 회의록/VTT를 파일 저장 + 콜백 전송 또는 UI 결과로 전달합니다.
+    files_written=True 이면 (구간 단위 처리처럼) 파일이 이미 기록된 것으로 보고 콜백만 전송합니다.
+    """
+    key = job["key"]
+    job["outcome"] = job["outcome"] or "completed"
+    if job["save_to_file"]:
+        # API 호출의 경우: 파일로 저장하고 콜백 전송
+        output_txt_path = job["output_txt_path"]
+        output_vtt_path = job["output_vtt_path"]
+
+        if not files_written:
             with open(output_txt_path, 'w', encoding='utf-8') as f:
                 f.write(final_transcript)
-            print(f"회의록 파일 저장 완료: {output_txt_path}")
-            
             with open(output_vtt_path, 'w', encoding='utf-8') as f:
                 f.write(vtt_content)
-            print(f"VTT 파일 저장 완료: {output_vtt_path}")
+        print(f"회의록 파일 저장 완료: {output_txt_path}")
+        print(f"VTT 파일 저장 완료: {output_vtt_path}")
 
+        if job["send_callback"]:
             send_completion_callback(
                 url=SPEAKER_CALLBACK_URL,
-                success=True, 
-                key=key, 
+                success=True,
+                key=key,
                 path=str(output_txt_path)
             )
-        else:
-            # 웹 UI 호출의 경우: 인메모리 딕셔너리에 저장
-            job_results[key] = {
-                "status": "completed",
-                "data": {
-                    "txt": final_transcript,
-                    "vtt": vtt_content
-                }
-            }
-            print(f"작업 결과 메모리에 저장 완료 (Key: {key})")
+        progress_hub.publish(key, "completed")
+        _notify_batch(job, str(output_txt_path))
+    else:
+        # 웹 UI 호출의 경우: 작업 결과 저장소에 저장
+        job_results.put(key, "completed", {
+            "txt": final_transcript,
+            "vtt": vtt_content
+        })
+        print(f"작업 결과 저장 완료 (Key: {key})")
+        progress_hub.publish(key, "completed", data={"txt": final_transcript, "vtt": vtt_content})
 
-    except Exception as e:
-        # --- <<<--- 이 부분을 수정하여 상세한 에러 로그를 얻습니다. ---
-        # 1. 전체 에러 트레이스백을 콘솔에 출력
-        print("---!!! 작업 중 심각한 오류 발생 !!!---")
-        traceback.print_exc()
-        print("------------------------------------")
-        
-        # 2. 에러 메시지를 더 상세하게 생성
-        error_message = f"작업 실패 (Key: {key}): {type(e).__name__} - {e}"
-        print(error_message)
-
-        # --- <<<--- 이 부분 로직 수정 ---
-        if save_to_file:
-            # 파일 저장 모드에서 에러 발생 시에만 파일에 에러 내용 기록
-            # output_txt_path가 try 블록 초반에 정의되므로 사용 가능
-            with open(output_txt_path, 'w', encoding='utf-8') as f:
-                f.write(error_message)
-            
+def handle_job_failure(job: dict, e: Exception):
+    """어느 단계에서든 예외가 발생하면 호출되어 실패를 기록/통보합니다."""
+    key = job["key"]
+    # 1. 전체 에러 트레이스백을 콘솔에 출력
+    print("---!!! 작업 중 심각한 오류 발생 !!!---")
+    traceback.print_exception(type(e), e, e.__traceback__)
+    print("------------------------------------")
+
+    # 2. 에러 메시지를 더 상세하게 생성
+    error_message = f"작업 실패 (Key: {key}): {type(e).__name__} - {e}"
+    print(error_message)
+    job["outcome"] = "failed"
+    job["error"] = f"{type(e).__name__}: {e}"
+
+    if job["save_to_file"]:
+        # 파일 저장 모드에서 에러 발생 시에만 파일에 에러 내용 기록
+        output_txt_path = job["error_txt_path"]
+        with open(output_txt_path, 'w', encoding='utf-8') as f:
+            f.write(error_message)
+
+        if job["send_callback"]:
             send_completion_callback(
                 url=SPEAKER_CALLBACK_URL,
                 success=False,
@@ -284,91 +826,196 @@ def process_video_and_callback(
                 path=str(output_txt_path),
                 error=str(e)
             )
-        else:
-            # UI 모드에서는 job_results에 에러 상태 기록
-            job_results[key] = {"status": "failed", "data": error_message}
+        progress_hub.publish(key, "failed", data=error_message)
+        _notify_batch(job, str(output_txt_path))
+    else:
+        # UI 모드에서는 job_results에 에러 상태 기록
+        job_results.put(key, "failed", error_message)
+        progress_hub.publish(key, "failed", data=error_message)
+
+def _notify_batch(job: dict, output_path: str):
+    """배치에 속한 작업이면 배치 진행 상황에 반영하고, 마지막 작업이었으면 배치 완료 콜백을 보냅니다."""
+    if job["batch_key"] is None:
+        return
+    summary = batch_tracker.job_finished(job["batch_key"], job["key"], job["outcome"], output_path, job["error"])
+    if summary is not None:
+        send_batch_callback(summary)
+
+def send_batch_callback(summary: dict):
+    """
+    배치 완료 콜백 (callback이 "batch" 또는 "both"인 배치만)
+    path에는 녹화본별 상태/결과 경로/오류를 담은 매니페스트 JSON 경로가 전달됩니다.
+    """
+    print(f"배치 처리 완료 (Key: {summary['batch_key']}): 전체 {summary['total']}건, 실패 {summary['failed']}건")
+    if summary["callback"] not in ("batch", "both"):
+        return
+    send_completion_callback(
+        url=BATCH_CALLBACK_URL,
+        success=summary["failed"] == 0,
+        key=summary["batch_key"],
+        path=summary["manifest_path"],
+        error=f"{summary['failed']}건 실패",
+        extra_params={
+            "total": summary["total"],
+            "completed": summary["completed"] + summary["cached"],
+            "failed": summary["failed"],
+        }
+    )
+
+def _release_job_audio(job: dict):
+    release_audio(job.get("audio"))
+    job["audio"] = None
+    job["result"] = None
+    if job.get("audio_path"):
+        Path(job["audio_path"]).unlink(missing_ok=True)
+
+def _finish_admission(job: dict):
+    admission.finish(job["ticket"])
+
+def cleanup_job(job: dict):
+    """
+    작업이 끝나면(성공/실패 무관) 디코딩된 오디오와 중간 결과를 정리하고, 합류한 요청 통보/대기열 표 반환/저널 완료 기록을 합니다.
+    한 단계가 실패해도 나머지 단계는 진행합니다. (표가 반환되지 않거나 완료 기록이 빠지면 대기열 추정/재시작 재실행이 어긋남)
+    """
+    for step in (_release_job_audio, _notify_followers, _finish_admission, _journal_finished, _record_job):
+        try:
+            step(job)
+        except Exception as e:
+            print(f"작업 정리 중 에러 발생 ({step.__name__}, Key: {job.get('key')}): {type(e).__name__} - {e}")
+    print(f"--- 작업 종료 (Key: {job['key']}) ---")
+
+def fail_journaled_job(entry: dict, e: Exception):
+    """
+    재시작 후 다시 실행할 수 없는 저널 작업(원본 파일이 사라짐, 처리 중에 서버가 반복해서 중단됨)을 실패로 통보하고 기록합니다.
+    entry : JobJournal.pending()의 항목
+    """
+    params = entry["task"]["params"]
+    if entry["kind"] == "convert":
+        output_audio_path = Path(params["video_path"]).with_suffix(f".{params['output_type']}")
+        _convert_failed(
+            entry["key"], output_audio_path, params["output_type"], e, time.monotonic(), params.get("inflight_key"), entry["id"]
+        )
+        return
+    job = prepare_diarize_job(**{**params, "journal_id": entry["id"]})
+    try:
+        handle_job_failure(job, e)
     finally:
-        # 임시 오디오 파일 삭제
-        if 'audio_path_obj' in locals() and audio_path_obj.exists():
-            audio_path_obj.unlink()
-        print(f"--- 작업 종료 (Key: {key}) ---")
-        
-def generate_formatted_transcript(result: dict) -> str:
-    # 1. 초기 세그먼트 정리 및 형식 변환
-    processed_segments = []
-    if "segments" in result and result["segments"]:
-        for seg in result["segments"]:
-            if 'speaker' not in seg:
-                seg['speaker'] = 'UNKNOWN'
-            
-            start_time = int(seg['start'])
-            
-            def format_time(seconds):
-                hours, remainder = divmod(seconds, 3600)
-                minutes, seconds = divmod(remainder, 60)
-                return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
-
-            processed_segments.append({
-                'start': seg['start'],
-                'end': seg['end'],
-                'timestamp': format_time(start_time),
-                'speaker': seg['speaker'],
-                'text': seg['text'].strip()
-            })
-
-    # 2. 짧은 발언 병합 로직
-    merged_segments = []
-    if processed_segments:       
-        merged_segments.append(processed_segments[0])
-
-        for i in range(1, len(processed_segments)):
-            current_seg = processed_segments[i]
-            prev_seg = merged_segments[-1] # 병합된 리스트의 마지막 세그먼트
-
-            # 현재 세그먼트의 단어 수 계산
-            current_word_count = len(current_seg['text'].split())
-            
-            # 병합 조건 확인:
-            # 1. 이전 발언이 끝난 후 MERGE_THRESHOLD_SECONDS 안에 현재 발언이 시작되었는가?
-            # 2. 현재 발언의 단어 수가 SHORT_SEGMENT_WORD_COUNT 이하인가?
-            # 3. (선택적) 또는 화자가 UNKNOWN 인가?
-            time_gap = current_seg['start'] - prev_seg['end']
-            
-            if (time_gap < MERGE_THRESHOLD_SECONDS and current_word_count <= SHORT_SEGMENT_WORD_COUNT) or current_seg['speaker'] == 'UNKNOWN':
-                # -- 병합 수행 --
-                # 텍스트를 이전 세그먼트에 합치기
-                prev_seg['text'] += " " + current_seg['text']
-                # 종료 시간을 현재 세그먼트의 종료 시간으로 업데이트
-                prev_seg['end'] = current_seg['end']
-            else:
-                # 병합하지 않고 새 세그먼트로 추가
-                merged_segments.append(current_seg)
-
-    # 텍스트를 담을 리스트
-    output_lines = []
-
-    if merged_segments:
-        current_speaker = merged_segments[0]['speaker']
-        output_lines.append(f"[{merged_segments[0]['timestamp']}] [{current_speaker}]:")
-
-        for i in range(len(merged_segments)):
-            segment = merged_segments[i]
-            speaker = segment['speaker']
-            text = segment['text']
-            timestamp = segment['timestamp']
-           
-            if speaker == current_speaker:
-                output_lines[-1] += f" {text}"
-            else:
-                output_lines.append(f"\n[{timestamp}] [{speaker}]: {text}")
-                current_speaker = speaker
+        cleanup_job(job)
+
+def _notify_followers(job: dict):
+    """작업이 진행되는 동안 같은 요청을 다시 보낸 다른 키에도 이 작업의 결과(성공/실패)를 통보합니다."""
+    followers = inflight_jobs.release(job["inflight_key"])
+    if not followers:
+        return
+    success = job["outcome"] in ("completed", "cached")
+    output_path = job["output_txt_path"] if success else job["error_txt_path"]
+    for key in followers:
+        print(f"합류한 요청에 결과 통보 (Key: {key}, 기존 작업: {job['key']})")
+        send_completion_callback(
+            url=SPEAKER_CALLBACK_URL,
+            success=success,
+            key=key,
+            path=str(output_path),
+            error=job["error"] or ""
+        )
+        progress_hub.publish(key, "completed" if success else "failed")
+
+def _journal_finished(job: dict):
+    """
+    작업 저널에 완료/실패를 기록합니다. 콜백(합류한 요청 포함)을 outbox에 넣은 뒤에 기록하므로,
+    그 전에 서버가 죽으면 재시작 후 작업을 다시 실행하고(결과 캐시에 있으면 바로 전달) 다시 통보합니다.
+    """
+    outcome = job["outcome"] or "failed"
+    if outcome == "failed":
+        output_path = job["error_txt_path"] if job["save_to_file"] else None
     else:
-        output_lines.append("처리할 발언이 없습니다.")
+        output_path = job["output_txt_path"] if job["save_to_file"] else None
+    job_journal.finish(job["journal_id"], outcome, str(output_path) if output_path else None, job["error"])
+
+def _record_job(job: dict):
+    """작업 하나의 단계별 시간/대기 시간/결과를 메트릭과 작업 로그에 남깁니다."""
+    processing_seconds = sum(job["timings"].values())
+    duration = job["duration"]
+    if job["vad"]:
+        metrics.observe_vad(job["vad"]["removed_seconds"])
+    if job["outcome"] == "completed" and duration:
+        metrics.observe_throughput(job["device"], job["compute_type"], duration, processing_seconds)
+    metrics.record_job({
+        "kind": "diarize",
+        "key": job["key"],
+        # 결과가 정해지기 전에 끝났다면(예: 실패 통보 중 에러) 실패로 기록
+        "outcome": job["outcome"] or "failed",
+        "model": job["model_name"],
+        "device": job["device"],
+        "compute_type": job["compute_type"],
+        "replica": job["replica"],
+        "language": job["language"],
+        "windowed": job["windowed"],
+        "asr_batch_size": job["asr_batch_size"],
+        "asr_oom_retries": job["asr_oom_retries"],
+        "audio_seconds": round(duration, 3),
+        "total_seconds": round(time.monotonic() - job["submitted_at"], 3),
+        "processing_seconds": round(processing_seconds, 3),
+        "wait_seconds": round(sum(job["waits"].values()), 3),
+        "real_time_factor": round(processing_seconds / duration, 4) if duration else None,
+        "stage_seconds": {name: round(seconds, 3) for name, seconds in job["timings"].items()},
+        "stage_wait_seconds": {name: round(seconds, 3) for name, seconds in job["waits"].items()},
+        # 무음 건너뛰기로 ASR/정렬/화자분리에 넣지 않은 오디오 길이
+        "vad_removed_seconds": round(job["vad"]["removed_seconds"], 3) if job["vad"] else 0.0,
+        "error": job["error"],
+    })
 
-    return "".join(output_lines)
+# 화자분리 작업의 단계 목록 (순서대로 실행됨)
+# 파이프라인 워커(processor/pipeline.py)는 단계마다 별도의 큐를 두어,
+# 작업 N이 ASR 중일 때 작업 N+1의 오디오 추출이 동시에 진행되도록 합니다.
+DIARIZE_STAGES = [
+    ("extract", extract_audio_stage),
+    ("asr", asr_stage),
+    ("align", align_stage),
+    ("diarize", diarize_stage),
+    ("finalize", finalize_stage),
+]
+# 대기 중인 작업을 묶어 한 번에 처리할 수 있는 단계: 단계 이름 -> (묶음 단계 함수, 묶음 나누기 함수)
+DIARIZE_BATCH_STAGES = {
+    "asr": (asr_batch_stage, plan_asr_batches),
+} if ASR_BATCH_MAX_JOBS > 1 else {}
+
+def process_video_and_callback(
+    video_path: str,
+    key: str,
+    save_to_file: bool,
+    model_name: str,
+    device: str,
+    compute_type: str,
+    # --- <<<--- 튜닝 파라미터를 받을 딕셔너리 추가 ---
+    diarization_params: dict     # diarization_params는 {'threshold': 0.55, 'min_duration_off': 0.8} 형태
+):
+    """
+    영상 파일을 받아 회의록과 VTT 파일을 생성하는 태스크 (튜닝 파라미터 적용)
+    모든 단계를 한 스레드에서 순서대로 실행합니다. (파이프라인을 쓰지 않는 경우용)
+    """
+    job = prepare_diarize_job(
+        video_path, key, save_to_file, model_name, device, compute_type, diarization_params
+    )
+    try:
+        # 이미 처리한 적 있는 파일이면 디코딩 없이 캐시된 결과 사용
+        if try_cached_result(job):
+            return
+        for stage_name, stage_fn in DIARIZE_STAGES:
+            progress_hub.publish(key, "processing", stage=stage_name)
+            run_stage(job, stage_name, stage_fn)
+            if job["done"]:
+                break
+    except Exception as e:
+        handle_job_failure(job, e)
+    finally:
+        cleanup_job(job)
 
 def send_completion_callback(url: str, success: bool, key: str, path: str, error: str = "", extra_params: dict = None):
-    """CMS에 작업 완료/실패를 알리는 범용 콜백 함수"""
+    """
+    CMS에 작업 완료/실패를 알리는 범용 콜백 함수
+    실제 전송은 콜백 발송기가 이벤트 루프에서 하므로(재시도/outbox 포함) 작업 스레드는 기다리지 않습니다.
+    """
     params = {'key': key, 'path': path}
     if not success:
         params['error'] = error
@@ -376,9 +1023,6 @@ def send_completion_callback(url: str, success: bool, key: str, path: str, error
         params.update(extra_params) # 추가 파라미터 병합 (type=mp3 등)
 
     try:
-        print(f"콜백 전송 시도: {url} with params {params}")
-        response = requests.get(url, params=params, timeout=10)        
-        response.raise_for_status()
-        print(f"콜백 전송 성공 (Key: {key})")
-    except requests.RequestException as e:
-        print(f"콜백 전송 실패 (Key: {key}): {e}")
\ No newline at end of file
+        callback_dispatcher.enqueue(url, params)
+    except OSError as e:
+        print(f"콜백 대기열 기록 실패 (Key: {key}): {e}")
\ No newline at end of file
@@ -0,0 +1,174 @@
+# /processor/vad.py
+
+import math
+import tempfile
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+from processor.audio import SAMPLE_RATE
+
+# 프레임 에너지를 한 번에 계산할 프레임 수 (memmap 오디오도 조금씩 읽도록)
+_BLOCK_FRAMES = 8192
+
+def frame_levels_db(audio, frame_length: int) -> np.ndarray:
+    """오디오를 frame_length 샘플 단위 프레임으로 나눠 프레임별 평균 에너지(dBFS)를 구합니다. (끝의 남는 샘플은 무시)"""
+    frame_count = len(audio) // frame_length
+    levels = np.empty(frame_count, dtype=np.float32)
+    for first in range(0, frame_count, _BLOCK_FRAMES):
+        last = min(first + _BLOCK_FRAMES, frame_count)
+        frames = np.asarray(audio[first * frame_length:last * frame_length]).reshape(-1, frame_length)
+        power = np.einsum("ij,ij->i", frames, frames) / frame_length
+        levels[first:last] = 10 * np.log10(power + 1e-10)
+    return levels
+
+def find_speech_regions(
+    audio,
+    sample_rate: int,
+    frame_seconds: float,
+    threshold_db: float,
+    dynamic_range_db: float,
+    min_silence_seconds: float,
+    padding_seconds: float
+) -> list:
+    """
+    에너지 기준으로 긴 무음 구간을 찾아, 남길 구간 목록 [(시작 샘플, 끝 샘플), ...]을 반환합니다.
+
+    - 프레임 에너지가 threshold_db보다 작거나, 큰 소리(상위 1% 프레임) 대비 dynamic_range_db 이상 작으면 무음 프레임
+    - 무음 프레임이 min_silence_seconds 이상 이어진 구간만 잘라냅니다. (말 사이의 짧은 쉼은 그대로 둠)
+    - 잘라낸 구간 양쪽에 padding_seconds만큼 소리를 남겨 단어 앞뒤가 잘리지 않게 합니다.
+    소리가 전혀 없으면 빈 목록을 반환합니다.
+    """
+    frame_length = max(1, int(frame_seconds * sample_rate))
+    levels = frame_levels_db(audio, frame_length)
+    frame_count = len(levels)
+    if frame_count == 0:
+        return [(0, len(audio))] if len(audio) else []
+
+    threshold = max(threshold_db, float(np.percentile(levels, 99)) - dynamic_range_db)
+    silent = levels < threshold
+    if silent.all():
+        return []
+
+    # 무음 프레임이 연속되는 구간 [시작, 끝) 찾기
+    edges = np.diff(np.concatenate(([0], silent.view(np.int8), [0])))
+    run_starts = np.flatnonzero(edges == 1)
+    run_ends = np.flatnonzero(edges == -1)
+    long_runs = (run_ends - run_starts) >= math.ceil(min_silence_seconds / frame_seconds)
+    padding = int(round(padding_seconds / frame_seconds))
+
+    regions = []
+    position = 0
+    for run_start, run_end in zip(run_starts[long_runs], run_ends[long_runs]):
+        # 녹화본 맨 앞/맨 뒤의 무음은 여백 없이 잘라냄
+        cut_start = 0 if run_start == 0 else int(run_start + padding) * frame_length
+        cut_end = len(audio) if run_end == frame_count else int(run_end - padding) * frame_length
+        if cut_end <= cut_start:
+            continue
+        if cut_start > position:
+            regions.append((position, cut_start))
+        position = cut_end
+    if position < len(audio):
+        regions.append((position, len(audio)))
+    return regions
+
+class SpeechTimeline:
+    """
+    무음을 잘라내고 이어 붙인 오디오(압축 시각)와 원본 오디오(원래 시각) 사이의 시각 변환표.
+    ASR/정렬/화자분리는 압축된 오디오로 실행하고, 결과 타임스탬프는 remap_result()로 원래 시각으로 되돌립니다.
+    """
+
+    def __init__(self, regions: list, total_samples: int, sample_rate: int = SAMPLE_RATE):
+        self.regions = regions
+        self.sample_rate = sample_rate
+        self.total_samples = total_samples
+        self.speech_samples = sum(end - start for start, end in regions)
+        self._original_starts = [start / sample_rate for start, _ in regions]
+        self._compact_starts = []
+        offset = 0
+        for start, end in regions:
+            self._compact_starts.append(offset / sample_rate)
+            offset += end - start
+
+    @property
+    def speech_seconds(self) -> float:
+        return self.speech_samples / self.sample_rate
+
+    @property
+    def removed_seconds(self) -> float:
+        return (self.total_samples - self.speech_samples) / self.sample_rate
+
+    def compact(self, audio, mmap_dir: str = None) -> np.ndarray:
+        """남길 구간만 이어 붙인 오디오를 만듭니다. 원본이 memmap이면 결과도 임시 파일 memmap으로 만듭니다."""
+        if isinstance(audio, np.memmap):
+            tmp = tempfile.NamedTemporaryFile(prefix="pcm_vad_", suffix=".f32", dir=mmap_dir, delete=False)
+            tmp.close()
+            compacted = np.memmap(tmp.name, dtype=np.float32, mode="w+", shape=(self.speech_samples,))
+        else:
+            compacted = np.empty(self.speech_samples, dtype=np.float32)
+        offset = 0
+        for start, end in self.regions:
+            compacted[offset:offset + end - start] = audio[start:end]
+            offset += end - start
+        if isinstance(compacted, np.memmap):
+            compacted.flush()
+        return compacted
+
+    def to_original(self, seconds: float, is_end: bool = False) -> float:
+        """
+        압축 시각을 원래 시각으로 바꿉니다.
+        구간 경계의 시각은 시작 시각이면 뒤 구간의 시작으로, 끝 시각이면 앞 구간의 끝으로 봅니다.
+        """
+        if is_end:
+            index = bisect_left(self._compact_starts, seconds) - 1
+        else:
+            index = bisect_right(self._compact_starts, seconds) - 1
+        index = max(index, 0)
+        return round(self._original_starts[index] + (seconds - self._compact_starts[index]), 3)
+
+    def _remap_item(self, item: dict):
+        if "start" in item:
+            item["start"] = self.to_original(item["start"])
+        if "end" in item:
+            item["end"] = self.to_original(item["end"], is_end=True)
+
+    def remap_result(self, result: dict):
+        """
+        whisperx 결과(세그먼트/단어)의 타임스탬프를 원래 시각으로 바꿉니다. (제자리 수정)
+        whisperx는 word_segments에 세그먼트의 단어 딕셔너리를 그대로 담으므로 같은 항목은 한 번만 바꿉니다.
+        """
+        remapped = set()
+        items = [
+            *(item for seg in result.get("segments", []) for item in (seg, *seg.get("words", []))),
+            *result.get("word_segments", []),
+        ]
+        for item in items:
+            if id(item) not in remapped:
+                remapped.add(id(item))
+                self._remap_item(item)
+
+    def remap_diarization(self, diarize_df):
+        """화자분리 결과 DataFrame의 start/end 열을 원래 시각으로 바꿉니다. (제자리 수정)"""
+        diarize_df['start'] = [self.to_original(seconds) for seconds in diarize_df['start']]
+        diarize_df['end'] = [self.to_original(seconds, is_end=True) for seconds in diarize_df['end']]
+
+def apply_vad(audio, settings: dict, mmap_dir: str = None):
+    """
+    오디오에서 긴 무음 구간을 잘라냅니다.
+    반환값: (처리할 오디오, SpeechTimeline 또는 None)
+    잘라낼 무음이 없거나 소리가 전혀 없으면 원본 오디오와 None을 반환합니다.
+    """
+    regions = find_speech_regions(audio, SAMPLE_RATE, **settings)
+    if not regions:
+        return audio, None
+    timeline = SpeechTimeline(regions, len(audio))
+    if timeline.speech_samples == len(audio):
+        return audio, None
+    return timeline.compact(audio, mmap_dir), timeline
+
+def add_to_report(report: dict, timeline: SpeechTimeline) -> dict:
+    """작업별 무음 건너뛰기 기록(처리한 말소리 길이, 건너뛴 무음 길이)에 timeline 하나를 더합니다."""
+    report = report or {"speech_seconds": 0.0, "removed_seconds": 0.0}
+    report["speech_seconds"] += timeline.speech_seconds
+    report["removed_seconds"] += timeline.removed_seconds
+    return report
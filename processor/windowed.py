@@ -0,0 +1,191 @@
+# /processor/windowed.py
+
+import gc
+import hashlib
+
+from processor.audio import decode_audio
+from processor.diarize import run_diarization
+from processor.vad import apply_vad, add_to_report
+
+def plan_windows(total_seconds: float, window_seconds: float, overlap_seconds: float) -> list:
+    """
+    녹화본 전체 길이를 겹치는 구간(window)으로 나눕니다.
+
+    반환값: [(start, end, own_start, own_end), ...]
+      - start~end : 실제로 디코딩/처리할 구간
+      - own_start~own_end : 이 구간이 "책임지는" 범위 (겹침의 절반씩 나눠 가짐)
+        세그먼트는 시작 시각이 자기 범위에 들어가는 구간에서만 출력됩니다.
+    """
+    if total_seconds <= window_seconds:
+        return [(0.0, total_seconds, 0.0, float("inf"))]
+
+    step = window_seconds - overlap_seconds
+    windows = []
+    start = 0.0
+    while True:
+        end = min(start + window_seconds, total_seconds)
+        is_last = end >= total_seconds
+        own_start = 0.0 if not windows else start + overlap_seconds / 2
+        own_end = float("inf") if is_last else end - overlap_seconds / 2
+        windows.append((start, end, own_start, own_end))
+        if is_last:
+            break
+        start += step
+    return windows
+
+class SpeakerStitcher:
+    """
+    구간마다 따로 나온 화자 라벨(SPEAKER_00 ...)을 녹화본 전체에서 일관된 라벨로 이어 붙입니다.
+
+    이전 구간과 겹치는 시간대에서 (이번 구간 라벨, 이전 구간 전역 라벨)이 함께 말한 시간을 합산하여
+    가장 많이 겹치는 쌍부터 1:1로 연결합니다. 겹침 구간에 등장하지 않은 라벨은 새 전역 라벨을 받습니다.
+    (겹침 구간에서 말하지 않은 화자가 나중에 다시 나오면 새 화자로 잡힐 수 있습니다.)
+    """
+
+    def __init__(self, min_overlap_seconds: float = 0.5):
+        self.min_overlap_seconds = min_overlap_seconds
+        self.next_index = 0
+        self.tail = [] # 이전 구간 화자분리 결과 중 다음 구간과 겹칠 수 있는 부분 [(start, end, 전역 라벨)]
+
+    def _new_label(self) -> str:
+        label = f"SPEAKER_{self.next_index:02d}"
+        self.next_index += 1
+        return label
+
+    def stitch(self, diarize_df, keep_after: float) -> dict:
+        """
+        diarize_df(절대 시각 기준)의 지역 라벨 → 전역 라벨 매핑을 만들고 df의 speaker 열을 바꿉니다.
+        keep_after 이후의 발화는 다음 구간과 비교하기 위해 보관합니다.
+        """
+        rows = list(zip(diarize_df['start'], diarize_df['end'], diarize_df['speaker']))
+
+        overlap = {}
+        for start, end, local in rows:
+            for prev_start, prev_end, global_label in self.tail:
+                shared = min(end, prev_end) - max(start, prev_start)
+                if shared > 0:
+                    overlap[(local, global_label)] = overlap.get((local, global_label), 0.0) + shared
+
+        mapping = {}
+        used = set()
+        for (local, global_label), shared in sorted(overlap.items(), key=lambda item: -item[1]):
+            if shared < self.min_overlap_seconds or local in mapping or global_label in used:
+                continue
+            mapping[local] = global_label
+            used.add(global_label)
+        for local in sorted({local for _, _, local in rows}):
+            if local not in mapping:
+                mapping[local] = self._new_label()
+
+        diarize_df['speaker'] = diarize_df['speaker'].map(mapping)
+        self.tail = [(start, end, mapping[local]) for start, end, local in rows if end > keep_after]
+        return mapping
+
+def _shift_result(result: dict, offset: float):
+    """
+    구간 기준 타임스탬프(세그먼트, 세그먼트별 단어, word_segments)를 녹화본 전체 기준으로 옮깁니다.
+    구간으로 나누지 않은 처리와 같은 값이 나오도록 밀리초 단위로 반올림합니다. (VTT 시각은 밀리초 미만을 버림)
+    whisperx는 word_segments에 세그먼트의 단어 딕셔너리를 그대로 담으므로 같은 항목은 한 번만 옮깁니다.
+    """
+    shifted = set()
+
+    def shift(item: dict):
+        if id(item) in shifted:
+            return
+        shifted.add(id(item))
+        for name in ("start", "end"):
+            if name in item:
+                item[name] = round(item[name] + offset, 3)
+
+    for seg in result.get("segments", []):
+        shift(seg)
+        for word in seg.get("words", []):
+            shift(word)
+    for word in result.get("word_segments", []):
+        shift(word)
+
+def process_windowed(
+    job: dict,
+    asr_model,
+    align_model_data,
+    diarize_model,
+    writer,
+    window_seconds: float,
+    overlap_seconds: float,
+    transcribe=None,
+    on_window=None,
+    vad_settings: dict = None
+) -> str:
+    """
+    긴 녹화본을 겹치는 구간 단위로 디코딩 → ASR → 정렬 → 화자분리하여 writer(TranscriptStreamWriter)에 바로 씁니다.
+    메모리에는 한 구간의 오디오와 결과만 올라가므로, 최대 사용량이 녹화본 길이가 아니라 구간 길이로 정해집니다.
+    on_window(index, total)를 주면 구간 처리를 시작할 때마다 호출합니다. (진행 상황 알림용)
+    vad_settings를 주면 구간마다 긴 무음을 잘라내고 처리합니다. (건너뛴 길이는 job["vad"]에 누적)
+    transcribe(audio)를 주면 ASR을 이 함수로 실행합니다. (배치 크기 조정용, 없으면 asr_model.transcribe 기본값)
+
+    반환값: 구간별 PCM으로 계산한 오디오 해시 (결과 캐시 키로 사용)
+    """
+    import whisperx
+
+    windows = plan_windows(job["duration"], window_seconds, overlap_seconds)
+    stitcher = SpeakerStitcher()
+    audio_hasher = hashlib.sha256()
+    diarization_params = job["diarization_params"]
+    last_written_end = 0.0
+
+    for index, (start, end, own_start, own_end) in enumerate(windows, start=1):
+        print(f"   - 구간 {index}/{len(windows)} 처리 중 ({start:.0f}s ~ {end:.0f}s, Key: {job['key']})")
+        if on_window is not None:
+            on_window(index, len(windows))
+        audio = decode_audio(job["audio_path"] or job["video_path"], start=start, duration=end - start)
+        audio_hasher.update(memoryview(audio).cast("B"))
+        timeline = None
+        if vad_settings is not None:
+            audio, timeline = apply_vad(audio, vad_settings)
+            if timeline is not None:
+                job["vad"] = add_to_report(job["vad"], timeline)
+
+        if transcribe is not None:
+            result = transcribe(audio)
+        else:
+            result = asr_model.transcribe(audio, language=job["language"])
+        result = whisperx.align(
+            result["segments"],
+            align_model_data["model"],
+            align_model_data["metadata"],
+            audio,
+            job["device"],
+            return_char_alignments=False
+        )
+        diarize_df, _ = run_diarization(diarize_model, audio, diarization_params)
+        del audio
+
+        if timeline is not None:
+            # 무음을 잘라낸 오디오 기준 시각 → 구간 기준 시각
+            timeline.remap_result(result)
+            timeline.remap_diarization(diarize_df)
+        # 구간 기준 시각 → 전체 기준 시각
+        _shift_result(result, start)
+        diarize_df['start'] += start
+        diarize_df['end'] += start
+        # 다음 구간의 시작 이후 발화만 라벨 연결용으로 보관
+        next_start = windows[index][0] if index < len(windows) else end
+        stitcher.stitch(diarize_df, keep_after=next_start)
+        result = whisperx.assign_word_speakers(diarize_df, result)
+
+        owned = []
+        for seg in result["segments"]:
+            # 이 구간이 책임지는 범위의 세그먼트만, 이미 쓴 발언과 겹치지 않게 출력
+            if not (own_start <= seg["start"] < own_end):
+                continue
+            if (seg["start"] + seg["end"]) / 2 < last_written_end:
+                continue
+            owned.append(seg)
+            last_written_end = max(last_written_end, seg["end"])
+        writer.add_many(owned)
+
+        del result, diarize_df
+        gc.collect()
+
+    writer.close()
+    return audio_hasher.hexdigest()
@@ -0,0 +1,73 @@
+# /progress.py
+import asyncio
+import threading
+from collections import OrderedDict
+
+# 화자분리 단계 이름 → UI에 표시할 순서 (진행률 계산용)
+STAGE_ORDER = ["extract", "asr", "align", "diarize", "finalize"]
+
+class ProgressHub:
+    """
+    작업별 진행 상황(상태, 현재 단계, 최종 결과)을 구독자에게 밀어 주는(push) 허브.
+
+    작업 단계 함수는 워커 스레드에서 실행되므로 publish()는 어느 스레드에서든 호출할 수 있고,
+    실제 전달은 이벤트 루프에서 각 구독자의 asyncio.Queue로 이루어집니다.
+    최근 작업 max_keys개의 마지막 상태만 보관하므로 메모리 사용량은 일정합니다.
+    """
+
+    def __init__(self, max_keys: int = 1000):
+        self.max_keys = max_keys
+        self._loop = None
+        self._latest = OrderedDict() # key -> 마지막 이벤트
+        self._subscribers = {}       # key -> set(asyncio.Queue)
+        self._lock = threading.Lock()
+
+    def bind_loop(self, loop: asyncio.AbstractEventLoop):
+        """이벤트를 전달할 이벤트 루프를 지정합니다. (서버 시작 시 호출)"""
+        self._loop = loop
+
+    def publish(self, key: str, status: str, stage: str = None, **extra):
+        """작업 상태 변화를 알립니다. 예: publish(key, "processing", stage="asr")"""
+        event = {"key": key, "status": status}
+        if stage is not None:
+            event["stage"] = stage
+            if stage in STAGE_ORDER:
+                event["progress"] = round(STAGE_ORDER.index(stage) / len(STAGE_ORDER), 2)
+        if status == "completed":
+            event["progress"] = 1.0
+        event.update(extra)
+
+        with self._lock:
+            # 최종 결과(data)는 구독자에게 한 번만 보내고, 보관 상태에는 남기지 않음 (결과는 작업 결과 저장소에 있음)
+            self._latest[key] = {k: v for k, v in event.items() if k != "data"}
+            self._latest.move_to_end(key)
+            while len(self._latest) > self.max_keys:
+                self._latest.popitem(last=False)
+
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._dispatch, key, event)
+
+    def _dispatch(self, key: str, event: dict):
+        for queue in self._subscribers.get(key, ()):
+            queue.put_nowait(event)
+
+    def latest(self, key: str):
+        """마지막으로 알려진 상태(최종 결과 제외)를 반환합니다."""
+        with self._lock:
+            return self._latest.get(key)
+
+    def subscribe(self, key: str) -> asyncio.Queue:
+        """이벤트 루프 안에서 호출해야 합니다."""
+        queue = asyncio.Queue()
+        self._subscribers.setdefault(key, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, key: str, queue: asyncio.Queue):
+        queues = self._subscribers.get(key)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[key]
+
+    def subscriber_count(self) -> int:
+        return sum(len(queues) for queues in self._subscribers.values())
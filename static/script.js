@@ -105,6 +105,7 @@ document.addEventListener('DOMContentLoaded', () => {
         const formData = new FormData();
         formData.append('file', fileInput.files[0]);
         formData.append('model', document.getElementById('model').value);
+        formData.append('language', document.getElementById('language').value);
         
         const optionalParams = ['threshold', 'min_duration_off', 'min_speakers', 'max_speakers'];
         optionalParams.forEach(id => {
@@ -135,7 +136,7 @@ document.addEventListener('DOMContentLoaded', () => {
                 jobKey = response.key;
                 resultsContainer.style.display = 'block';
                 statusMessage.textContent = '✅ 작업이 대기열에 추가되었습니다. 처리가 시작되면 결과가 표시됩니다. (몇 분 정도 소요될 수 있습니다)';
-                pollForResult();
+                watchJobEvents();
             } else {
                 handleError(`업로드 실패: ${xhr.statusText}`);
             }
@@ -148,6 +149,63 @@ document.addEventListener('DOMContentLoaded', () => {
         xhr.send(formData);
     });
 
+    // 단계 이름 → 화면 표시용 문구
+    const STAGE_LABELS = {
+        extract: '오디오 추출',
+        asr: '음성 인식(ASR)',
+        align: '타임스탬프 정렬',
+        diarize: '화자 분리',
+        finalize: '후처리',
+    };
+
+    // 서버가 밀어 주는(SSE) 진행 상황을 받아 표시합니다.
+    // EventSource를 지원하지 않거나 연결이 끊기면 폴링으로 전환합니다.
+    function watchJobEvents() {
+        if (!window.EventSource) {
+            pollForResult();
+            return;
+        }
+
+        const source = new EventSource(`/job-events/${jobKey}`);
+        let finished = false;
+
+        source.onmessage = (e) => {
+            const event = JSON.parse(e.data);
+
+            if (event.status === 'completed') {
+                finished = true;
+                source.close();
+                progressBar.style.width = '100%';
+                progressText.textContent = '처리 완료';
+                statusMessage.textContent = '🎉 처리가 완료되었습니다!';
+                displayResults(event.data);
+            } else if (event.status === 'failed') {
+                finished = true;
+                source.close();
+                handleError(`서버 처리 실패: ${event.data}`);
+            } else if (event.status === 'not_found') {
+                finished = true;
+                source.close();
+                handleError('작업 ID를 찾을 수 없습니다. 페이지를 새로고침하세요.');
+            } else if (event.status === 'processing' && event.stage) {
+                const label = STAGE_LABELS[event.stage] || event.stage;
+                const windowInfo = event.windows ? ` (구간 ${event.window}/${event.windows})` : '';
+                progressBar.style.width = `${Math.round((event.progress || 0) * 100)}%`;
+                progressText.textContent = `처리 중: ${label}${windowInfo}`;
+                submitBtn.querySelector('.btn-text').textContent = '처리 중...';
+            }
+        };
+
+        source.onerror = () => {
+            // 연결이 끊기면 (프록시, 서버 재시작 등) 폴링으로 전환
+            source.close();
+            if (!finished) {
+                pollForResult();
+            }
+        };
+    }
+
+    // 폴링 방식 결과 확인 (SSE를 쓸 수 없을 때의 대체 수단)
     function pollForResult() {
         const interval = setInterval(async () => {
             try {
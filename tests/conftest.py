@@ -0,0 +1,7 @@
+# /tests/conftest.py
+import sys
+from pathlib import Path
+
+# 저장소 루트의 모듈(admission.py, journal.py, processor/...)을 그대로 import
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
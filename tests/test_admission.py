@@ -0,0 +1,98 @@
+# /tests/test_admission.py
+import pytest
+
+import admission as admission_module
+from admission import AdmissionControl, QueueFull
+
+@pytest.fixture
+def clock(monkeypatch):
+    """admission 모듈이 보는 monotonic 시각을 테스트에서 직접 움직임"""
+    now = {"value": 1000.0}
+    monkeypatch.setattr(admission_module.time, "monotonic", lambda: now["value"])
+    return now
+
+def test_estimate_uses_queued_audio_and_real_time_factor(clock):
+    control = AdmissionControl(max_jobs=10, default_rtf=0.1)
+    control.admit([("a", 600.0), ("b", 1200.0)])
+
+    estimate = control.estimate(300.0)
+    assert estimate["queued_jobs"] == 2
+    assert estimate["queued_audio_seconds"] == 1800.0
+    assert estimate["real_time_factor"] == 0.1
+    assert estimate["estimated_wait_seconds"] == 180.0
+    assert estimate["estimated_finish_seconds"] == 210.0
+
+def test_running_jobs_count_only_their_remaining_time(clock):
+    control = AdmissionControl(max_jobs=10, default_rtf=0.1, workers=2)
+    (ticket,), _ = control.admit([("a", 600.0)])
+    control.start(ticket)
+    clock["value"] += 20.0 # 예상 60초 중 20초 경과
+
+    estimate = control.estimate()
+    assert estimate["queued_jobs"] == 0
+    assert estimate["estimated_wait_seconds"] == 20.0 # 남은 40초 ÷ 워커 2
+    assert control.stats()["running_jobs"] == 1
+
+    control.finish(ticket)
+    assert control.estimate()["estimated_wait_seconds"] == 0.0
+
+def test_measured_real_time_factor_replaces_default():
+    measured = {"rtf": None}
+    control = AdmissionControl(max_jobs=10, default_rtf=1.0, rtf_source=lambda: measured["rtf"])
+    assert control.real_time_factor() == 1.0 # 아직 끝난 작업이 없음
+    measured["rtf"] = 0.05
+    assert control.real_time_factor() == 0.05
+
+def test_rejects_when_queue_is_full_and_counts_rejections(clock):
+    control = AdmissionControl(max_jobs=2, default_rtf=0.1)
+    control.admit([("a", 100.0), ("b", 100.0)])
+
+    with pytest.raises(QueueFull) as raised:
+        control.admit([("c", 100.0)])
+    assert raised.value.retry_after >= 5
+    assert raised.value.estimate["queued_jobs"] == 2
+    assert control.rejected_total == 1
+    with pytest.raises(QueueFull):
+        control.check()
+
+    # 시작한 작업은 대기 수에서 빠지므로 자리가 남
+    first = next(iter(control._tickets))
+    control.start(first)
+    control.check()
+    control.admit([("c", 100.0)])
+
+def test_batch_is_admitted_all_or_nothing(clock):
+    control = AdmissionControl(max_jobs=3)
+    control.admit([("a", 10.0)])
+    with pytest.raises(QueueFull):
+        control.admit([("b", 10.0), ("c", 10.0), ("d", 10.0)])
+    assert control.stats()["queued_jobs"] == 1
+
+def test_force_admits_past_the_limit(clock):
+    control = AdmissionControl(max_jobs=1)
+    control.admit([("a", 10.0)])
+    tickets, estimate = control.admit([("b", 10.0)], force=True)
+    assert len(tickets) == 1 and estimate["queued_jobs"] == 1
+    assert control.stats()["queued_jobs"] == 2
+    assert control.rejected_total == 0
+
+def test_rejects_when_estimated_wait_is_too_long(clock):
+    control = AdmissionControl(max_jobs=100, max_wait_seconds=60.0, default_rtf=0.1)
+    (ticket,), _ = control.admit([("a", 1200.0)]) # 예상 120초
+    control.start(ticket)
+
+    with pytest.raises(QueueFull) as raised:
+        control.admit([("b", 10.0)])
+    # 처리 중인 작업이 끝나 자리가 나는 120초 뒤에 다시 시도 (대기 초과분 60초보다 김)
+    assert raised.value.retry_after == 120
+    assert "exceeds" in str(raised.value)
+
+    clock["value"] += 70.0 # 남은 시간 50초
+    control.admit([("b", 10.0)])
+
+def test_finish_ignores_missing_ticket():
+    control = AdmissionControl(max_jobs=1)
+    control.finish(None)
+    control.finish("unknown")
+    control.start("unknown")
+    assert control.stats()["queued_jobs"] == 0
@@ -0,0 +1,93 @@
+# /tests/test_asr_batch.py
+import numpy as np
+import pytest
+
+import processor.asr_batch as asr_batch
+from processor.asr_batch import AsrBatchSizer, is_out_of_memory
+from processor.audio import SAMPLE_RATE
+
+GIB = 1024 ** 3
+
+@pytest.fixture
+def memory(monkeypatch):
+    """장치 여유 메모리와 모델 추정 메모리를 테스트 값으로 (ASR 모델 1GiB)"""
+    state = {"free": 64 * GIB}
+    monkeypatch.setattr(asr_batch, "free_memory_bytes", lambda device: state["free"])
+    monkeypatch.setattr(asr_batch, "estimate_model_bytes", lambda kind, name, compute_type: GIB)
+    monkeypatch.setattr(asr_batch, "free_device_memory", lambda: None)
+    return state
+
+def _sizer(**overrides) -> AsrBatchSizer:
+    options = dict(max_gpu=32, max_cpu=8, fixed_gpu=16, fixed_cpu=4, item_memory_ratio=0.5, memory_fraction=0.5)
+    options.update(overrides)
+    return AsrBatchSizer(**options)
+
+def test_batch_size_is_limited_by_device_max_audio_and_memory(memory):
+    sizer = _sizer()
+    assert sizer.choose("cuda", "large-v3", "float16", 3600) == 32
+    assert sizer.choose("cpu", "large-v3", "int8", 3600) == 8
+    # 30초 조각 수보다 크게 잡지 않음
+    assert sizer.choose("cuda", "large-v3", "float16", 65) == 3
+    # 여유 메모리 4GiB × 0.5 ÷ (1GiB × 0.5) = 4
+    memory["free"] = 4 * GIB
+    assert sizer.choose("cuda", "large-v3", "float16", 3600) == 4
+    memory["free"] = 0
+    assert sizer.choose("cuda", "large-v3", "float16", 3600) == 1
+
+def test_fixed_size_when_auto_is_off(memory):
+    sizer = _sizer(auto=False)
+    assert sizer.choose("cuda", "large-v3", "float16", 30) == 16
+    assert sizer.choose("cpu", "large-v3", "int8", 30) == 4
+
+def _silence(seconds: float) -> np.ndarray:
+    """길이만 있는 무음 (메모리를 차지하지 않는 읽기 전용 배열)"""
+    return np.broadcast_to(np.float32(0), (int(seconds * SAMPLE_RATE),))
+
+class _OomModel:
+    """batch_size가 limit보다 크면 CUDA 메모리 부족을 흉내 내는 ASR 모델"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.calls = []
+
+    def transcribe(self, audio, language, batch_size):
+        self.calls.append(batch_size)
+        if batch_size > self.limit:
+            raise RuntimeError("CUDA failed with error out of memory")
+        return {"segments": [], "language": language}
+
+def test_oom_halves_batch_and_remembers_cap(memory):
+    sizer = _sizer()
+    model = _OomModel(limit=5)
+    audio = _silence(3600)
+    result, info = sizer.transcribe(model, audio, "ko", "cuda", "large-v3", "float16")
+
+    assert model.calls == [32, 16, 8, 4]
+    assert info == {"batch_size": 4, "oom_retries": 3}
+    assert result["language"] == "ko"
+    assert sizer.caps() == {"cuda/large-v3/float16": 4}
+    # 다음 작업은 줄인 상한에서 바로 시작 (다른 모델/장치는 영향 없음)
+    assert sizer.choose("cuda", "large-v3", "float16", 3600) == 4
+    assert sizer.choose("cuda", "small", "float16", 3600) == 32
+
+def test_oom_at_batch_size_one_is_raised(memory):
+    with pytest.raises(RuntimeError):
+        _sizer(max_gpu=1).transcribe(_OomModel(limit=0), _silence(1), "ko", "cuda", "m", "float16")
+
+def test_other_errors_are_not_retried(memory):
+    class Broken:
+        calls = 0
+
+        def transcribe(self, audio, language, batch_size):
+            Broken.calls += 1
+            raise ValueError("bad audio")
+
+    with pytest.raises(ValueError):
+        _sizer().transcribe(Broken(), _silence(60), "ko", "cuda", "m", "float16")
+    assert Broken.calls == 1
+
+def test_is_out_of_memory():
+    assert is_out_of_memory(MemoryError())
+    assert is_out_of_memory(RuntimeError("CUDA out of memory. Tried to allocate 2.00 GiB"))
+    assert is_out_of_memory(RuntimeError("CUBLAS_STATUS_ALLOC_FAILED"))
+    assert not is_out_of_memory(ValueError("bad audio"))
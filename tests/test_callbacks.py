@@ -0,0 +1,90 @@
+# /tests/test_callbacks.py
+import asyncio
+
+import pytest
+
+from callbacks import CallbackDispatcher
+
+def _dispatcher(tmp_path, **overrides) -> CallbackDispatcher:
+    options = dict(timeout_seconds=1, max_attempts=3, backoff_base=1, backoff_max=10, concurrency=1)
+    options.update(overrides)
+    return CallbackDispatcher(str(tmp_path / "outbox"), **options)
+
+def _deliver_due(dispatcher: CallbackDispatcher):
+    async def run():
+        dispatcher._wakeup = asyncio.Event()
+        batches, _ = dispatcher._take_due()
+        for batch in batches:
+            await dispatcher._deliver(batch, asyncio.Semaphore(1))
+        return batches
+    return asyncio.run(run())
+
+def test_success_removes_outbox_file(tmp_path, monkeypatch):
+    dispatcher = _dispatcher(tmp_path)
+    monkeypatch.setattr(dispatcher, "_send", lambda batch: None)
+    dispatcher.enqueue("http://cms/speaker", {"key": "a"})
+    assert len(list(dispatcher.outbox_dir.glob("*.json"))) == 1
+
+    _deliver_due(dispatcher)
+
+    assert dispatcher.stats() == {"pending": 0, "in_flight": 0, "sent": 1, "retries": 0, "failed": 0}
+    assert list(dispatcher.outbox_dir.glob("*.json")) == []
+
+def test_unexpected_send_error_is_retried_with_backoff(tmp_path, monkeypatch):
+    dispatcher = _dispatcher(tmp_path)
+
+    def fail(batch):
+        raise ValueError("not a requests error")
+    monkeypatch.setattr(dispatcher, "_send", fail)
+    dispatcher.enqueue("http://cms/speaker", {"key": "a"})
+
+    _deliver_due(dispatcher)
+
+    stats = dispatcher.stats()
+    assert stats["in_flight"] == 0
+    assert stats["pending"] == 1 and stats["retries"] == 1
+    entry = next(iter(dispatcher._pending.values()))
+    assert entry["attempts"] == 1
+    # 다음 재시도는 백오프 뒤 (지터 ±20%)
+    batches, wait = dispatcher._take_due()
+    assert batches == [] and 0.7 <= wait <= 1.2
+
+def test_record_error_does_not_leave_entry_in_flight(tmp_path, monkeypatch):
+    dispatcher = _dispatcher(tmp_path)
+    monkeypatch.setattr(dispatcher, "_send", lambda batch: (_ for _ in ()).throw(ValueError("boom")))
+    dispatcher.enqueue("http://cms/speaker", {"key": "a"})
+
+    def broken_save(entry):
+        raise OSError("disk full")
+    monkeypatch.setattr(dispatcher, "_save", broken_save)
+
+    _deliver_due(dispatcher)
+
+    assert dispatcher.stats()["in_flight"] == 0
+    assert dispatcher.stats()["pending"] == 1
+    # 기록에 실패한 항목도 바로 재시도하지 않고 backoff_max 뒤에 다시 시도
+    batches, wait = dispatcher._take_due()
+    assert batches == [] and wait == pytest.approx(10, abs=1)
+
+def test_moves_to_failed_after_max_attempts(tmp_path, monkeypatch):
+    dispatcher = _dispatcher(tmp_path, max_attempts=2)
+    monkeypatch.setattr(dispatcher, "_send", lambda batch: (_ for _ in ()).throw(ValueError("boom")))
+    dispatcher.enqueue("http://cms/speaker", {"key": "a"})
+
+    for _ in range(2):
+        for entry in dispatcher._pending.values():
+            entry["next_attempt_at"] = 0.0
+        _deliver_due(dispatcher)
+
+    assert dispatcher.stats()["failed"] == 1 and dispatcher.stats()["pending"] == 0
+    assert len(list(dispatcher.failed_dir.glob("*.json"))) == 1
+    assert list(dispatcher.outbox_dir.glob("*.json")) == []
+
+def test_outbox_is_reloaded_after_restart(tmp_path):
+    dispatcher = _dispatcher(tmp_path)
+    dispatcher.enqueue("http://cms/speaker", {"key": "a"})
+
+    restarted = _dispatcher(tmp_path)
+    restarted._load_outbox()
+
+    assert [entry["params"] for entry in restarted._pending.values()] == [{"key": "a"}]
@@ -0,0 +1,45 @@
+# /tests/test_inflight.py
+import os
+
+import pytest
+
+from inflight import InFlightJobs
+
+@pytest.fixture
+def video(tmp_path):
+    path = tmp_path / "meeting.mp4"
+    path.write_bytes(b"video")
+    return path
+
+def test_identity_depends_on_task_params_and_file(video):
+    identity = InFlightJobs.identity("diarize", str(video), {"model": "large-v3"})
+    assert identity == InFlightJobs.identity("diarize", str(video), {"model": "large-v3"})
+    assert identity != InFlightJobs.identity("diarize", str(video), {"model": "small"})
+    assert identity != InFlightJobs.identity("convert", str(video), {"model": "large-v3"})
+
+    # 같은 경로라도 내용(크기/수정 시각)이 바뀌면 새 작업
+    video.write_bytes(b"replaced video")
+    stat = video.stat()
+    os.utime(video, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert identity != InFlightJobs.identity("diarize", str(video), {"model": "large-v3"})
+
+def test_identity_of_missing_file_raises_oserror(tmp_path):
+    with pytest.raises(OSError):
+        InFlightJobs.identity("diarize", str(tmp_path / "gone.mp4"), {})
+
+def test_duplicates_attach_and_are_released_with_the_job():
+    jobs = InFlightJobs()
+    assert jobs.add("job", "a") is None
+
+    attached = jobs.add("job", "b")
+    assert attached["key"] == "a" and attached["followers"] == 1
+    jobs.add("job", "a") # 같은 키로 다시 보낸 요청은 기존 작업의 통보로 충분
+    jobs.add("job", "b") # 이미 합류한 키는 한 번만
+    assert jobs.stats() == {"jobs": 1, "followers": 1, "attached_total": 3}
+
+    assert jobs.release("job") == ["b"]
+    assert jobs.release("job") == []
+    assert jobs.add("job", "c") is None # 끝난 뒤에는 새 작업
+
+def test_release_without_identity_is_noop():
+    assert InFlightJobs().release(None) == []
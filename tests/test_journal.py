@@ -0,0 +1,135 @@
+# /tests/test_journal.py
+import pytest
+
+from batches import BatchTracker
+from inflight import InFlightJobs
+from journal import JobJournal, replay_error
+
+@pytest.fixture
+def journal(tmp_path):
+    return JobJournal(str(tmp_path / "journal.db"), retention_seconds=3600)
+
+@pytest.fixture
+def video(tmp_path):
+    path = tmp_path / "meeting.mp4"
+    path.write_bytes(b"video")
+    return str(path)
+
+def _task(video_path: str, key: str, **params) -> dict:
+    return {"task_name": "diarize", "queued_at": 12.5, "params": {"video_path": video_path, "key": key, **params}}
+
+def test_pending_keeps_submission_order_and_drops_transient_values(journal, video):
+    first = journal.record("diarize", "a", _task(video, "a", ticket="t1", journal_id=99, inflight_key="i"))
+    journal.record("convert", "b", {"task_name": "convert", "params": {"video_path": video, "key": "b", "output_type": "mp3"}})
+    journal.start(first)
+
+    pending = journal.pending()
+    assert [(entry["key"], entry["kind"], entry["state"]) for entry in pending] == [
+        ("a", "diarize", "running"), ("b", "convert", "queued")
+    ]
+    # 표/저널 번호/큐 대기 시각은 프로세스가 바뀌면 의미가 없으므로 저장하지 않음
+    assert pending[0]["task"] == {"task_name": "diarize", "params": {"video_path": video, "key": "a", "inflight_key": "i"}}
+    assert pending[0]["attempts"] == 1
+
+def test_finished_jobs_are_never_pending(journal, video):
+    done = journal.record("diarize", "done", _task(video, "done"))
+    failed = journal.record("diarize", "failed", _task(video, "failed"))
+    journal.start(done)
+    journal.finish(done, "completed", "/out.txt")
+    journal.finish(failed, "failed", error="boom")
+    # 끝난 작업은 다시 시작으로 기록되지 않음
+    journal.start(done)
+
+    assert journal.pending() == []
+    assert journal.stats() == {"queued": 0, "running": 0, "attached": 0, "done": 1, "failed": 1}
+
+def test_journal_survives_reopen(tmp_path, video):
+    path = str(tmp_path / "journal.db")
+    job_id = JobJournal(path, 3600).record("diarize", "a", _task(video, "a"))
+    JobJournal(path, 3600).start(job_id) # 처리 중에 서버 종료
+
+    reopened = JobJournal(path, 3600).pending()
+    assert [(entry["id"], entry["state"], entry["attempts"]) for entry in reopened] == [(job_id, "running", 1)]
+
+def test_replay_error_limits_attempts(journal, video):
+    job_id = journal.record("diarize", "a", _task(video, "a"))
+    for _ in range(2):
+        journal.start(job_id)
+    assert replay_error(journal.pending()[0], max_attempts=3) is None
+
+    journal.start(job_id)
+    error = replay_error(journal.pending()[0], max_attempts=3)
+    assert isinstance(error, RuntimeError) and "3 times" in str(error)
+
+def test_replay_error_when_source_is_gone(journal, tmp_path):
+    journal.record("diarize", "a", _task(str(tmp_path / "gone.mp4"), "a"))
+    assert isinstance(replay_error(journal.pending()[0], max_attempts=3), FileNotFoundError)
+
+def test_batch_state_rebuilds_progress(journal, video, tmp_path):
+    meta = {"batch_callback": "both"}
+    missing, done, waiting = journal.record_many("diarize", [
+        {"key": "b-0", "task": _task("/nope.mp4", "b-0"), "batch_key": "b", "meta": meta, "state": "failed", "error": "Video file not found"},
+        {"key": "b-1", "task": _task(video, "b-1", batch_key="b"), "batch_key": "b", "meta": meta},
+        {"key": "b-2", "task": _task(video, "b-2", batch_key="b"), "batch_key": "b", "meta": meta},
+    ])
+    journal.start(done)
+    journal.finish(done, "cached", "/b-1.txt")
+    journal.start(waiting) # 처리 중에 서버 종료
+
+    items, callback = journal.batch_state("b")
+    assert callback == "both"
+    assert [(item["key"], item["status"], item["output_path"]) for item in items] == [
+        ("b-0", "failed", None), ("b-1", "cached", "/b-1.txt"), ("b-2", "queued", None)
+    ]
+
+    tracker = BatchTracker(str(tmp_path / "batches"))
+    summary = tracker.create("b", items, callback)
+    assert (summary["total"], summary["failed"], summary["cached"], summary["remaining"]) == (3, 1, 1, 1)
+    finished = tracker.job_finished("b", "b-2", "completed", "/b-2.txt")
+    assert finished is not None and finished["remaining"] == 0
+
+def test_attached_requests_survive_restart_and_close_with_leader(tmp_path, video):
+    path = str(tmp_path / "journal.db")
+    journal = JobJournal(path, 3600)
+    leader = journal.record("diarize", "a", _task(video, "a", inflight_key="i"))
+    other = journal.record("diarize", "c", _task(video, "c", inflight_key="j"))
+    journal.attach("diarize", "b", "i", video)
+    journal.start(leader) # 처리 중에 서버 종료
+
+    # 재시작: 합류한 요청은 다시 실행하지 않고, 다시 실행하는 작업에 합류시킴
+    journal = JobJournal(path, 3600)
+    assert [entry["key"] for entry in journal.pending()] == ["a", "c"]
+    attached = journal.attached()
+    assert [(entry["key"], entry["meta"]["inflight_key"]) for entry in attached] == [("b", "i")]
+    assert journal.stats()["attached"] == 1
+
+    inflight = InFlightJobs()
+    for entry in journal.pending():
+        inflight.add(entry["task"]["params"]["inflight_key"], entry["key"])
+    for entry in attached:
+        inflight.add(entry["meta"]["inflight_key"], entry["key"])
+    assert inflight.release("i") == ["b"] # 기존 작업이 끝나면 b에도 통보
+
+    # 다른 작업이 끝나도 닫히지 않고, 기존 작업이 끝날 때 같은 결과로 닫힘
+    journal.finish(other, "completed", "/c.txt")
+    assert [entry["key"] for entry in journal.attached()] == ["b"]
+    journal.finish(leader, "failed", error="boom")
+    assert journal.attached() == []
+    assert journal.stats() == {"queued": 0, "running": 0, "attached": 0, "done": 1, "failed": 2}
+
+def test_record_many_is_atomic(journal, video):
+    with pytest.raises(TypeError):
+        journal.record_many("diarize", [
+            {"key": "a", "task": _task(video, "a")},
+            {"key": "b", "task": _task(video, "b", unserializable=object())},
+        ])
+    assert journal.pending() == []
+
+def test_expire_removes_only_old_finished_jobs(journal, video):
+    old = journal.record("diarize", "old", _task(video, "old"))
+    journal.finish(old, "completed")
+    journal.record("diarize", "waiting", _task(video, "waiting"))
+    journal.retention_seconds = -1 # 방금 끝난 기록도 보관 기간이 지난 것으로
+
+    assert journal.expire() == 1
+    assert journal.stats() == {"queued": 1, "running": 0, "attached": 0, "done": 0, "failed": 0}
@@ -0,0 +1,76 @@
+# /tests/test_vad.py
+import numpy as np
+import pandas as pd
+
+from processor.audio import SAMPLE_RATE
+from processor.vad import find_speech_regions, SpeechTimeline, apply_vad, add_to_report
+
+SETTINGS = {
+    "frame_seconds": 0.03,
+    "threshold_db": -50.0,
+    "dynamic_range_db": 40.0,
+    "min_silence_seconds": 2.0,
+    "padding_seconds": 0.0,
+}
+
+def _audio(*parts) -> np.ndarray:
+    """(초, 소리 여부) 목록으로 만든 테스트 오디오 (소리: 440Hz 사인파)"""
+    chunks = []
+    for seconds, voiced in parts:
+        samples = int(seconds * SAMPLE_RATE)
+        t = np.arange(samples) / SAMPLE_RATE
+        chunks.append((0.3 * np.sin(2 * np.pi * 440 * t) if voiced else np.zeros(samples)).astype(np.float32))
+    return np.concatenate(chunks)
+
+def test_long_silence_is_cut_and_short_pause_kept():
+    audio = _audio((3, True), (1, False), (3, True), (10, False), (3, True))
+    regions = find_speech_regions(audio, SAMPLE_RATE, **SETTINGS)
+    seconds = [(round(start / SAMPLE_RATE, 1), round(end / SAMPLE_RATE, 1)) for start, end in regions]
+    # 1초 쉼은 남기고 10초 무음만 잘라냄 (프레임 경계에 맞춰 조금 어긋날 수 있음)
+    assert len(seconds) == 2
+    assert seconds[0][0] == 0.0 and abs(seconds[0][1] - 7.0) <= 0.1
+    assert abs(seconds[1][0] - 17.0) <= 0.1 and seconds[1][1] == 20.0
+
+def test_all_silence_has_no_regions():
+    assert find_speech_regions(_audio((5, False)), SAMPLE_RATE, **SETTINGS) == []
+
+def test_apply_vad_without_long_silence_returns_original():
+    audio = _audio((5, True))
+    compacted, timeline = apply_vad(audio, SETTINGS)
+    assert compacted is audio and timeline is None
+
+def test_timeline_maps_compact_time_back_to_original():
+    timeline = SpeechTimeline([(0, 5 * SAMPLE_RATE), (15 * SAMPLE_RATE, 20 * SAMPLE_RATE)], 20 * SAMPLE_RATE)
+    assert timeline.speech_seconds == 10.0 and timeline.removed_seconds == 10.0
+    assert timeline.to_original(2.5) == 2.5
+    assert timeline.to_original(7.25) == 17.25
+    # 이어 붙인 경계: 시작 시각은 뒤 구간의 시작, 끝 시각은 앞 구간의 끝
+    assert timeline.to_original(5.0) == 15.0
+    assert timeline.to_original(5.0, is_end=True) == 5.0
+
+def test_compact_concatenates_regions():
+    audio = np.arange(10, dtype=np.float32)
+    timeline = SpeechTimeline([(0, 3), (7, 10)], 10, sample_rate=1)
+    assert timeline.compact(audio).tolist() == [0, 1, 2, 7, 8, 9]
+
+def test_remap_result_moves_shared_words_once():
+    timeline = SpeechTimeline([(0, 5 * SAMPLE_RATE), (15 * SAMPLE_RATE, 20 * SAMPLE_RATE)], 20 * SAMPLE_RATE)
+    words = [{"word": "a", "start": 6.0, "end": 6.5}, {"word": "b"}]
+    result = {"segments": [{"start": 6.0, "end": 6.5, "words": words}], "word_segments": words}
+
+    timeline.remap_result(result)
+
+    assert result["segments"][0]["start"] == 16.0
+    assert words[0] == {"word": "a", "start": 16.0, "end": 16.5} # 26.0이 아님
+    assert words[1] == {"word": "b"}
+
+def test_remap_diarization():
+    timeline = SpeechTimeline([(0, 5 * SAMPLE_RATE), (15 * SAMPLE_RATE, 20 * SAMPLE_RATE)], 20 * SAMPLE_RATE)
+    df = pd.DataFrame([(1.0, 5.0, "SPEAKER_00"), (5.0, 8.0, "SPEAKER_01")], columns=["start", "end", "speaker"])
+    timeline.remap_diarization(df)
+    assert list(zip(df["start"], df["end"])) == [(1.0, 5.0), (15.0, 18.0)]
+
+def test_add_to_report_accumulates():
+    timeline = SpeechTimeline([(0, SAMPLE_RATE)], 3 * SAMPLE_RATE)
+    report = add_to_report(add_to_report(None, timeline), timeline)
+    assert report == {"speech_seconds": 2.0, "removed_seconds": 4.0}
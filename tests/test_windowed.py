@@ -0,0 +1,61 @@
+# /tests/test_windowed.py
+import pandas as pd
+
+from processor.windowed import plan_windows, SpeakerStitcher, _shift_result
+
+def test_short_recording_is_one_window():
+    assert plan_windows(100.0, 600.0, 30.0) == [(0.0, 100.0, 0.0, float("inf"))]
+
+def test_windows_overlap_and_split_ownership():
+    windows = plan_windows(1500.0, 600.0, 30.0)
+    assert [(start, end) for start, end, _, _ in windows] == [(0.0, 600.0), (570.0, 1170.0), (1140.0, 1500.0)]
+    # 겹침의 절반씩 나눠 가져 책임 범위가 빈틈없이 이어짐
+    owns = [(own_start, own_end) for _, _, own_start, own_end in windows]
+    assert owns == [(0.0, 585.0), (585.0, 1155.0), (1155.0, float("inf"))]
+
+def _aligned(segments: list) -> dict:
+    """whisperx.align처럼 word_segments가 세그먼트의 단어 딕셔너리를 그대로 담는 결과"""
+    result = {"segments": segments, "word_segments": []}
+    for seg in segments:
+        result["word_segments"].extend(seg.get("words", []))
+    return result
+
+def test_shift_result_rounds_and_moves_words_once():
+    result = _aligned([
+        {"start": 0.3, "end": 0.5, "words": [{"word": "a", "start": 0.3, "end": 0.5}, {"word": "b"}]},
+    ])
+    _shift_result(result, 3.3)
+
+    seg = result["segments"][0]
+    assert (seg["start"], seg["end"]) == (3.6, 3.8) # 3.5999999999999996이 아님 (VTT에서 1ms 어긋남)
+    assert seg["words"][0] == {"word": "a", "start": 3.6, "end": 3.8}
+    assert seg["words"][1] == {"word": "b"} # 정렬되지 않은 단어는 시각 없음
+    assert result["word_segments"][0]["start"] == 3.6 # 같은 딕셔너리를 두 번 옮기지 않음
+
+def test_shift_result_moves_separate_word_segments():
+    result = {"segments": [], "word_segments": [{"word": "a", "start": 1.0, "end": 1.5}]}
+    _shift_result(result, 10.0)
+    assert result["word_segments"] == [{"word": "a", "start": 11.0, "end": 11.5}]
+
+def _diarization(rows: list):
+    return pd.DataFrame(rows, columns=["start", "end", "speaker"])
+
+def test_stitcher_links_labels_through_overlap():
+    stitcher = SpeakerStitcher()
+    first = _diarization([(0, 585, "SPEAKER_00"), (585, 600, "SPEAKER_01")])
+    assert stitcher.stitch(first, keep_after=570) == {"SPEAKER_00": "SPEAKER_00", "SPEAKER_01": "SPEAKER_01"}
+
+    # 두 번째 구간의 지역 라벨이 뒤바뀌어 나와도, 겹침 구간(570~600)에서 함께 말한 화자로 연결
+    # 겹침 구간에서 말하지 않은 화자는 새 라벨
+    second = _diarization([
+        (570, 585, "SPEAKER_01"), (585, 600, "SPEAKER_00"), (600, 900, "SPEAKER_00"), (900, 1000, "SPEAKER_02"),
+    ])
+    mapping = stitcher.stitch(second, keep_after=1140)
+    assert mapping == {"SPEAKER_00": "SPEAKER_01", "SPEAKER_01": "SPEAKER_00", "SPEAKER_02": "SPEAKER_02"}
+    assert list(second["speaker"]) == ["SPEAKER_00", "SPEAKER_01", "SPEAKER_01", "SPEAKER_02"]
+
+def test_stitcher_gives_new_label_without_enough_overlap():
+    stitcher = SpeakerStitcher(min_overlap_seconds=0.5)
+    stitcher.stitch(_diarization([(0, 600, "SPEAKER_00")]), keep_after=570)
+    mapping = stitcher.stitch(_diarization([(599.8, 700, "SPEAKER_00")]), keep_after=1140)
+    assert mapping == {"SPEAKER_00": "SPEAKER_01"}
@@ -0,0 +1,106 @@
+# /upload.py
+import shutil
+import hashlib
+from pathlib import Path
+
+import ffmpeg
+
+from processor.audio import SAMPLE_RATE, probe_duration
+
+class UploadRejected(Exception):
+    """업로드를 받을 수 없을 때 발생 (status_code는 클라이언트에 돌려줄 HTTP 상태 코드)"""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+
+def check_free_space(directory: Path, incoming_bytes: int, min_free_bytes: int):
+    """파일을 저장한 뒤에도 min_free_bytes 이상의 여유 공간이 남는지 확인합니다."""
+    free = shutil.disk_usage(directory).free
+    if free - incoming_bytes < min_free_bytes:
+        raise UploadRejected(
+            507, f"디스크 여유 공간이 부족합니다. (여유 {free // 1024 ** 2}MB, 필요 {incoming_bytes // 1024 ** 2}MB + 예비 {min_free_bytes // 1024 ** 2}MB)"
+        )
+
+def _start_demux(demux_path: Path):
+    """표준 입력으로 받은 영상에서 16kHz 모노 오디오를 뽑아 wav(float32)로 저장하는 ffmpeg 프로세스를 시작합니다."""
+    return (
+        ffmpeg.input("pipe:")
+        .output(str(demux_path), acodec="pcm_f32le", ac=1, ar=SAMPLE_RATE)
+        .global_args("-nostats", "-loglevel", "error")
+        .overwrite_output()
+        .run_async(pipe_stdin=True, pipe_stdout=True, pipe_stderr=True)
+    )
+
+def save_upload(
+    src,
+    dest_path: Path,
+    expected_size: int,
+    max_bytes: int,
+    min_free_bytes: int,
+    chunk_size: int,
+    demux_path: Path = None
+) -> dict:
+    """
+    업로드된 파일(src, 파일 객체)을 dest_path에 청크 단위로 저장하면서 sha256 해시를 계산합니다.
+    이벤트 루프를 막지 않도록 별도 스레드에서 호출해야 합니다.
+
+    demux_path를 주면 저장과 동시에 ffmpeg로 오디오를 뽑아 둡니다. (추출 단계에서 영상 대신 이 파일을 디코딩)
+    표준 입력으로 읽을 수 없는 형식(moov가 끝에 있는 mp4 등)이면 조용히 건너뛰고 audio_path는 None이 됩니다.
+
+    반환값: {"size": 바이트 수, "sha256": 내용 해시, "audio_path": 미리 뽑은 오디오 경로 또는 None}
+    """
+    if expected_size is not None and expected_size > max_bytes:
+        raise UploadRejected(413, f"파일이 너무 큽니다. (최대 {max_bytes // 1024 ** 2}MB)")
+    check_free_space(dest_path.parent, expected_size or 0, min_free_bytes)
+
+    hasher = hashlib.sha256()
+    size = 0
+    demux = _start_demux(demux_path) if demux_path is not None else None
+    try:
+        with open(dest_path, "wb") as buffer:
+            while True:
+                chunk = src.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadRejected(413, f"파일이 너무 큽니다. (최대 {max_bytes // 1024 ** 2}MB)")
+                hasher.update(chunk)
+                buffer.write(chunk)
+                if demux is not None:
+                    try:
+                        demux.stdin.write(chunk)
+                    except (BrokenPipeError, OSError):
+                        demux = _stop_demux(demux, demux_path) # ffmpeg가 이 형식을 스트림으로 읽지 못함
+    except BaseException:
+        dest_path.unlink(missing_ok=True)
+        if demux is not None:
+            _stop_demux(demux, demux_path)
+        raise
+
+    audio_path = None
+    if demux is not None:
+        _, stderr = demux.communicate() # 표준 입력을 닫고 ffmpeg가 끝날 때까지 대기
+        if demux.returncode == 0 and _demux_complete(dest_path, demux_path):
+            audio_path = str(demux_path)
+        else:
+            print(f"업로드 중 오디오 추출 실패, 추출 단계에서 다시 디코딩합니다: {stderr.decode('utf-8', errors='replace').strip()}")
+            demux_path.unlink(missing_ok=True)
+
+    return {"size": size, "sha256": hasher.hexdigest(), "audio_path": audio_path}
+
+def _demux_complete(dest_path: Path, demux_path: Path) -> bool:
+    """
+    미리 뽑은 오디오 길이가 원본과 같은지 확인합니다.
+    (moov가 끝에 있는 mp4 등은 ffmpeg가 에러 없이 빈 오디오를 만들 수 있으므로 길이로 검증)
+    """
+    total = probe_duration(str(dest_path))
+    demuxed = demux_path.stat().st_size / (4 * SAMPLE_RATE) # float32 모노 (wav 헤더 크기는 무시할 수준)
+    return total > 0 and abs(total - demuxed) <= max(1.0, total * 0.01)
+
+def _stop_demux(demux, demux_path: Path):
+    demux.kill()
+    demux.wait()
+    demux_path.unlink(missing_ok=True)
+    return None